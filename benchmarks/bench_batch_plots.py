@@ -0,0 +1,102 @@
+# Chart rendering for many symbols on synthetic features, headless: a new pyplot figure per chart drawn
+# from every row (the interactive code with plt.show() swapped for savefig), against
+# visualization.batch_report with reused figures, decimated series and 1 or --workers processes.
+# Checks that the decimated prediction charts look like the full ones: the mean pixel difference
+# between the two images of each symbol must stay under --max-pixel-diff.
+# Run from the repository root: python -m benchmarks.bench_batch_plots --symbols 20 --bars 20000 --workers 4
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+from benchmarks.synthetic import make_hourly_bars, make_hourly_sentiment
+from data_preprocessing import stock_data_preparer
+from feature_engineering import feature_engineer
+from feature_engineering.feature_store import to_feature_matrices
+from model_evaluation.evaluate_model import draw_feature_importance
+from visualization import batch_report
+from visualization.data_visualizer import draw_stock_prediction, prediction_series
+
+def make_training(features):
+    # Results shaped like train_and_evaluate's, from a linear model: fitting forests for every symbol
+    # would dominate the run and the charts only need predictions and importances
+    from sklearn.linear_model import LinearRegression
+
+    training = {}
+    for symbol, data in features.items():
+        model = LinearRegression().fit(data.X, data.y)
+        importance = np.abs(model.coef_) / max(np.abs(model.coef_).sum(), 1e-12)
+        training[symbol] = {'model': model, 'train_mse': 1.0, 'train_r2': 0.5, 'test_mse': 2.0, 'test_r2': 0.1,
+                            'feature_importance': dict(zip(data.columns, importance))}
+    return training
+
+def render_per_figure(features, training, output_dir):
+    # New pyplot figures for every chart, every row drawn
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    for symbol, results in training.items():
+        fig, ax = plt.subplots(figsize=batch_report.FIGSIZE, dpi=batch_report.DPI)
+        draw_feature_importance(ax, symbol, results['feature_importance'])
+        fig.tight_layout()
+        fig.savefig(os.path.join(output_dir, f"{batch_report.file_stem(symbol)}_importance.png"))
+        plt.close(fig)
+
+        plot_data, interval, _ = prediction_series(features, results['model'], symbol)
+        fig, ax = plt.subplots(figsize=batch_report.FIGSIZE, dpi=batch_report.DPI)
+        draw_stock_prediction(ax, symbol, plot_data, interval)
+        fig.tight_layout()
+        fig.savefig(os.path.join(output_dir, f"{batch_report.file_stem(symbol)}_prediction.png"))
+        plt.close(fig)
+
+def pixel_difference(path_a, path_b):
+    import matplotlib.image as mpimg
+
+    a, b = mpimg.imread(path_a), mpimg.imread(path_b)
+    if a.shape != b.shape:
+        return 1.0
+    return float(np.abs(a[..., :3] - b[..., :3]).mean())
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--symbols', type=int, default=20)
+    parser.add_argument('--bars', type=int, default=20000, help='hourly bars per symbol')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--max-pixel-diff', type=float, default=0.002)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    stock_data = make_hourly_bars(args.symbols * args.bars, bars_per_symbol=args.bars, seed=args.seed)
+    sentiment = make_hourly_sentiment(stock_data, seed=args.seed)
+    features = to_feature_matrices(feature_engineer.engineer_features(
+        sentiment, stock_data_preparer.prepare_stock_data(stock_data)))
+    training = make_training(features)
+    rows = sum(map(len, features.values()))
+    print(f"{len(features)} symbols, {rows} feature rows")
+
+    with tempfile.TemporaryDirectory() as per_figure_dir, tempfile.TemporaryDirectory() as batch_dir:
+        baseline = timed(render_per_figure, features, training, per_figure_dir)
+        print(f"New pyplot figure per chart, every row:  {baseline:.2f}s")
+        seconds = timed(batch_report.write_report, features, training, output_dir=batch_dir, n_workers=1)
+        print(f"Reused figures, decimated, 1 process:    {seconds:.2f}s ({baseline / seconds:.1f}x)")
+        if args.workers > 1:
+            seconds = timed(batch_report.write_report, features, training, output_dir=batch_dir, n_workers=args.workers)
+            print(f"Reused figures, decimated, {args.workers} processes:   {seconds:.2f}s ({baseline / seconds:.1f}x)")
+
+        differences = [pixel_difference(os.path.join(per_figure_dir, f"{batch_report.file_stem(symbol)}_prediction.png"),
+                                        os.path.join(batch_dir, f"{batch_report.file_stem(symbol)}_prediction.png"))
+                       for symbol in training]
+        print(f"Prediction charts, mean pixel difference: {np.mean(differences):.4f} (max {np.max(differences):.4f})")
+        if max(differences) > args.max_pixel_diff:
+            raise SystemExit("Decimated prediction charts differ from the full ones")
+        if not os.path.exists(os.path.join(batch_dir, 'index.html')):
+            raise SystemExit("No index written")
+
+if __name__ == "__main__":
+    main()
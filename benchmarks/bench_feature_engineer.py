@@ -0,0 +1,117 @@
+# Column-by-column pandas feature construction vs the vectorized engine in engineer_features, on
+# synthetic hourly bars and sentiment. Checks that both engines give the same rows, columns and values,
+# including for a symbol whose bars arrive unsorted and duplicated. SentimentReturnsCorr is checked
+# against each window's correlation in extended precision instead, also on a long series of sparse,
+# forward-filled sentiment and zero returns, where pandas' running sums lose digits on near-flat windows.
+# Run from the repository root: python -m benchmarks.bench_feature_engineer --symbols 100 --days 250
+import argparse
+import logging
+import time
+import numpy as np
+import pandas as pd
+from benchmarks.bench_feature_state import make_sentiment
+from benchmarks.bench_indicators import BARS_PER_DAY, make_stock_data
+from data_preprocessing import stock_data_preparer
+from feature_engineering import feature_engineer
+
+def run(sentiment, prepared, engine, repeat):
+    best = None
+    for _ in range(repeat):
+        # The pandas engine sets each frame's index to naive times; every run starts from the tz-aware bars
+        bars = {symbol: data.copy(deep=False) for symbol, data in prepared.items()}
+        start = time.perf_counter()
+        features = feature_engineer.engineer_features(sentiment.copy(), bars, engine=engine)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return features, best
+
+def max_difference(expected, actual, exclude=()):
+    differences = []
+    for symbol, frame in expected.items():
+        other = actual[symbol]
+        if not frame.index.equals(other.index) or list(frame.columns) != list(other.columns):
+            raise SystemExit(f"Rows or columns differ for {symbol}")
+        if list(frame.dtypes) != list(other.dtypes):
+            raise SystemExit(f"Column dtypes differ for {symbol}")
+        columns = [column for column in frame.columns if column not in exclude]
+        left, right = frame[columns].to_numpy(dtype='float64'), other[columns].to_numpy(dtype='float64')
+        # Relative for large values, absolute near zero, where SentimentDiff and the lags often sit
+        differences.append((np.abs(left - right) / np.maximum(np.abs(left), 1.0)).max(initial=0))
+    return max(differences)
+
+def exact_correlation(frame):
+    # Each row's SentimentReturnsCorr from its own window, which the row holds as its value and lags,
+    # summed around the window's mean in extended precision
+    window = feature_engineer.SENTIMENT_WINDOW
+    lags = range(1, window)
+    x = frame[['sentiment'] + [f'Sentiment_Lag_{i}' for i in lags]].to_numpy().astype(np.longdouble)
+    y = frame[['Returns'] + [f'Returns_Lag_{i}' for i in lags]].to_numpy().astype(np.longdouble)
+    x -= x.mean(axis=1, keepdims=True)
+    y -= y.mean(axis=1, keepdims=True)
+    return ((x * y).sum(axis=1) / np.sqrt((x * x).sum(axis=1) * (y * y).sum(axis=1))).astype('float64')
+
+def correlation_error(features):
+    return max(np.abs(frame['SentimentReturnsCorr'].to_numpy() - exact_correlation(frame)).max(initial=0)
+               for frame in features.values())
+
+def make_long_series(n_bars, seed):
+    # One symbol with n_bars hourly bars, about 5% of them unchanged (zero returns), and a document
+    # every 50 hours on average whose scores differ only in the fifth decimal, so forward filling
+    # leaves long near-flat stretches of sentiment
+    rng = np.random.default_rng(seed)
+    years = n_bars / BARS_PER_DAY / 252
+    data = make_stock_data(1, years, seed=seed)['SYM0']
+    close = data['Close'].to_numpy().copy()
+    unchanged = np.flatnonzero(rng.random(len(close)) < 0.05)
+    for position in unchanged[unchanged > 0]:
+        close[position] = close[position - 1]
+    data = data.assign(Open=close, High=close * 1.01, Low=close * 0.99, Close=close)
+    sentiment = make_sentiment({'LONG': data}, 0.02, seed=seed)
+    sentiment['score'] = 0.0228 + rng.normal(0, 1e-5, size=len(sentiment))
+    return {'LONG': data}, sentiment
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--symbols', type=int, default=100)
+    parser.add_argument('--days', type=int, default=250)
+    parser.add_argument('--docs-per-hour', type=float, default=0.8)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--long-bars', type=int, default=20_000, help='bars of the long forward-filled series')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    logging.getLogger(feature_engineer.__name__).setLevel(logging.WARNING)
+
+    stock_data = make_stock_data(args.symbols, args.days / 252, seed=args.seed)
+    sentiment = make_sentiment(stock_data, args.docs_per_hour, seed=args.seed)
+    prepared = stock_data_preparer.prepare_stock_data(stock_data)
+    # One symbol arrives unsorted and with repeated bars, which both engines clean up first
+    unsorted = prepared['SYM1']
+    prepared['SYM1'] = pd.concat([unsorted.iloc[::-1], unsorted.iloc[100:110]])
+
+    expected, pandas_seconds = run(sentiment, prepared, 'pandas', args.repeat)
+    actual, vectorized_seconds = run(sentiment, prepared, 'vectorized', args.repeat)
+
+    long_stock_data, long_sentiment = make_long_series(args.long_bars, args.seed)
+    long_prepared = stock_data_preparer.prepare_stock_data(long_stock_data)
+    long_expected, _ = run(long_sentiment, long_prepared, 'pandas', 1)
+    long_actual, _ = run(long_sentiment, long_prepared, 'vectorized', 1)
+
+    difference = max(max_difference(expected, actual, exclude=['SentimentReturnsCorr']),
+                     max_difference(long_expected, long_actual, exclude=['SentimentReturnsCorr']))
+    n_rows = sum(len(frame) for frame in expected.values())
+    print(f"Symbols: {len(expected)}, feature rows: {n_rows:,}")
+    print(f"pandas:     {pandas_seconds:.3f}s")
+    print(f"vectorized: {vectorized_seconds:.3f}s ({pandas_seconds / vectorized_seconds:.1f}x)")
+    print(f"Max difference, vectorized vs pandas (all but SentimentReturnsCorr): {difference:.2e}")
+    for label, pandas_features, vectorized_features in (('synthetic symbols', expected, actual),
+                                                        (f"long series, {args.long_bars} bars", long_expected, long_actual)):
+        print(f"SentimentReturnsCorr error, {label}: pandas {correlation_error(pandas_features):.2e}, "
+              f"vectorized {correlation_error(vectorized_features):.2e}")
+        if correlation_error(vectorized_features) > 1e-9:
+            raise SystemExit(f"Vectorized SentimentReturnsCorr is off on the {label}")
+    if difference > 1e-9:
+        raise SystemExit("Vectorized features differ from the pandas features")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# Full feature rebuild vs appending one bar to an incremental FeatureState, on synthetic hourly bars
+# and sentiment. Checks that replaying the history through the state gives the batch feature rows.
+# Run from the repository root: python -m benchmarks.bench_feature_state --symbols 20 --days 120
+import argparse
+import logging
+import time
+import numpy as np
+import pandas as pd
+from benchmarks.bench_indicators import make_stock_data
+from data_preprocessing import stock_data_preparer
+from feature_engineering import feature_engineer, feature_state
+
+def make_sentiment(stock_data, docs_per_hour, seed=42):
+    # Documents at random times over the price history, with some hours left empty
+    rng = np.random.default_rng(seed)
+    start = min(data.index.min() for data in stock_data.values()).tz_localize(None)
+    end = max(data.index.max() for data in stock_data.values()).tz_localize(None)
+    n_docs = int((end - start) / pd.Timedelta(hours=1) * docs_per_hour)
+    dates = start + pd.to_timedelta(rng.uniform(0, (end - start).total_seconds(), size=n_docs), unit='s')
+    scores = np.round(rng.normal(0.05, 0.2, size=n_docs), 2)
+    return pd.DataFrame({'score': scores}, index=pd.DatetimeIndex(dates, name='date')).sort_index()
+
+def batch_features(stock_data, sentiment):
+    prepared = stock_data_preparer.prepare_stock_data(stock_data)
+    return feature_engineer.engineer_features(sentiment.copy(), prepared)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--symbols', type=int, default=20)
+    parser.add_argument('--days', type=int, default=120)
+    parser.add_argument('--docs-per-hour', type=float, default=0.8)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    logging.getLogger(feature_engineer.__name__).setLevel(logging.WARNING)
+
+    stock_data = make_stock_data(args.symbols, args.days / 252, seed=args.seed)
+    sentiment = make_sentiment(stock_data, args.docs_per_hour, seed=args.seed)
+    hourly = feature_engineer.hourly_sentiment(sentiment.copy())
+
+    # Parity: the batch rows (minus Target, which needs the next bar) against a replay of the history
+    batch = batch_features(stock_data, sentiment)
+    states, max_difference = {}, 0.0
+    for symbol, data in stock_data.items():
+        states[symbol], replayed = feature_state.replay(data, hourly)
+        expected = batch[symbol].drop(columns=['Target'])
+        replayed = replayed.iloc[:-1]
+        if not expected.index.equals(replayed.index) or list(expected.columns) != list(replayed.columns):
+            raise SystemExit(f"Rows or columns differ for {symbol}")
+        left, right = expected.to_numpy(dtype='float64'), replayed.to_numpy(dtype='float64')
+        # Relative for large values, absolute near zero, where SentimentDiff and the lags often sit
+        max_difference = max(max_difference, (np.abs(left - right) / np.maximum(np.abs(left), 1.0)).max())
+    n_rows = sum(len(frame) for frame in batch.values())
+    print(f"Symbols: {len(stock_data)}, feature rows: {n_rows:,}")
+    print(f"Max difference, replay vs batch: {max_difference:.2e}")
+    if max_difference > 1e-9:
+        raise SystemExit("Replayed features differ from the batch features")
+
+    # One new bar per symbol: full rebuild vs one append per symbol
+    start = time.perf_counter()
+    batch_features(stock_data, sentiment)
+    rebuild_seconds = time.perf_counter() - start
+
+    latencies = []
+    for symbol, data in stock_data.items():
+        bar = data.iloc[-1].to_dict()
+        bar['Close'] *= 1.001
+        start = time.perf_counter()
+        states[symbol].append(bar, 0.1)
+        latencies.append(time.perf_counter() - start)
+    latencies = np.array(latencies) * 1e6
+    print(f"Full rebuild: {rebuild_seconds * 1000:.1f}ms")
+    print(f"Append one bar: p50 {np.percentile(latencies, 50):.0f}us, max {latencies.max():.0f}us per symbol")
+
+if __name__ == "__main__":
+    main()
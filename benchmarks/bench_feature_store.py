@@ -0,0 +1,120 @@
+# Memory of the training inputs held as engineer_features DataFrames vs FeatureMatrix objects, on
+# synthetic features for many symbols: the resident size of each layout, and the traced peak while
+# every fold's training and test rows are materialised the way the forest consumes them. Then checks
+# that training on the matrices gives the same scores and predictions as the DataFrame path did.
+# Run from the repository root: python -m benchmarks.bench_feature_store --symbols 500
+import argparse
+import logging
+import time
+import tracemalloc
+import numpy as np
+from benchmarks.bench_feature_state import make_sentiment, batch_features
+from benchmarks.bench_indicators import make_stock_data
+from feature_engineering import feature_engineer
+from feature_engineering.feature_store import to_feature_matrices
+from model_development import stock_prediction_model
+
+N_SPLITS = 5
+
+def fold_indices(n_rows):
+    from sklearn.model_selection import TimeSeriesSplit
+    return list(TimeSeriesSplit(n_splits=N_SPLITS).split(np.arange(n_rows))) + [(np.arange(n_rows), None)]
+
+def frame_folds(features):
+    # The DataFrame path: drop Target, copy each fold with iloc, and the float32 copy the forest makes
+    from sklearn.utils import check_array
+    for data in features.values():
+        X, y = data.drop(['Target'], axis=1), data['Target']
+        for train_index, test_index in fold_indices(len(X)):
+            X_train, y_train = check_array(X.iloc[train_index], dtype=np.float32), y.iloc[train_index]
+            if test_index is not None:
+                X_test = check_array(X.iloc[test_index], dtype=np.float32)
+
+def matrix_folds(matrices):
+    from sklearn.utils import check_array
+    for matrix in matrices.values():
+        jobs = stock_prediction_model.build_jobs({None: matrix}, N_SPLITS)
+        for X, y, windows in jobs.values():
+            for _, train_rows, test_rows in windows:
+                X_train, y_train = check_array(X[train_rows], dtype=np.float32), y[train_rows]
+                if test_rows is not None:
+                    X_test = check_array(X[test_rows], dtype=np.float32)
+
+def traced_peak(function, *args):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    result = function(*args)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current - base, peak - base
+
+def frame_bytes(features):
+    return sum(data.memory_usage(index=True, deep=True).sum() for data in features.values())
+
+def frame_reference(data):
+    # train_and_evaluate's scores and final model as they were computed on DataFrames
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.metrics import mean_squared_error
+
+    X, y = data.drop(['Target'], axis=1), data['Target']
+    test_mse = []
+    model = None
+    for train_index, test_index in fold_indices(len(X)):
+        model = RandomForestRegressor(n_estimators=stock_prediction_model.N_ESTIMATORS,
+                                      random_state=stock_prediction_model.RANDOM_STATE)
+        model.fit(X.iloc[train_index], y.iloc[train_index])
+        if test_index is not None:
+            test_mse.append(mean_squared_error(y.iloc[test_index], model.predict(X.iloc[test_index])))
+    return np.mean(test_mse), model.predict(X)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--symbols', type=int, default=500)
+    parser.add_argument('--days', type=int, default=120)
+    parser.add_argument('--train-symbols', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    logging.getLogger(feature_engineer.__name__).setLevel(logging.WARNING)
+    logging.getLogger(stock_prediction_model.__name__).setLevel(logging.WARNING)
+
+    stock_data = make_stock_data(args.symbols, args.days / 252, seed=args.seed)
+    features = batch_features(stock_data, make_sentiment(stock_data, 0.8, seed=args.seed))
+    del stock_data
+
+    # Imports and first-call caches outside the traced runs
+    first = dict(list(features.items())[:1])
+    frame_folds(first)
+    matrix_folds(to_feature_matrices(first))
+
+    start = time.perf_counter()
+    matrices, matrix_resident, conversion_peak = traced_peak(to_feature_matrices, features)
+    conversion_seconds = time.perf_counter() - start
+    _, _, frame_peak = traced_peak(frame_folds, features)
+    _, _, matrix_peak = traced_peak(matrix_folds, matrices)
+
+    mb = 1024 ** 2
+    resident = frame_bytes(features)
+    n_rows = sum(len(data) for data in features.values())
+    print(f"Symbols: {len(features)}, rows: {n_rows}, feature columns: {len(next(iter(matrices.values())).columns)}")
+    print(f"Resident features:  DataFrames {resident / mb:.1f}MB, matrices {matrix_resident / mb:.1f}MB "
+          f"({resident / matrix_resident:.1f}x smaller, converted in {conversion_seconds:.2f}s, "
+          f"peak {conversion_peak / mb:.1f}MB while converting)")
+    print(f"Fold inputs peak:   DataFrames {frame_peak / mb:.2f}MB, matrices {matrix_peak / mb:.2f}MB above resident")
+    print(f"Training run peak:  DataFrames {(resident + frame_peak) / mb:.1f}MB, "
+          f"matrices {(matrix_resident + matrix_peak) / mb:.1f}MB")
+
+    # Same scores and predictions from the matrices as from the frames
+    subset = dict(list(features.items())[:args.train_symbols])
+    results = stock_prediction_model.train_and_evaluate(to_feature_matrices(subset), n_splits=N_SPLITS)
+    for symbol, data in subset.items():
+        test_mse, predictions = frame_reference(data)
+        matrix = matrices[symbol]
+        if results[symbol]['test_mse'] != test_mse or not np.array_equal(results[symbol]['model'].predict(matrix.X),
+                                                                         predictions):
+            raise SystemExit(f"Training on the matrix differs from the DataFrame path for {symbol}")
+    print(f"Training on matrices matches the DataFrame path for {len(subset)} symbols")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# Per-symbol pandas indicators vs the stacked NumPy engine on synthetic hourly bars, with a parity
+# check of every indicator column and a check that the input frames are left untouched.
+# Run from the repository root: python -m benchmarks.bench_indicators --symbols 500 --years 2
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from data_preprocessing import stock_data_preparer
+
+# Regular-session hourly bars per trading day
+BARS_PER_DAY = 7
+
+def make_stock_data(n_symbols, years, seed=42):
+    rng = np.random.default_rng(seed)
+    days = pd.bdate_range('2022-01-03', periods=int(252 * years), tz='UTC')
+    index = (days.repeat(BARS_PER_DAY) + pd.to_timedelta(np.tile(np.arange(14, 14 + BARS_PER_DAY), len(days)), unit='h'))
+    stock_data = {}
+    for i in range(n_symbols):
+        # Some symbols listed partway through, so histories have different lengths
+        start = int(rng.integers(0, len(index) // 4)) if i % 5 == 0 else 0
+        n_bars = len(index) - start
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, size=n_bars)))
+        # Flat stretches, as in thinly traded hours, exercise the zero-loss and zero-variance cases
+        close[rng.random(n_bars) < 0.02] = np.nan
+        close = pd.Series(close).ffill().bfill().to_numpy()
+        stock_data[f'SYM{i}'] = pd.DataFrame({
+            'Open': close, 'High': close * 1.01, 'Low': close * 0.99, 'Close': close,
+            'Volume': rng.integers(1000, 100000, size=n_bars), 'Dividends': 0.0, 'Stock Splits': 0.0,
+        }, index=index[start:])
+    return stock_data
+
+def max_relative_difference(expected, actual):
+    differences = []
+    for symbol, frame in expected.items():
+        if not frame.index.equals(actual[symbol].index) or list(frame.columns) != list(actual[symbol].columns):
+            raise SystemExit(f"Rows or columns differ for {symbol}")
+        left = frame[stock_data_preparer.INDICATOR_COLUMNS].to_numpy()
+        right = actual[symbol][stock_data_preparer.INDICATOR_COLUMNS].to_numpy()
+        differences.append((np.abs(left - right) / np.maximum(np.abs(left), 1e-12)).max(initial=0))
+    return max(differences)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--symbols', type=int, default=500)
+    parser.add_argument('--years', type=float, default=2)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    stock_data = make_stock_data(args.symbols, args.years, seed=args.seed)
+    originals = {symbol: data.copy() for symbol, data in stock_data.items()}
+    n_bars = sum(len(data) for data in stock_data.values())
+
+    start = time.perf_counter()
+    per_symbol = stock_data_preparer.prepare_stock_data(stock_data, engine='pandas')
+    pandas_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectorized = stock_data_preparer.prepare_stock_data(stock_data, engine='vectorized')
+    vectorized_seconds = time.perf_counter() - start
+
+    closes, _ = stock_data_preparer.stack_closes(stock_data)
+    start = time.perf_counter()
+    stock_data_preparer.compute_indicators(closes)
+    arrays_seconds = time.perf_counter() - start
+
+    print(f"Symbols: {len(stock_data)}, bars: {n_bars:,}")
+    print(f"Per-symbol pandas: {pandas_seconds:.3f}s")
+    print(f"Vectorized:        {vectorized_seconds:.3f}s")
+    print(f"  of which indicator arrays: {arrays_seconds:.3f}s")
+    print(f"Speedup: {pandas_seconds / vectorized_seconds:.1f}x")
+    print(f"Max relative difference: {max_relative_difference(per_symbol, vectorized):.2e}")
+    if any(not stock_data[symbol].equals(originals[symbol]) for symbol in stock_data):
+        raise SystemExit("Input frames were modified")
+    print("Input frames unchanged")
+
+if __name__ == "__main__":
+    main()
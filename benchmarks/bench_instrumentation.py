@@ -0,0 +1,81 @@
+# Cost of measuring every stage with pipeline.instrumentation.RunReport, on the stages of
+# bench_pipeline_runner without collector latency: no report, a report, a report with cProfile on
+# training, and a report with tracemalloc. Checks the report's stages, sections and row counts, and
+# that compare() flags a stage that got slower.
+# Run from the repository root: python -m benchmarks.bench_instrumentation --posts 50000
+import argparse
+import copy
+import json
+import logging
+import os
+import tempfile
+import time
+from benchmarks.bench_pipeline_runner import build_stages, make_inputs
+from feature_engineering import feature_engineer
+from model_development import stock_prediction_model
+from pipeline import instrumentation, runner
+
+def timed_run(stages, report, max_workers=3):
+    start = time.perf_counter()
+    runner.run_pipeline(stages, max_workers=max_workers, report=report)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--news', type=int, default=5_000)
+    parser.add_argument('--posts', type=int, default=50_000)
+    parser.add_argument('--symbols', type=int, default=2)
+    parser.add_argument('--days', type=int, default=28)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    for module in (feature_engineer, stock_prediction_model, runner):
+        logging.getLogger(module.__name__).setLevel(logging.WARNING)
+
+    inputs = make_inputs(args.news, args.posts, args.symbols, args.days, args.seed)
+    stages = build_stages(inputs, 0.0, {})
+    # Imports and first-call caches outside the timed runs
+    timed_run(stages, None)
+
+    with tempfile.TemporaryDirectory() as path:
+        runs = {
+            'no report': None,
+            'report': instrumentation.RunReport(),
+            'report, cProfile on training': instrumentation.RunReport(profile_stages=['training'],
+                                                                      profile_dir=os.path.join(path, 'profiles')),
+        }
+        seconds = {label: timed_run(stages, report) for label, report in runs.items()}
+        traced = instrumentation.RunReport(trace_memory=True)
+        seconds['report, tracemalloc'] = timed_run(stages, traced, max_workers=1)
+        for label, value in seconds.items():
+            print(f"{label + ':':<31}{value:.2f}s ({value / seconds['no report'] - 1:+.1%})")
+
+        report = runs['report'].write(os.path.join(path, 'run.json'))
+        with open(os.path.join(path, 'run.json')) as f:
+            if json.load(f) != json.loads(json.dumps(report)):
+                raise SystemExit("Written report differs from the report")
+        print(f"Stages: {', '.join(report['stages'])}")
+        for line in instrumentation.summary_lines(report):
+            print(f"  {line}")
+        sentiment = report['stages']['sentiment']['metrics']
+        expected_rows = args.news + args.posts
+        if set(sentiment['sections']) != {'scoring', 'aggregation'} or sentiment['sections']['scoring']['rows'] != expected_rows:
+            raise SystemExit("Sentiment sections missing from the report")
+        if report['stages']['news']['metrics']['rows'] != args.news:
+            raise SystemExit("Wrong row count for the news stage")
+
+        profiled = runs['report, cProfile on training'].to_dict()['stages']['training']['metrics']
+        busiest = max(profiled['top_functions'], key=lambda row: row['own_seconds'])
+        print(f"Most own time under training (cProfile): {busiest['function']} {busiest['own_seconds']:.2f}s")
+        traced_peaks = {name: stage['metrics']['traced_peak_mb'] for name, stage in traced.to_dict()['stages'].items()}
+        print("Traced peaks: " + ', '.join(f"{name} {peak:.1f}MB" for name, peak in traced_peaks.items()))
+
+        slower = copy.deepcopy(report)
+        slower['stages']['training']['metrics']['wall_seconds'] *= 2
+        lines, regressed = instrumentation.compare(report, slower)
+        if not regressed or not any(line.startswith('training:') and '!' in line for line in lines):
+            raise SystemExit("compare() did not flag the slower training stage")
+        print("compare() flags a training stage that takes twice as long")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# Training with a model registry: a cold run, a repeat run on unchanged features, a run where one
+# symbol gained a row, and a fresh process-style registry loading one symbol lazily.
+# Run from the repository root: python -m benchmarks.bench_model_registry --symbols 4
+import argparse
+import logging
+import tempfile
+import time
+import numpy as np
+from benchmarks.bench_feature_state import make_sentiment, batch_features
+from benchmarks.bench_indicators import make_stock_data
+from feature_engineering import feature_engineer
+from model_development import stock_prediction_model
+from model_development.model_registry import ModelRegistry
+
+def run(features, registry):
+    start = time.perf_counter()
+    results = stock_prediction_model.train_and_evaluate(features, registry=registry)
+    return results, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--symbols', type=int, default=4)
+    parser.add_argument('--days', type=int, default=60)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    logging.getLogger(feature_engineer.__name__).setLevel(logging.WARNING)
+    logging.getLogger(stock_prediction_model.__name__).setLevel(logging.WARNING)
+
+    stock_data = make_stock_data(args.symbols, args.days / 252, seed=args.seed)
+    features = batch_features(stock_data, make_sentiment(stock_data, 0.8, seed=args.seed))
+    symbols = list(features)
+
+    with tempfile.TemporaryDirectory() as path:
+        cold, cold_seconds = run(features, ModelRegistry(path))
+
+        registry = ModelRegistry(path)
+        repeat, repeat_seconds = run(features, registry)
+        X = features[symbols[0]].drop(['Target'], axis=1).to_numpy()
+        if repeat.keys() != cold.keys() or any(
+                repeat[symbol]['test_mse'] != cold[symbol]['test_mse']
+                or not np.array_equal(repeat[symbol]['model'].predict(X), cold[symbol]['model'].predict(X))
+                for symbol in symbols):
+            raise SystemExit("Stored results differ from the trained ones")
+        repeat_stats = dict(registry.stats)
+
+        # One symbol gets one more hour of data; only that symbol should retrain
+        changed = dict(features)
+        changed[symbols[0]] = features[symbols[0]].iloc[:-1]
+        registry = ModelRegistry(path)
+        _, changed_seconds = run(changed, registry)
+        changed_stats = dict(registry.stats)
+
+        start = time.perf_counter()
+        ModelRegistry(path).load(symbols[-1])['model'].predict(X)
+        load_seconds = time.perf_counter() - start
+
+    print(f"Symbols: {len(symbols)}")
+    print(f"Cold run:        {cold_seconds:.2f}s")
+    print(f"Unchanged rerun: {repeat_seconds:.2f}s {repeat_stats}")
+    print(f"One changed:     {changed_seconds:.2f}s {changed_stats}")
+    print(f"Lazy load and predict one symbol: {load_seconds * 1000:.0f}ms")
+    if repeat_stats['misses'] or changed_stats['misses'] != 1:
+        raise SystemExit("Unexpected registry hits or misses")
+    print("Stored results match the trained ones")
+
+if __name__ == "__main__":
+    main()
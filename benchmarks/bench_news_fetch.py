@@ -0,0 +1,101 @@
+# Sequential vs concurrent NewsAPI collection against a local stub server that mimics the
+# /v2/everything endpoint, with configurable latency and rate-limit (429) responses.
+# Run from the repository root: python -m benchmarks.bench_news_fetch --articles-per-day 300 --latency 0.05
+import argparse
+import json
+import random
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from data_collection import news_collector
+from data_collection.http_client import RequestStats
+
+def make_stub_handler(articles_per_day, latency, rate_limit_probability, seed):
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    class StubNewsAPIHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            query = parse_qs(urlparse(self.path).query)
+            day = query['from'][0]
+            page = int(query['page'][0])
+            page_size = int(query['pageSize'][0])
+            time.sleep(latency)
+
+            with lock:
+                rate_limited = rng.random() < rate_limit_probability
+            if rate_limited:
+                self.send_response(429)
+                self.send_header('Retry-After', '0')
+                self.end_headers()
+                return
+
+            first = (page - 1) * page_size
+            articles = [{
+                'source': {'name': 'Stub Wire'},
+                'title': f'Headline {day} #{i}',
+                'description': f'Stocks moved on {day}, story {i}.',
+                'content': None,
+                'publishedAt': f'{day}T{i % 24:02d}:00:00Z',
+                'url': f'https://example.com/{day}/{i}',
+            } for i in range(first, min(first + page_size, articles_per_day))]
+            body = json.dumps({'status': 'ok', 'totalResults': articles_per_day, 'articles': articles}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubNewsAPIHandler
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--articles-per-day', type=int, default=300)
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds the stub waits before answering')
+    parser.add_argument('--rate-limit-probability', type=float, default=0.02)
+    parser.add_argument('--max-in-flight', type=int, default=8)
+    parser.add_argument('--requests-per-second', type=float, default=50.0)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    handler = make_stub_handler(args.articles_per_day, args.latency, args.rate_limit_probability, args.seed)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_address[1]}/v2/everything'
+
+    try:
+        # The sequential path has no retries, so it only runs cleanly without simulated rate limiting
+        handler_without_429 = make_stub_handler(args.articles_per_day, args.latency, 0.0, args.seed)
+        sequential_server = ThreadingHTTPServer(('127.0.0.1', 0), handler_without_429)
+        threading.Thread(target=sequential_server.serve_forever, daemon=True).start()
+        sequential_url = f'http://127.0.0.1:{sequential_server.server_address[1]}/v2/everything'
+
+        with tempfile.TemporaryDirectory() as save_path:
+            start = time.perf_counter()
+            sequential = news_collector.collect_news(api_key='stub', save_path=save_path, base_url=sequential_url)
+            sequential_seconds = time.perf_counter() - start
+        sequential_server.shutdown()
+
+        with tempfile.TemporaryDirectory() as save_path:
+            stats = RequestStats()
+            start = time.perf_counter()
+            concurrent = news_collector.collect_news(
+                api_key='stub', save_path=save_path, base_url=base_url, concurrent=True,
+                max_in_flight=args.max_in_flight, requests_per_second=args.requests_per_second,
+                max_retries=8, stats=stats
+            )
+            concurrent_seconds = time.perf_counter() - start
+    finally:
+        server.shutdown()
+
+    print(f"Sequential: {len(sequential)} articles in {sequential_seconds:.2f}s")
+    print(f"Concurrent: {len(concurrent)} articles in {concurrent_seconds:.2f}s ({sequential_seconds / concurrent_seconds:.1f}x)")
+    print(json.dumps(stats.summary(), indent=4))
+
+if __name__ == "__main__":
+    main()
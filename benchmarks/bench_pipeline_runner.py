@@ -0,0 +1,112 @@
+# The pipeline stages run through pipeline.runner on synthetic data: collection stages that wait
+# --latency seconds (standing in for the APIs) and the repository's sentiment aggregation, price
+# preparation, feature engineering and training. Compares running one stage at a time with running the
+# collectors side by side, then re-runs from checkpoints: unchanged inputs, --from-stage training and
+# --only features. Checks the re-trained results match the first run.
+# Run from the repository root: python -m benchmarks.bench_pipeline_runner --latency 2.0
+import argparse
+import logging
+import tempfile
+import time
+import pandas as pd
+from benchmarks.bench_indicators import make_stock_data
+from benchmarks.bench_sentiment_aggregation import make_documents
+from benchmarks.bench_text_cleaner import make_raw_corpus
+from data_preprocessing import process_sentiment_data, sentiment_analyzer, stock_data_preparer
+from feature_engineering import feature_engineer
+from feature_engineering.feature_store import to_feature_matrices
+from model_development import stock_prediction_model
+from pipeline import runner
+from pipeline.instrumentation import section
+
+def make_inputs(n_news, n_posts, n_symbols, days, seed):
+    news, posts, _ = make_documents(n_news, n_posts, days, seed=seed)
+    texts = make_raw_corpus(n_news + n_posts, seed=seed)
+    news['content'] = texts.iloc[:n_news].to_numpy()
+    posts['text'] = texts.iloc[n_news:].to_numpy()
+    hours = pd.date_range(news['date'].min().floor('H'), periods=days * 24, freq='H')
+    stock_data = {symbol: data.set_axis(hours[-len(data):], axis=0)
+                  for symbol, data in make_stock_data(n_symbols, days * 24 / 7 / 252, seed=seed).items()}
+    return news, posts, stock_data
+
+def build_stages(inputs, latency, results):
+    news, posts, stock_data = inputs
+
+    def collected(data):
+        def collect():
+            time.sleep(latency)
+            return data
+        return collect
+
+    def sentiment(news, social_media):
+        # Cleaning needs NLTK's stopwords, which may not be available offline; the raw text is scored
+        text = pd.concat([news['content'], social_media['text']])
+        with section('scoring', rows=len(text)):
+            scores = sentiment_analyzer.analyze_sentiment(text)
+        with section('aggregation', rows=len(text)):
+            return process_sentiment_data.aggregate_sentiment(news, social_media, scores)
+
+    def prepared_prices(prices):
+        return stock_data_preparer.prepare_stock_data(prices)
+
+    def features(sentiment, prepared_prices):
+        return to_feature_matrices(feature_engineer.engineer_features(sentiment, prepared_prices))
+
+    def training(features):
+        results['training'] = stock_prediction_model.train_and_evaluate(features, n_workers=1)
+        return results['training']
+
+    return [
+        runner.Stage('news', collected(news)),
+        runner.Stage('social_media', collected(posts)),
+        runner.Stage('prices', collected(stock_data)),
+        runner.Stage('sentiment', sentiment, inputs=['news', 'social_media']),
+        runner.Stage('prepared_prices', prepared_prices, inputs=['prices']),
+        runner.Stage('features', features, inputs=['sentiment', 'prepared_prices']),
+        runner.Stage('training', training, inputs=['features']),
+    ]
+
+def timed_run(stages, store, **kwargs):
+    start = time.perf_counter()
+    status = runner.run_pipeline(stages, store=store, **kwargs)
+    return status, time.perf_counter() - start
+
+def scores(results):
+    return {symbol: (result['test_mse'], result['train_mse']) for symbol, result in results.items()}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency', type=float, default=2.0, help='seconds each collection stage waits')
+    parser.add_argument('--news', type=int, default=5_000)
+    parser.add_argument('--posts', type=int, default=50_000)
+    parser.add_argument('--symbols', type=int, default=2)
+    parser.add_argument('--days', type=int, default=28)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    for module in (feature_engineer, stock_prediction_model, runner):
+        logging.getLogger(module.__name__).setLevel(logging.WARNING)
+
+    inputs = make_inputs(args.news, args.posts, args.symbols, args.days, args.seed)
+    with tempfile.TemporaryDirectory() as sequential_path, tempfile.TemporaryDirectory() as path:
+        results = {}
+        stages = build_stages(inputs, args.latency, results)
+        _, sequential_seconds = timed_run(stages, runner.CheckpointStore(sequential_path), max_workers=1)
+        status, seconds = timed_run(stages, runner.CheckpointStore(path), max_workers=3)
+        first = scores(results['training'])
+        print(f"Cold run, one stage at a time: {sequential_seconds:.2f}s")
+        print(f"Cold run, collectors side by side: {seconds:.2f}s ({sequential_seconds / seconds:.1f}x)")
+
+        store = runner.CheckpointStore(path)
+        for label, kwargs in (('Re-run, inputs unchanged', {}), ('--from-stage training', {'from_stage': 'training'}),
+                              ('--only features', {'only': ['features']})):
+            results.clear()
+            status, seconds = timed_run(stages, store, **kwargs)
+            print(f"{label + ':':<27}{seconds:.2f}s  {status}")
+            if 'training' in results and scores(results['training']) != first:
+                raise SystemExit(f"{label} trained different models")
+        if status.get('features') != 'ran' or set(status) != {'features', 'sentiment', 'prepared_prices'}:
+            raise SystemExit("--only features ran other stages")
+
+if __name__ == "__main__":
+    main()
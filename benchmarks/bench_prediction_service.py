@@ -0,0 +1,115 @@
+# Batch scoring through PredictionService vs DataFrame predictions per symbol, on final models fitted
+# to synthetic features. Checks both give the same predictions and exercises the stdin/stdout and
+# HTTP front ends.
+# Run from the repository root: python -m benchmarks.bench_prediction_service --symbols 8 --batch-size 64
+import argparse
+import io
+import json
+import logging
+import threading
+import time
+import urllib.request
+import numpy as np
+import pandas as pd
+from benchmarks.bench_feature_state import make_sentiment, batch_features
+from benchmarks.bench_indicators import make_stock_data
+from feature_engineering import feature_engineer
+from feature_engineering.feature_store import as_feature_matrix
+from model_development import prediction_service, stock_prediction_model
+
+def train_final_models(features):
+    results = {}
+    for symbol, data in features.items():
+        matrix = as_feature_matrix(data)
+        fitted = stock_prediction_model.fit_forest(matrix.X, matrix.y,
+                                                   [(stock_prediction_model.FINAL_FOLD, slice(0, len(matrix)), None)])
+        results[symbol] = {'model': fitted[stock_prediction_model.FINAL_FOLD]['model'],
+                           'feature_importance': dict.fromkeys(matrix.columns)}
+    return results
+
+def make_batches(features, n_batches, batch_size, seed=42):
+    rng = np.random.default_rng(seed)
+    symbols = list(features)
+    batches = []
+    for _ in range(n_batches):
+        rows = []
+        for symbol in rng.choice(symbols, size=batch_size):
+            data = features[symbol]
+            row = data.drop(columns=['Target']).iloc[int(rng.integers(len(data)))].to_dict()
+            row['symbol'] = symbol
+            rows.append(row)
+        batches.append(rows)
+    return batches
+
+def predict_with_dataframes(results, rows):
+    # What plot_stock_prediction does, per symbol in the batch
+    frame = pd.DataFrame(rows)
+    predictions = pd.Series(np.nan, index=frame.index)
+    for symbol, group in frame.groupby('symbol'):
+        columns = list(results[symbol]['feature_importance'])
+        predictions[group.index] = results[symbol]['model'].predict(group[columns].to_numpy())
+    return predictions.to_numpy()
+
+def percentiles(latencies):
+    latencies = np.array(latencies) * 1000
+    return f"p50 {np.percentile(latencies, 50):.2f}ms, p99 {np.percentile(latencies, 99):.2f}ms"
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--symbols', type=int, default=8)
+    parser.add_argument('--days', type=int, default=40)
+    parser.add_argument('--batches', type=int, default=200)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    logging.getLogger(feature_engineer.__name__).setLevel(logging.WARNING)
+    logging.getLogger(stock_prediction_model.__name__).setLevel(logging.WARNING)
+
+    stock_data = make_stock_data(args.symbols, args.days / 252, seed=args.seed)
+    features = batch_features(stock_data, make_sentiment(stock_data, 0.8, seed=args.seed))
+    results = train_final_models(features)
+    service = prediction_service.PredictionService(results)
+    batches = make_batches(features, args.batches, args.batch_size, seed=args.seed)
+
+    dataframe_latencies = []
+    for rows in batches:
+        start = time.perf_counter()
+        expected = predict_with_dataframes(results, rows)
+        dataframe_latencies.append(time.perf_counter() - start)
+        actual = np.array([response['prediction'] for response in service.predict_batch(rows)])
+        if not np.array_equal(expected, actual):
+            raise SystemExit("Service predictions differ from DataFrame predictions")
+
+    print(f"Symbols: {len(results)}, batches: {len(batches)} x {args.batch_size} rows")
+    print(f"DataFrame per symbol: {percentiles(dataframe_latencies)}")
+    summary = service.stats.summary()
+    print(f"PredictionService:    p50 {summary['latency_p50_ms']:.2f}ms, p99 {summary['latency_p99_ms']:.2f}ms")
+
+    # stdin/stdout: one request per line
+    stdin = io.StringIO(''.join(json.dumps({'rows': rows}) + '\n' for rows in batches[:10]))
+    stdout = io.StringIO()
+    prediction_service.serve_stdio(service, stdin, stdout)
+    if len(stdout.getvalue().splitlines()) != 10:
+        raise SystemExit("stdin/stdout mode did not answer every request")
+
+    # HTTP on an ephemeral port
+    server = prediction_service.make_http_server(service, '127.0.0.1', 0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+
+    http_latencies = []
+    for rows in batches[:50]:
+        request = urllib.request.Request(f'http://127.0.0.1:{port}/predict', data=json.dumps({'rows': rows}).encode(),
+                                         headers={'Content-Type': 'application/json'})
+        start = time.perf_counter()
+        with urllib.request.urlopen(request) as response:
+            json.load(response)
+        http_latencies.append(time.perf_counter() - start)
+    server.shutdown()
+    server.server_close()
+    print(f"HTTP round trip:      {percentiles(http_latencies)}")
+    print("Service predictions match DataFrame predictions")
+
+if __name__ == "__main__":
+    main()
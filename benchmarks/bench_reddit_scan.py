@@ -0,0 +1,97 @@
+# Per-day vs single-pass Reddit collection against a fake PRAW client whose listings are generated
+# from a seeded synthetic feed. Reports listing items walked, wall time and checks both modes agree.
+# Run from the repository root: python -m benchmarks.bench_reddit_scan --posts-per-day 200
+import argparse
+import tempfile
+import threading
+import time
+from datetime import datetime
+import numpy as np
+from data_collection import social_media_collector
+
+class FakeSubmission:
+    def __init__(self, created_utc, title, selftext, author, score, num_comments):
+        self.created_utc = created_utc
+        self.title = title
+        self.selftext = selftext
+        self.author = author
+        self.score = score
+        self.num_comments = num_comments
+
+class FakeSubreddit:
+    def __init__(self, submissions, counter, page_latency):
+        self.submissions = submissions
+        self.counter = counter
+        self.page_latency = page_latency
+
+    def new(self, limit=None):
+        # PRAW fetches listings 100 items per request
+        for i, submission in enumerate(self.submissions[:limit]):
+            if i % 100 == 0:
+                time.sleep(self.page_latency)
+            with self.counter['lock']:
+                self.counter['items'] += 1
+            yield submission
+
+class FakeReddit:
+    def __init__(self, listings, counter, page_latency):
+        self.listings = listings
+        self.counter = counter
+        self.page_latency = page_latency
+        with counter['lock']:
+            counter['clients'] += 1
+
+    def subreddit(self, name):
+        return FakeSubreddit(self.listings[name], self.counter, self.page_latency)
+
+def make_listings(subreddits, posts_per_day, days=31, seed=42):
+    # Newest first, like subreddit.new()
+    rng = np.random.default_rng(seed)
+    now = datetime.utcnow().timestamp()
+    listings = {}
+    for name in subreddits:
+        n_posts = posts_per_day * days
+        created = np.sort(now - rng.uniform(0, days * 86400, size=n_posts))[::-1]
+        listings[name] = [
+            FakeSubmission(float(ts), f'{name} post {i}', 'to the moon' if i % 3 else None, f'user{i % 97}',
+                           int(rng.integers(0, 5000)), int(rng.integers(0, 300)))
+            for i, ts in enumerate(created)
+        ]
+    return listings
+
+def run(listings, page_latency, **kwargs):
+    counter = {'items': 0, 'clients': 0, 'lock': threading.Lock()}
+    with tempfile.TemporaryDirectory() as save_path:
+        start = time.perf_counter()
+        df = social_media_collector.collect_social_media_data(
+            save_path=save_path, reddit_factory=lambda: FakeReddit(listings, counter, page_latency),
+            subreddits=list(listings), **kwargs
+        )
+        seconds = time.perf_counter() - start
+    return df, seconds, counter
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--posts-per-day', type=int, default=30)
+    parser.add_argument('--page-latency', type=float, default=0.0, help='seconds per simulated 100-item listing request')
+    parser.add_argument('--max-workers', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    import logging
+    logging.getLogger(social_media_collector.__name__).setLevel(logging.WARNING)
+
+    listings = make_listings(social_media_collector.SUBREDDITS, args.posts_per_day, seed=args.seed)
+    per_day, per_day_seconds, per_day_counter = run(listings, args.page_latency)
+    single, single_seconds, single_counter = run(listings, args.page_latency, single_pass=True, max_workers=args.max_workers)
+
+    print(f"Per-day:     {len(per_day)} posts, {per_day_counter['items']} listing items, "
+          f"{per_day_counter['clients']} clients, {per_day_seconds:.2f}s")
+    print(f"Single-pass: {len(single)} posts, {single_counter['items']} listing items, "
+          f"{single_counter['clients']} clients, {single_seconds:.2f}s")
+    if not per_day.equals(single):
+        raise SystemExit("Single-pass output differs from the per-day path")
+    print("Outputs are identical")
+
+if __name__ == "__main__":
+    main()
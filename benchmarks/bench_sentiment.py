@@ -0,0 +1,49 @@
+# Compare the per-row TextBlob sentiment path with the batch lexicon engine.
+# Run from the repository root: python -m benchmarks.bench_sentiment --rows 20000
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from data_preprocessing import sentiment_analyzer
+
+# Filler words that are not in the polarity lexicon, mixed in with lexicon words and negations
+FILLER_WORDS = ['stock', 'market', 'shares', 'earnings', 'fed', 'rate', 'tesla', 'apple', 'q', 'yolo', 'calls', 'puts']
+
+def make_cleaned_corpus(n_rows, seed=42, unique_fraction=0.5):
+    rng = np.random.default_rng(seed)
+    # Cleaned text only contains lowercase letters, so lexicon entries like "n't" or "13th" never occur
+    lexicon_words = sorted(w for w in sentiment_analyzer.load_polarity_lexicon() if w.isalpha() and w.islower())
+    negations = sorted(w for w in sentiment_analyzer.NEGATIONS if w.isalpha())
+    vocabulary = np.array(lexicon_words + FILLER_WORDS * 50 + negations * 20)
+    n_unique = max(1, int(n_rows * unique_fraction))
+    lengths = rng.integers(3, 40, size=n_unique)
+    docs = [' '.join(rng.choice(vocabulary, size=length)) for length in lengths]
+    # Repeat some documents, as reposted headlines and cross-posts do in the real data
+    return pd.Series(rng.choice(np.array(docs, dtype=object), size=n_rows))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    corpus = make_cleaned_corpus(args.rows, seed=args.seed)
+    sentiment_analyzer.load_polarity_lexicon()
+
+    start = time.perf_counter()
+    textblob_scores = sentiment_analyzer.analyze_sentiment(corpus, engine='textblob')
+    textblob_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch_scores = sentiment_analyzer.analyze_sentiment(corpus, engine='batch')
+    batch_seconds = time.perf_counter() - start
+
+    max_abs_diff = np.abs(textblob_scores.to_numpy() - batch_scores.to_numpy()).max()
+    print(f"Rows: {len(corpus)}")
+    print(f"TextBlob per-row: {textblob_seconds:.3f}s ({len(corpus) / textblob_seconds:,.0f} rows/s)")
+    print(f"Batch engine:     {batch_seconds:.3f}s ({len(corpus) / batch_seconds:,.0f} rows/s)")
+    print(f"Speedup: {textblob_seconds / batch_seconds:.1f}x")
+    print(f"Max absolute difference: {max_abs_diff:.2e}")
+
+if __name__ == "__main__":
+    main()
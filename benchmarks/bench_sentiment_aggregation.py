@@ -0,0 +1,116 @@
+# Hourly sentiment from synthetic news and Reddit documents: the previous path (drop every document
+# sharing a timestamp with an earlier one, then an hourly mean) vs aggregate_sentiment, which keeps
+# every document and adds per-source counts and weighted means. Checks the aggregates against a pandas
+# groupby, reports traced peak memory, and checks both feature engines agree with the extra columns.
+# Run from the repository root: python -m benchmarks.bench_sentiment_aggregation --posts 2000000
+import argparse
+import logging
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from benchmarks.bench_feature_engineer import max_difference
+from benchmarks.bench_indicators import make_stock_data
+from data_preprocessing import process_sentiment_data, stock_data_preparer
+from feature_engineering import feature_engineer
+
+def make_documents(n_news, n_posts, days, seed=42):
+    # Timestamps to the second, as the APIs return them, over the last days
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp.now(tz='UTC').floor('s')
+    def times(n):
+        return pd.Series(end - pd.to_timedelta(rng.integers(0, days * 24 * 3600, size=n), unit='s'))
+    news = pd.DataFrame({'date': times(n_news)})
+    posts = pd.DataFrame({
+        'created_at': times(n_posts),
+        'upvotes': rng.zipf(2.0, size=n_posts) - 1,
+        'num_comments': rng.poisson(3, size=n_posts),
+    })
+    scores = np.round(rng.normal(0.05, 0.3, size=n_news + n_posts), 3)
+    return news, posts, scores
+
+def previous_hourly(news, posts, scores):
+    # What process_sentiment_data + hourly_sentiment did before
+    dates = pd.to_datetime(news['date'].tolist() + posts['created_at'].tolist())
+    frame = pd.DataFrame({'date': dates, 'score': scores}).drop_duplicates(subset='date', keep='first')
+    frame = frame.set_index('date')
+    frame.index = frame.index.tz_localize(None)
+    return frame['score'].sort_index().resample('H').mean(), len(frame)
+
+def groupby_reference(news, posts, scores):
+    documents = pd.concat([
+        pd.DataFrame({'date': news['date'], 'source': 'news', 'upvotes': 0, 'num_comments': 0}),
+        pd.DataFrame({'date': posts['created_at'], 'source': 'reddit', 'upvotes': posts['upvotes'],
+                      'num_comments': posts['num_comments']}),
+    ], ignore_index=True)
+    documents['score'] = scores
+    documents['hour'] = documents['date'].dt.tz_localize(None).dt.floor('H')
+    expected = pd.DataFrame({'score': documents.groupby('hour')['score'].mean(),
+                             'count': documents.groupby('hour').size()})
+    for source, group in documents.groupby('source'):
+        expected[f'{source}_count'] = group.groupby('hour').size()
+        expected[f'{source}_mean'] = group.groupby('hour')['score'].mean()
+    reddit = documents[documents['source'] == 'reddit']
+    for weight, column in (('upvote', 'upvotes'), ('comment', 'num_comments')):
+        weights = 1 + reddit[column].clip(lower=0)
+        expected[f'reddit_{weight}_mean'] = ((weights * reddit['score']).groupby(reddit['hour']).sum()
+                                             / weights.groupby(reddit['hour']).sum())
+    return expected
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--news', type=int, default=200_000)
+    parser.add_argument('--posts', type=int, default=2_000_000)
+    parser.add_argument('--days', type=int, default=28)
+    parser.add_argument('--chunk-size', type=int, default=1_000_000)
+    parser.add_argument('--symbols', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    logging.getLogger(feature_engineer.__name__).setLevel(logging.WARNING)
+
+    news, posts, scores = make_documents(args.news, args.posts, args.days, seed=args.seed)
+    n_documents = len(scores)
+
+    start = time.perf_counter()
+    previous, previous_kept = previous_hourly(news, posts, scores)
+    previous_seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    hourly = process_sentiment_data.aggregate_sentiment(news, posts, scores, chunk_size=args.chunk_size)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    print(f"Documents: {n_documents:,} over {len(hourly)} hours")
+    print(f"Previous: {previous_seconds:.2f}s, kept {previous_kept:,} documents "
+          f"({100 * (1 - previous_kept / n_documents):.0f}% dropped as duplicate timestamps)")
+    print(f"aggregate_sentiment: {seconds:.2f}s, kept {int(hourly['count'].sum()):,} documents, "
+          f"traced peak {peak / 1024 ** 2:.0f}MB (input scores {scores.nbytes / 1024 ** 2:.0f}MB)")
+    changed = (hourly['score'] - previous.reindex(hourly.index)).abs().mean()
+    print(f"Mean absolute change in hourly sentiment from keeping every document: {changed:.4f}")
+
+    expected = groupby_reference(news, posts, scores).reindex(hourly.index)
+    difference = np.nanmax(np.abs(hourly.to_numpy() - expected[hourly.columns].to_numpy()))
+    if not (np.isnan(hourly.to_numpy()) == np.isnan(expected[hourly.columns].to_numpy())).all() or difference > 1e-9:
+        raise SystemExit("Aggregates differ from the pandas groupby")
+    print(f"Max difference from a pandas groupby: {difference:.2e}")
+
+    # The aggregates as features, through both engines
+    index = pd.date_range(hourly.index[0], hourly.index[-1], freq='H', tz='UTC')
+    stock_data = {symbol: data.set_axis(index[-len(data):], axis=0)
+                  for symbol, data in make_stock_data(args.symbols, len(index) / 7 / 252, seed=args.seed).items()}
+    prepared = stock_data_preparer.prepare_stock_data(stock_data)
+    features = {engine: feature_engineer.engineer_features(
+                    hourly, {symbol: data.copy(deep=False) for symbol, data in prepared.items()}, engine=engine,
+                    sentiment_columns=process_sentiment_data.SOURCE_COLUMNS)
+                for engine in ('pandas', 'vectorized')}
+    difference = max_difference(features['pandas'], features['vectorized'])
+    print(f"Feature columns with source aggregates: {len(next(iter(features['vectorized'].values())).columns)}, "
+          f"max difference between engines {difference:.2e}")
+    if difference > 1e-9:
+        raise SystemExit("Vectorized features differ from the pandas features")
+
+if __name__ == "__main__":
+    main()
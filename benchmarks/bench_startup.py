@@ -0,0 +1,86 @@
+# Cold-start import time of each pipeline stage, measured with python -X importtime in a fresh interpreter.
+# Run from the repository root: python -m benchmarks.bench_startup --repeat 3
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules a run of each stage has to import before it can do any work
+STAGES = {
+    'news_collection': ['data_collection.news_collector'],
+    'social_media_collection': ['data_collection.social_media_collector'],
+    'price_collection': ['data_collection.stock_price_collector'],
+    'text_cleaning': ['data_preprocessing.text_cleaner'],
+    'sentiment_scoring': ['data_preprocessing.sentiment_analyzer'],
+    'stock_preparation': ['data_preprocessing.stock_data_preparer'],
+    'sentiment_processing': ['data_preprocessing.process_sentiment_data'],
+    'feature_engineering': ['feature_engineering.feature_engineer'],
+    'model_development': ['model_development.stock_prediction_model'],
+    'model_evaluation': ['model_evaluation.evaluate_model'],
+    'visualization': ['visualization.data_visualizer'],
+    'entry_point': ['stock_sentiment_analysis'],
+}
+
+def parse_importtime(stderr):
+    # Lines look like "import time:  self [us] | cumulative | imported package", nested imports are indented
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        imports.append({
+            'module': name.strip(),
+            'depth': (len(name) - len(name.lstrip()) - 1) // 2,
+            'self_us': int(self_us),
+            'cumulative_us': int(cumulative_us),
+        })
+    return imports
+
+def measure_stage(modules):
+    statement = '; '.join(f'import {module}' for module in modules)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        cwd=REPO_ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {modules} failed:\n{result.stderr[-2000:]}")
+    imports = parse_importtime(result.stderr)
+    top_level = [entry for entry in imports if entry['depth'] == 0]
+    # Direct dependencies of the stage modules, plus anything the interpreter imported on its own
+    dependencies = [entry for entry in imports if entry['depth'] <= 1 and entry['module'] not in modules]
+    return {
+        'total_ms': sum(entry['cumulative_us'] for entry in top_level) / 1000,
+        'heaviest': sorted(
+            ({'module': entry['module'], 'cumulative_ms': entry['cumulative_us'] / 1000} for entry in dependencies),
+            key=lambda entry: entry['cumulative_ms'], reverse=True
+        )[:5],
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=3, help='fresh interpreters per stage; the fastest run is kept')
+    parser.add_argument('--stages', nargs='*', default=list(STAGES))
+    parser.add_argument('--output', help='optional path of a JSON file to write the results to')
+    args = parser.parse_args()
+
+    results = {}
+    for stage in args.stages:
+        try:
+            runs = [measure_stage(STAGES[stage]) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print(f"{stage:<25} failed: {str(e).splitlines()[-1]}")
+            continue
+        results[stage] = min(runs, key=lambda run: run['total_ms'])
+        heaviest = ', '.join(f"{entry['module']} {entry['cumulative_ms']:.0f}ms" for entry in results[stage]['heaviest'][:3])
+        print(f"{stage:<25} {results[stage]['total_ms']:8.1f}ms  ({heaviest})")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+        print(f"Saved startup timings to {args.output}")
+
+if __name__ == "__main__":
+    main()
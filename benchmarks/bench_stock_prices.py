@@ -0,0 +1,70 @@
+# Bulk price download against a synthetic fetcher: a cold run, an incremental top-up a few days later,
+# and a check that the top-up merged with the cache matches a fresh full download.
+# Run from the repository root: python -m benchmarks.bench_stock_prices --symbols 500
+import argparse
+import tempfile
+import time
+import zlib
+from contextlib import redirect_stdout
+from datetime import timedelta
+from io import StringIO
+import numpy as np
+import pandas as pd
+from data_collection import stock_price_collector
+
+def make_fetcher(now, calls, latency=0.0):
+    # Half-hourly bars during market hours, reported in exchange time like yfinance
+    index = pd.date_range(pd.Timestamp('2020-01-01', tz='UTC'), now, freq='30min')
+    index = index[(index.hour >= 14) & (index.hour < 21) & (index.dayofweek < 5)]
+
+    def fetcher(symbols, start, end):
+        calls.append((len(symbols), start, end))
+        time.sleep(latency)
+        in_window = (index >= start) & (index < end)
+        window = index[in_window]
+        result = {}
+        for symbol in symbols:
+            # Seeded per symbol so every run sees the same price path
+            seed = zlib.crc32(symbol.encode())
+            close = (100 + np.cumsum(np.random.default_rng(seed).normal(size=len(index))))[in_window]
+            volume = np.random.default_rng(seed + 1).integers(1, 1000, size=len(index))[in_window]
+            result[symbol] = pd.DataFrame({
+                'Open': close, 'High': close + 1, 'Low': close - 1, 'Close': close,
+                'Volume': volume, 'Dividends': 0.0, 'Stock Splits': 0.0,
+            }, index=window.tz_convert('America/New_York'))
+        return result
+    return fetcher
+
+def run(symbols, now, cache_path, latency):
+    calls = []
+    start = time.perf_counter()
+    with redirect_stdout(StringIO()):
+        prices = stock_price_collector.download_prices(symbols, fetcher=make_fetcher(now, calls, latency),
+                                                       cache_path=cache_path, end_date=now)
+    return prices, time.perf_counter() - start, calls
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--symbols', type=int, default=500)
+    parser.add_argument('--days-later', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds per simulated batched request')
+    args = parser.parse_args()
+
+    symbols = [f'SYM{i}' for i in range(args.symbols - 1)] + ['^GSPC']
+    now = pd.Timestamp.now(tz='UTC').floor('H')
+    later = now + timedelta(days=args.days_later)
+
+    with tempfile.TemporaryDirectory() as cache_path:
+        cold, cold_seconds, cold_calls = run(symbols, now, cache_path, args.latency)
+        top_up, top_up_seconds, top_up_calls = run(symbols, later, cache_path, args.latency)
+    fresh, _, _ = run(symbols, later, None, args.latency)
+
+    print(f"Cold:   {len(cold)} rows, {len(cold_calls)} requests, {cold_seconds:.2f}s")
+    print(f"Top-up: {len(top_up)} rows, {len(top_up_calls)} requests "
+          f"(window {top_up_calls[0][1]:%Y-%m-%d} to {top_up_calls[0][2]:%Y-%m-%d}), {top_up_seconds:.2f}s")
+    if not top_up.equals(fresh):
+        raise SystemExit("Cached top-up differs from a fresh download")
+    print("Cached top-up matches a fresh download")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# Peak memory of the batch pipeline (every document of the lookback in one DataFrame, cleaned and
+# scored at once, then aggregate_sentiment) vs streaming mode (stream_hourly_sentiment over day
+# partitions), as the lookback grows. Each run happens in a fresh interpreter and reports its peak
+# resident set size. Checks first that both modes give the same hourly aggregates.
+# Synthetic day partitions stand in for the collectors' (day, DataFrame) output.
+# Run from the repository root: python -m benchmarks.bench_streaming --days 30 90 365
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from benchmarks.bench_text_cleaner import make_raw_corpus
+from data_preprocessing import process_sentiment_data, sentiment_analyzer, sentiment_stream, text_cleaner
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def pick_cleaner():
+    # text_cleaner needs NLTK's stopword list; without it (offline, not downloaded yet) the documents
+    # are scored as they are, in both modes
+    try:
+        text_cleaner.get_stopwords()
+        return text_cleaner.clean_text, True
+    except (LookupError, OSError):
+        return (lambda text, n_workers=1, cache=None: text), False
+
+def day_frame(source, day, n_documents, pool, seed):
+    # One day of news articles or Reddit posts. Each document is a pooled text plus a number, so
+    # every row holds its own string, as collected data does.
+    rng = np.random.default_rng([seed, day.toordinal(), source == 'reddit'])
+    texts = [f"{pool[position]} {number}" for number, position in enumerate(rng.integers(0, len(pool), size=n_documents))]
+    times = pd.Series(pd.Timestamp(day, tz='UTC') + pd.to_timedelta(rng.integers(0, 24 * 3600, size=n_documents), unit='s'))
+    if source == 'news':
+        return pd.DataFrame({'date': times, 'content': texts})
+    return pd.DataFrame({'created_at': times, 'text': texts, 'upvotes': rng.zipf(2.0, size=n_documents) - 1,
+                         'num_comments': rng.poisson(3, size=n_documents)})
+
+def make_partitions(days, news_per_day, posts_per_day, seed):
+    # (source, day, DataFrame), news first, generated as they are consumed
+    pool = make_raw_corpus(5000, seed=seed, max_words=30).tolist()
+    end = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    day_list = [end - timedelta(days=offset) for offset in range(days, 0, -1)]
+    for source, n_documents in (('news', news_per_day), ('reddit', posts_per_day)):
+        for day in day_list:
+            yield source, day, day_frame(source, day, n_documents, pool, seed)
+
+def run_batch(partitions, cleaner, cutoff_days):
+    frames = {'news': [], 'reddit': []}
+    for source, _, frame in partitions:
+        frames[source].append(frame)
+    news_data = pd.concat(frames['news'], ignore_index=True)
+    social_media_data = pd.concat(frames['reddit'], ignore_index=True)
+    del frames
+    text_data = pd.concat([news_data['content'], social_media_data['text']])
+    scores = sentiment_analyzer.analyze_sentiment(cleaner(text_data))
+    return process_sentiment_data.aggregate_sentiment(news_data, social_media_data, scores, cutoff_days=cutoff_days)
+
+def run_streaming(partitions, cleaner, cutoff_days):
+    return sentiment_stream.stream_hourly_sentiment(partitions, cutoff_days=cutoff_days, cleaner=cleaner)
+
+MODES = {'batch': run_batch, 'streaming': run_streaming}
+
+def child(args):
+    cleaner, _ = pick_cleaner()
+    sentiment_analyzer.load_polarity_lexicon()
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    hourly = MODES[args.child](make_partitions(args.days[0], args.news_per_day, args.posts_per_day, args.seed),
+                               cleaner, args.days[0] + 1)
+    seconds = time.perf_counter() - start
+    # ru_maxrss is in kilobytes on Linux
+    print(json.dumps({'seconds': seconds, 'baseline_mb': baseline / 1024,
+                      'peak_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                      'documents': int(hourly['count'].sum()), 'hours': len(hourly)}))
+
+def measure(mode, days, args):
+    result = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.bench_streaming', '--child', mode, '--days', str(days),
+         '--news-per-day', str(args.news_per_day), '--posts-per-day', str(args.posts_per_day), '--seed', str(args.seed)],
+        cwd=REPO_ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{mode} run over {days} days failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--days', type=int, nargs='+', default=[30, 90, 365])
+    parser.add_argument('--news-per-day', type=int, default=500)
+    parser.add_argument('--posts-per-day', type=int, default=3000)
+    parser.add_argument('--check-days', type=int, default=7, help='days of data for the parity check')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--child', choices=sorted(MODES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child(args)
+
+    cleaner, cleaning = pick_cleaner()
+    if not cleaning:
+        print("NLTK stopwords are not available: documents are scored without text cleaning in both modes")
+
+    # Same hourly aggregates from both modes
+    results = {mode: run(make_partitions(args.check_days, args.news_per_day, args.posts_per_day, args.seed),
+                         cleaner, args.check_days + 1)
+               for mode, run in MODES.items()}
+    batch, streaming = results['batch'].to_numpy(), results['streaming'].to_numpy()
+    if not results['batch'].index.equals(results['streaming'].index) or not (np.isnan(batch) == np.isnan(streaming)).all():
+        raise SystemExit("Streaming hours differ from the batch hours")
+    difference = np.nanmax(np.abs(batch - streaming))
+    print(f"Parity over {args.check_days} days: max difference {difference:.2e}")
+    if difference > 1e-9:
+        raise SystemExit("Streaming aggregates differ from the batch aggregates")
+
+    print(f"{args.news_per_day} news articles and {args.posts_per_day} posts per day")
+    for days in args.days:
+        runs = {mode: measure(mode, days, args) for mode in MODES}
+        batch, streaming = runs['batch'], runs['streaming']
+        print(f"{days:>4} days, {batch['documents']:>9,} documents: "
+              f"batch peak RSS {batch['peak_mb']:7.0f}MB ({batch['seconds']:.1f}s), "
+              f"streaming {streaming['peak_mb']:5.0f}MB ({streaming['seconds']:.1f}s), "
+              f"interpreter after imports {streaming['baseline_mb']:.0f}MB")
+
+if __name__ == "__main__":
+    main()
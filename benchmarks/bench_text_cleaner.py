@@ -0,0 +1,52 @@
+# Throughput of the fast text cleaner on a synthetic corpus, with a parity check against the NLTK path.
+# Run from the repository root: python -m benchmarks.bench_text_cleaner --docs 1000000
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from data_preprocessing import text_cleaner
+
+# Headline/post-like tokens: stopwords, tickers, numbers, punctuation, mixed case and word_tokenize contractions
+VOCABULARY = [
+    'The', 'stock', 'market', 'rallied', 'after', 'the', 'Fed', 'kept', 'rates', 'unchanged', 'and',
+    'investors', 'are', 'not', 'sure', 'if', 'this', 'will', 'last', '$AAPL', '$TSLA', 'TSLA', 'Q3',
+    'earnings', 'beat', 'by', '12.5%', '2024', "isn't", "don't", "it's", 'Cannot', 'gonna', 'wanna',
+    'gotta', 'U.S.', 'e.g.', 'S&P', '500', '(NYSE)', '--', '...', '!!!', '"bullish"', 'bearish', '🚀',
+    'café', 'to', 'the', 'moon', 'of', 'a', 'in', 'on', 'for', 'with', 'is', 'was', 'very', 'good',
+]
+
+def make_raw_corpus(n_docs, seed=42, min_words=5, max_words=60):
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(min_words, max_words, size=n_docs)
+    tokens = rng.choice(np.array(VOCABULARY, dtype=object), size=int(lengths.sum()))
+    bounds = np.concatenate([[0], np.cumsum(lengths)])
+    return pd.Series([' '.join(tokens[start:end]) for start, end in zip(bounds[:-1], bounds[1:])])
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--docs', type=int, default=1_000_000)
+    parser.add_argument('--nltk-docs', type=int, default=20000, help='documents to run through the NLTK path')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    corpus = make_raw_corpus(args.docs, seed=args.seed)
+    sample = corpus.iloc[:args.nltk_docs]
+
+    start = time.perf_counter()
+    nltk_cleaned = text_cleaner.clean_text(sample, engine='nltk')
+    nltk_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fast_cleaned = text_cleaner.clean_text(corpus, engine='fast')
+    fast_seconds = time.perf_counter() - start
+
+    mismatches = int((nltk_cleaned != fast_cleaned.iloc[:len(sample)]).sum())
+    print(f"NLTK path: {len(sample)} docs in {nltk_seconds:.3f}s ({len(sample) / nltk_seconds:,.0f} docs/s)")
+    print(f"Fast path: {len(corpus)} docs in {fast_seconds:.3f}s ({len(corpus) / fast_seconds:,.0f} docs/s)")
+    print(f"Speedup: {(len(corpus) / fast_seconds) / (len(sample) / nltk_seconds):.1f}x")
+    print(f"Parity mismatches on {len(sample)} docs: {mismatches}")
+    if mismatches:
+        raise SystemExit("Fast cleaner output differs from the NLTK path")
+
+if __name__ == "__main__":
+    main()
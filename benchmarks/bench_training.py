@@ -0,0 +1,54 @@
+# Serial vs process-pool training of every (symbol, fold) job on synthetic features. Checks that both
+# runs give identical scores, importances and final-model predictions, and prints per-job timings.
+# Run from the repository root: python -m benchmarks.bench_training --symbols 8 --workers 4
+import argparse
+import logging
+import os
+import time
+import numpy as np
+from benchmarks.bench_feature_state import make_sentiment, batch_features
+from benchmarks.bench_indicators import make_stock_data
+from feature_engineering import feature_engineer
+from model_development import stock_prediction_model
+
+def run(features, n_workers):
+    start = time.perf_counter()
+    results = stock_prediction_model.train_and_evaluate(features, n_workers=n_workers)
+    return results, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--symbols', type=int, default=8)
+    parser.add_argument('--days', type=int, default=60)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    logging.getLogger(feature_engineer.__name__).setLevel(logging.WARNING)
+    logging.getLogger(stock_prediction_model.__name__).setLevel(logging.WARNING)
+
+    stock_data = make_stock_data(args.symbols, args.days / 252, seed=args.seed)
+    features = batch_features(stock_data, make_sentiment(stock_data, 0.8, seed=args.seed))
+
+    serial, serial_seconds = run(features, 1)
+    parallel, parallel_seconds = run(features, args.workers)
+
+    for symbol, result in serial.items():
+        other = parallel[symbol]
+        X = features[symbol].drop(['Target'], axis=1).to_numpy()
+        same = (all(result[key] == other[key] for key in ('train_mse', 'train_r2', 'test_mse', 'test_r2'))
+                and result['feature_importance'] == other['feature_importance']
+                and np.array_equal(result['model'].predict(X), other['model'].predict(X)))
+        if not same:
+            raise SystemExit(f"Parallel results differ from the serial run for {symbol}")
+
+    job_seconds = np.array([seconds for result in parallel.values() for seconds in result['job_seconds'].values()])
+    print(f"Symbols: {len(serial)}, jobs: {len(job_seconds)}, rows per symbol: {len(next(iter(features.values())))}")
+    print(f"Serial:   {serial_seconds:.2f}s")
+    print(f"Parallel: {parallel_seconds:.2f}s with {args.workers} workers ({serial_seconds / parallel_seconds:.1f}x)")
+    print(f"Per-job seconds: p50 {np.percentile(job_seconds, 50):.2f}, max {job_seconds.max():.2f}, "
+          f"sum {job_seconds.sum():.2f}")
+    print("Parallel results are identical to the serial run")
+
+if __name__ == "__main__":
+    main()
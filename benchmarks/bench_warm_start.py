@@ -0,0 +1,57 @@
+# Refit vs warm-start training on synthetic features: total training time per symbol, the
+# cross-validated scores, and the final models' error on a held-out tail of each symbol's rows.
+# Run from the repository root: python -m benchmarks.bench_warm_start --symbols 4 --days 120
+import argparse
+import logging
+import time
+import numpy as np
+from sklearn.metrics import mean_squared_error
+from benchmarks.bench_feature_state import make_sentiment, batch_features
+from benchmarks.bench_indicators import make_stock_data
+from feature_engineering import feature_engineer
+from model_development import stock_prediction_model
+
+def run(features, holdout, mode):
+    start = time.perf_counter()
+    results = stock_prediction_model.train_and_evaluate(features, mode=mode)
+    seconds = time.perf_counter() - start
+    holdout_mse = [mean_squared_error(holdout[symbol]['Target'],
+                                      result['model'].predict(holdout[symbol].drop(['Target'], axis=1).to_numpy()))
+                   for symbol, result in results.items()]
+    return {
+        'seconds_per_symbol': seconds / len(results),
+        'test_mse': np.mean([result['test_mse'] for result in results.values()]),
+        'test_r2': np.mean([result['test_r2'] for result in results.values()]),
+        'holdout_mse': np.mean(holdout_mse),
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--symbols', type=int, default=4)
+    parser.add_argument('--days', type=int, default=120)
+    parser.add_argument('--holdout-fraction', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    logging.getLogger(feature_engineer.__name__).setLevel(logging.WARNING)
+    logging.getLogger(stock_prediction_model.__name__).setLevel(logging.WARNING)
+
+    stock_data = make_stock_data(args.symbols, args.days / 252, seed=args.seed)
+    features = batch_features(stock_data, make_sentiment(stock_data, 0.8, seed=args.seed))
+    cuts = {symbol: int(len(data) * (1 - args.holdout_fraction)) for symbol, data in features.items()}
+    training = {symbol: data.iloc[:cuts[symbol]] for symbol, data in features.items()}
+    holdout = {symbol: data.iloc[cuts[symbol]:] for symbol, data in features.items()}
+
+    refit = run(training, holdout, 'refit')
+    warm = run(training, holdout, 'warm_start')
+
+    print(f"Symbols: {len(training)}, training rows per symbol: {len(next(iter(training.values())))}")
+    print(f"{'':12}{'s/symbol':>10}{'CV test MSE':>14}{'CV test R2':>12}{'holdout MSE':>14}")
+    for name, result in (('refit', refit), ('warm_start', warm)):
+        print(f"{name:12}{result['seconds_per_symbol']:>10.2f}{result['test_mse']:>14.3e}"
+              f"{result['test_r2']:>12.3f}{result['holdout_mse']:>14.3e}")
+    print(f"Warm start: {refit['seconds_per_symbol'] / warm['seconds_per_symbol']:.1f}x faster, "
+          f"holdout MSE {100 * (warm['holdout_mse'] / refit['holdout_mse'] - 1):+.1f}%")
+
+if __name__ == "__main__":
+    main()
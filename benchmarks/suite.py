@@ -0,0 +1,231 @@
+# Offline benchmark suite: times each pipeline stage function on seeded synthetic data (see
+# benchmarks.synthetic) at a range of sizes, and writes the results as JSON. Every (stage, size)
+# runs in a fresh interpreter, so peak RSS is that stage's own. The results use the run report layout
+# of pipeline.instrumentation, so two runs compare with
+#   python -m pipeline.instrumentation reports/benchmarks/suite_A.json reports/benchmarks/suite_B.json
+# or with --compare below.
+# Run from the repository root: python -m benchmarks.suite --sizes 1000 10000 100000 1000000
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+REPORT_VERSION = '1'
+
+# Rows above which a stage is skipped unless --max-rows raises it: a 100-tree forest per fold makes
+# training the slowest stage per row by far
+DEFAULT_MAX_ROWS = {'train_and_evaluate': 10_000}
+# Stages measured once whatever --repeat says; at 10k rows training takes minutes per call
+SINGLE_RUN_STAGES = {'train_and_evaluate'}
+# Rows of the warm-up call that loads lexicons and imports before the measured calls
+WARM_UP_ROWS = 200
+
+def setup_clean_text(rows, seed):
+    from benchmarks.synthetic import make_texts
+    from benchmarks.bench_text_cleaner import VOCABULARY
+    from data_preprocessing import text_cleaner
+
+    try:
+        text_cleaner.get_stopwords()
+    except LookupError:
+        raise LookupError("NLTK stopwords are not available; run nltk.download('stopwords') first") from None
+    return text_cleaner.clean_text, {'text': make_texts(rows, VOCABULARY, seed)}, rows
+
+def setup_analyze_sentiment(rows, seed):
+    from benchmarks.synthetic import make_cleaned_texts
+    from data_preprocessing import sentiment_analyzer
+
+    return sentiment_analyzer.analyze_sentiment, {'text_data': make_cleaned_texts(rows, seed)}, rows
+
+def sentiment_inputs(rows, seed):
+    # A tenth of the documents are news articles, as in the collected data
+    from benchmarks.synthetic import make_news_articles, make_reddit_posts
+
+    n_news = rows // 10
+    news = make_news_articles(n_news, days=28, seed=seed)
+    posts = make_reddit_posts(rows - n_news, days=28, seed=seed)
+    scores = np.round(np.random.default_rng(seed).normal(0.05, 0.3, size=rows), 3)
+    return {'news_data': news, 'social_media_data': posts, 'sentiment_analysis_scores': scores}
+
+def setup_process_sentiment_data(rows, seed):
+    from data_preprocessing import process_sentiment_data
+
+    return process_sentiment_data.process_sentiment_data, sentiment_inputs(rows, seed), rows
+
+def setup_aggregate_sentiment(rows, seed):
+    from data_preprocessing import process_sentiment_data
+
+    return process_sentiment_data.aggregate_sentiment, sentiment_inputs(rows, seed), rows
+
+def setup_prepare_stock_data(rows, seed):
+    from benchmarks.synthetic import make_hourly_bars
+    from data_preprocessing import stock_data_preparer
+
+    stock_data = make_hourly_bars(rows, seed=seed)
+    return stock_data_preparer.prepare_stock_data, {'stock_data': stock_data}, sum(map(len, stock_data.values()))
+
+def feature_inputs(rows, seed):
+    from benchmarks.synthetic import make_hourly_bars, make_hourly_sentiment
+    from data_preprocessing import stock_data_preparer
+
+    stock_data = make_hourly_bars(rows, seed=seed)
+    sentiment = make_hourly_sentiment(stock_data, seed=seed)
+    return sentiment, stock_data_preparer.prepare_stock_data(stock_data)
+
+def setup_engineer_features(rows, seed):
+    from feature_engineering import feature_engineer
+
+    sentiment, prepared = feature_inputs(rows, seed)
+    return feature_engineer.engineer_features, {'sentiment_scores': sentiment, 'stock_data': prepared}, \
+        sum(map(len, prepared.values()))
+
+def setup_train_and_evaluate(rows, seed):
+    from feature_engineering import feature_engineer
+    from feature_engineering.feature_store import to_feature_matrices
+    from model_development import stock_prediction_model
+
+    sentiment, prepared = feature_inputs(rows, seed)
+    features = to_feature_matrices(feature_engineer.engineer_features(sentiment, prepared))
+    return stock_prediction_model.train_and_evaluate, {'features': features}, sum(map(len, features.values()))
+
+# Stage -> setup(rows, seed) returning (function, keyword arguments, actual input rows)
+STAGES = {
+    'clean_text': setup_clean_text,
+    'analyze_sentiment': setup_analyze_sentiment,
+    'process_sentiment_data': setup_process_sentiment_data,
+    'aggregate_sentiment': setup_aggregate_sentiment,
+    'prepare_stock_data': setup_prepare_stock_data,
+    'engineer_features': setup_engineer_features,
+    'train_and_evaluate': setup_train_and_evaluate,
+}
+
+def child(stage, rows, seed, repeat):
+    # Builds the inputs, warms up on a small slice, then keeps the fastest of repeat measured calls
+    import logging
+    from pipeline.instrumentation import Measurement, max_rss_mb
+
+    logging.disable(logging.INFO)
+    setup = STAGES[stage]
+    setup_started = time.perf_counter()
+    try:
+        func, kwargs, actual_rows = setup(rows, seed)
+    except LookupError as e:
+        # clean_text needs NLTK's stopword list, which cannot be downloaded offline
+        return {'status': 'skipped', 'reason': str(e)}
+    setup_seconds = time.perf_counter() - setup_started
+    warm_func, warm_kwargs, _ = setup(min(rows, WARM_UP_ROWS), seed + 1)
+    warm_func(**warm_kwargs)
+    baseline_rss = max_rss_mb()
+
+    best = None
+    for _ in range(repeat):
+        with Measurement() as measurement:
+            func(**kwargs)
+        if best is None or measurement.metrics['wall_seconds'] < best['wall_seconds']:
+            best = measurement.metrics
+    best.update({
+        'rows': actual_rows,
+        'rows_per_second': actual_rows / best['wall_seconds'] if best['wall_seconds'] else None,
+        'setup_seconds': setup_seconds,
+        'rss_before_mb': baseline_rss,
+        'repeat': repeat,
+    })
+    return {'status': 'ran', 'metrics': best}
+
+def measure(stage, rows, args):
+    repeat = args.repeat if rows <= args.repeat_max_rows and stage not in SINGLE_RUN_STAGES else 1
+    result = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.suite', '--child', stage, '--sizes', str(rows), '--seed', str(args.seed),
+         '--repeat', str(repeat)],
+        cwd=REPO_ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        return {'status': 'failed', 'error': result.stderr.strip().splitlines()[-1] if result.stderr.strip() else ''}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def git_commit():
+    try:
+        result = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, capture_output=True, text=True)
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+def library_versions():
+    import pandas as pd
+    import sklearn
+
+    return {'numpy': np.__version__, 'pandas': pd.__version__, 'scikit-learn': sklearn.__version__}
+
+def format_result(name, result):
+    if result['status'] != 'ran':
+        return f"{name:<32} {result['status']}: {result.get('reason') or result.get('error')}"
+    metrics = result['metrics']
+    return (f"{name:<32} {metrics['wall_seconds']:9.3f}s  {metrics['rows_per_second']:12,.0f} rows/s  "
+            f"peak RSS {metrics['max_rss_mb']:6.0f}MB")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--stages', nargs='+', choices=sorted(STAGES), default=list(STAGES))
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument('--max-rows', type=int, help='run every stage up to this many rows, training included')
+    parser.add_argument('--repeat', type=int, default=3, help='measured calls per size; the fastest is kept')
+    parser.add_argument('--repeat-max-rows', type=int, default=100_000, help='larger sizes are measured once')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='JSON results path (default reports/benchmarks/suite_<time>.json)')
+    parser.add_argument('--compare', metavar='BASELINE', help='compare with the results of an earlier run')
+    parser.add_argument('--child', choices=sorted(STAGES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.child, args.sizes[0], args.seed, args.repeat)))
+        return
+
+    started_at = datetime.now(timezone.utc)
+    started = time.perf_counter()
+    results = {}
+    for stage in args.stages:
+        max_rows = args.max_rows or DEFAULT_MAX_ROWS.get(stage)
+        for rows in sorted(args.sizes):
+            name = f"{stage}/{rows}"
+            if max_rows is not None and rows > max_rows:
+                results[name] = {'status': 'skipped', 'reason': f"above {max_rows} rows (--max-rows)"}
+            else:
+                results[name] = measure(stage, rows, args)
+            print(format_result(name, results[name]), flush=True)
+
+    report = {
+        'report_version': REPORT_VERSION,
+        'started_at': started_at.isoformat(),
+        'wall_seconds': time.perf_counter() - started,
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'metadata': {'suite': 'benchmarks.suite', 'git_commit': git_commit(), 'libraries': library_versions(),
+                     'seed': args.seed, 'sizes': sorted(args.sizes)},
+        'stages': results,
+    }
+    output = args.output or os.path.join('reports', 'benchmarks', f"suite_{started_at:%Y%m%dT%H%M%SZ}.json")
+    directory = os.path.dirname(output)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        from pipeline.instrumentation import compare
+
+        with open(args.compare) as f:
+            lines, regressed = compare(json.load(f), report)
+        print('\n'.join(lines))
+        if regressed:
+            raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# Seeded synthetic inputs shaped like the collectors' output, at any scale: NewsAPI articles, Reddit
+# posts and hourly OHLCV bars. The same arguments always give the same data, so benchmark runs on
+# different commits see identical inputs.
+import math
+import numpy as np
+import pandas as pd
+from benchmarks.bench_indicators import BARS_PER_DAY, make_stock_data
+from benchmarks.bench_sentiment import FILLER_WORDS
+from benchmarks.bench_text_cleaner import VOCABULARY
+from data_collection.news_collector import NEWS_COLUMNS
+from data_collection.social_media_collector import REDDIT_COLUMNS
+
+# Distinct texts documents are drawn from. Every document also gets its own number, so no two
+# documents are the same string, as in collected data.
+POOL_SIZE = 10_000
+
+NEWS_SOURCES = ['Reuters', 'Bloomberg', 'CNBC', 'MarketWatch', 'Yahoo Finance', 'The Motley Fool']
+SUBREDDITS = ['wallstreetbets', 'stocks', 'investing', 'StockMarket', 'options']
+
+def text_pool(vocabulary, seed, min_words=5, max_words=40, size=POOL_SIZE):
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array(vocabulary, dtype=object)
+    return [' '.join(rng.choice(vocabulary, size=length)) for length in rng.integers(min_words, max_words, size=size)]
+
+def make_texts(n, vocabulary, seed, min_words=5, max_words=40):
+    # n documents of raw text (VOCABULARY: punctuation, tickers, mixed case) or of any other vocabulary
+    pool = text_pool(vocabulary, seed, min_words=min_words, max_words=max_words)
+    positions = np.random.default_rng([seed, n]).integers(0, len(pool), size=n)
+    return pd.Series([f"{pool[position]} {number}" for number, position in enumerate(positions)], dtype=object)
+
+def cleaned_vocabulary():
+    # Lowercase letters only, as text_cleaner leaves it: lexicon words, filler words and negations
+    from data_preprocessing import sentiment_analyzer
+
+    lexicon_words = sorted(word for word in sentiment_analyzer.load_polarity_lexicon() if word.isalpha() and word.islower())
+    negations = sorted(word for word in sentiment_analyzer.NEGATIONS if word.isalpha())
+    return lexicon_words + FILLER_WORDS * 50 + negations * 20
+
+def make_cleaned_texts(n, seed):
+    return make_texts(n, cleaned_vocabulary(), seed, min_words=3, max_words=40)
+
+def document_times(n, days, rng, end=None):
+    # tz-aware UTC times to the second over the days before end (now by default)
+    if end is None:
+        end = pd.Timestamp.now(tz='UTC').floor('s')
+    return pd.Series(end - pd.to_timedelta(rng.integers(0, days * 24 * 3600, size=n), unit='s'))
+
+def make_news_articles(n, days=30, seed=42, end=None):
+    # The frame collect_news returns
+    rng = np.random.default_rng([seed, 1])
+    return pd.DataFrame({
+        'source': pd.Series(NEWS_SOURCES, dtype=object).iloc[rng.integers(0, len(NEWS_SOURCES), size=n)].to_numpy(),
+        'title': make_texts(n, VOCABULARY, seed + 1, min_words=4, max_words=12).to_numpy(),
+        'content': make_texts(n, VOCABULARY, seed).to_numpy(),
+        'date': document_times(n, days, rng, end=end),
+        'url': [f"https://news.example.com/{number}" for number in range(n)],
+    }, columns=NEWS_COLUMNS)
+
+def make_reddit_posts(n, days=30, seed=42, end=None):
+    # The frame collect_social_media_data returns
+    rng = np.random.default_rng([seed, 2])
+    return pd.DataFrame({
+        'text': make_texts(n, VOCABULARY, seed + 2).to_numpy(),
+        'created_at': document_times(n, days, rng, end=end),
+        'user': [f"user{number}" for number in rng.integers(0, max(1, n // 10), size=n)],
+        'upvotes': rng.zipf(2.0, size=n) - 1,
+        'num_comments': rng.poisson(3, size=n),
+        'subreddit': pd.Series(SUBREDDITS, dtype=object).iloc[rng.integers(0, len(SUBREDDITS), size=n)].to_numpy(),
+    }, columns=REDDIT_COLUMNS)
+
+def make_hourly_bars(n_rows, bars_per_symbol=1400, seed=42):
+    # {symbol: hourly OHLCV frame} as collect_stock_prices returns, with about n_rows bars in total
+    # split over symbols of up to bars_per_symbol bars (some listed partway, so shorter)
+    bars_per_symbol = min(bars_per_symbol, n_rows)
+    n_symbols = max(1, math.ceil(n_rows / bars_per_symbol))
+    return make_stock_data(n_symbols, bars_per_symbol / BARS_PER_DAY / 252, seed=seed)
+
+def make_hourly_sentiment(stock_data, docs_per_hour=0.8, seed=42):
+    # Document scores at random times over the bars' span, as engineer_features accepts them
+    from benchmarks.bench_feature_state import make_sentiment
+
+    return make_sentiment(stock_data, docs_per_hour, seed=seed)
@@ -0,0 +1,113 @@
+import argparse
+import os
+import shutil
+import pandas as pd
+
+# Parquet store for collected data, one partition per collection day:
+#
+#   <root>/news/day=2024-09-01/part-0.parquet
+#   <root>/reddit/day=2024-09-01/part-0.parquet
+#
+# Columns are typed (UTC timestamps, int64 counts) and zstd-compressed. read_days() prunes
+# partitions outside the requested range and pushes any extra filters down to the row groups.
+
+COMPRESSION = 'zstd'
+
+def dataset_schema(dataset):
+    import pyarrow as pa
+
+    timestamp = pa.timestamp('us', tz='UTC')
+    schemas = {
+        'news': pa.schema([
+            ('source', pa.string()),
+            ('title', pa.string()),
+            ('content', pa.string()),
+            ('date', timestamp),
+            ('url', pa.string()),
+        ]),
+        'reddit': pa.schema([
+            ('text', pa.string()),
+            ('created_at', timestamp),
+            ('user', pa.string()),
+            ('upvotes', pa.int64()),
+            ('num_comments', pa.int64()),
+            ('subreddit', pa.string()),
+        ]),
+    }
+    if dataset not in schemas:
+        raise ValueError(f"Unknown dataset: {dataset}")
+    return schemas[dataset]
+
+def day_key(day):
+    return pd.Timestamp(day).strftime('%Y-%m-%d')
+
+def partition_path(root, dataset, day):
+    return os.path.join(root, dataset, f"day={day_key(day)}")
+
+def stored_days(root, dataset):
+    dataset_path = os.path.join(root, dataset)
+    if not os.path.exists(dataset_path):
+        return set()
+    return {name[len('day='):] for name in os.listdir(dataset_path) if name.startswith('day=')}
+
+def write_day(root, dataset, day, df):
+    # Replaces the partition for this day; written to a temporary directory first so readers
+    # never see a half-written day
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = dataset_schema(dataset)
+    table = pa.Table.from_pandas(df[schema.names], schema=schema, preserve_index=False)
+
+    path = partition_path(root, dataset, day)
+    # Names starting with '.' are skipped by pyarrow's dataset discovery
+    tmp_path = os.path.join(root, dataset, f".day={day_key(day)}.tmp")
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+    pq.write_table(table, os.path.join(tmp_path, 'part-0.parquet'), compression=COMPRESSION)
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+
+def read_days(root, dataset, start_day, end_day, columns=None, filter=None, days=None):
+    # filter is an optional pyarrow.dataset expression, e.g. ds.field('subreddit') == 'stocks';
+    # days optionally restricts the range to a list of specific days
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    schema = dataset_schema(dataset)
+    if columns is None:
+        columns = schema.names
+    dataset_path = os.path.join(root, dataset)
+    if not stored_days(root, dataset):
+        return schema.empty_table().select(columns).to_pandas()
+
+    partition_schema = pa.schema([('day', pa.string())])
+    partitioning = ds.partitioning(partition_schema, flavor='hive')
+    parquet_dataset = ds.dataset(dataset_path, schema=pa.unify_schemas([schema, partition_schema]),
+                                 format='parquet', partitioning=partitioning)
+    expression = (ds.field('day') >= day_key(start_day)) & (ds.field('day') <= day_key(end_day))
+    if days is not None:
+        expression = expression & ds.field('day').isin([day_key(day) for day in days])
+    if filter is not None:
+        expression = expression & filter
+    return parquet_dataset.to_table(columns=columns, filter=expression).to_pandas()
+
+def main():
+    # Migrate existing JSON day files into the Parquet store:
+    # python -m data_collection.columnar_store --news-path news_articles --reddit-path social_media_posts --store data/store
+    from data_collection import news_collector, social_media_collector
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--news-path', default='news_articles')
+    parser.add_argument('--reddit-path', default='social_media_posts')
+    parser.add_argument('--store', default='data/store')
+    args = parser.parse_args()
+
+    n_news_days = news_collector.migrate_to_store(args.news_path, args.store)
+    n_reddit_days = social_media_collector.migrate_to_store(args.reddit_path, args.store)
+    print(f"Migrated {n_news_days} news days and {n_reddit_days} Reddit days to {args.store}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import random
+import threading
+import time
+import numpy as np
+
+# Status codes worth retrying: rate limited or a transient server error
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+def create_session(pool_size=10):
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    # One keep-alive connection per in-flight request instead of a new connection per call
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+class TokenBucket:
+    # Allows bursts of up to `capacity` requests and `rate` requests per second on average
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class RequestStats:
+    # Thread-safe record of per-request latencies, retries and failures
+    def __init__(self):
+        self.latencies = []
+        self.retries = 0
+        self.failures = 0
+        self.started = time.perf_counter()
+        self.lock = threading.Lock()
+
+    def record(self, latency):
+        with self.lock:
+            self.latencies.append(latency)
+
+    def record_retry(self):
+        with self.lock:
+            self.retries += 1
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+
+    def summary(self):
+        with self.lock:
+            latencies = np.array(self.latencies)
+            summary = {
+                'requests': len(latencies),
+                'retries': self.retries,
+                'failures': self.failures,
+                'wall_clock_s': time.perf_counter() - self.started,
+            }
+        if len(latencies):
+            summary.update({
+                'latency_mean_ms': latencies.mean() * 1000,
+                'latency_p50_ms': np.percentile(latencies, 50) * 1000,
+                'latency_p95_ms': np.percentile(latencies, 95) * 1000,
+                'latency_max_ms': latencies.max() * 1000,
+            })
+        return summary
+
+def get_with_backoff(session, url, params=None, limiter=None, stats=None, max_retries=5, backoff_base=0.5, timeout=30):
+    # GET with exponential backoff (plus jitter) on 429/5xx responses and connection errors.
+    # A Retry-After header from the server takes precedence over the computed delay.
+    import requests
+
+    for attempt in range(max_retries + 1):
+        if limiter is not None:
+            limiter.acquire()
+        start = time.perf_counter()
+        try:
+            response = session.get(url, params=params, timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == max_retries:
+                if stats is not None:
+                    stats.record_failure()
+                raise
+            retry_after = None
+        else:
+            if stats is not None:
+                stats.record(time.perf_counter() - start)
+            if response.status_code not in RETRY_STATUS_CODES or attempt == max_retries:
+                if stats is not None and not response.ok:
+                    stats.record_failure()
+                response.raise_for_status()
+                return response
+            retry_after = response.headers.get('Retry-After')
+
+        if stats is not None:
+            stats.record_retry()
+        delay = backoff_base * 2 ** attempt + random.uniform(0, backoff_base)
+        if retry_after is not None and retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        time.sleep(delay)
@@ -1,88 +1,378 @@
-import requests
 import pandas as pd
 from datetime import datetime, timedelta
+import math
 import os
 import json
+import re
+import time
+from data_collection.http_client import RequestStats, TokenBucket, create_session, get_with_backoff
+
+NEWS_API_URL = "https://newsapi.org/v2/everything"
+PAGE_SIZE = 100  # API limit is 100 per request
+MANIFEST_FILE = 'manifest.json'
+NEWS_COLUMNS = ['source', 'title', 'content', 'date', 'url']
+
+def build_params(api_key, day, page):
+    return {
+        'q': 'stock market OR finance OR economy',
+        'language': 'en',
+        'sortBy': 'publishedAt',
+        'pageSize': PAGE_SIZE,
+        'page': page,
+        'apiKey': api_key,
+        'from': day.strftime('%Y-%m-%d'),
+        'to': (day + timedelta(days=1)).strftime('%Y-%m-%d')
+    }
+
+def parse_articles(data):
+    return [{
+        'source': article['source']['name'],
+        'title': article['title'],
+        'content': article['description'] or article['content'],
+        'date': article['publishedAt'],
+        'url': article['url']
+    } for article in data.get('articles', [])]
+
+# Cache layout: one file per (day, page) plus a manifest recording which pages each day has,
+# how many pages the API reported and whether the day is complete. A day is only marked
+# complete once it is over and every page was fetched (or the API refused further pages).
+# Results are sorted newest first, so pages saved while a day was still in progress shift as
+# new articles arrive; such days are fetched again from page 1 on the next run.
+#
+#   news_articles_20240901_page001.json
+#   news_articles_20240901_page002.json
+#   manifest.json  {"20240901": {"pages": [1, 2], "total_pages": 2, "complete": true, "truncated": false}}
+#
+# Day files written by earlier versions (news_articles_20240901.json) only hold the last page
+# that was fetched. They are read only for days that have no pages in the new layout.
+
+def page_file_path(save_path, day, page):
+    return os.path.join(save_path, f"news_articles_{day.strftime('%Y%m%d')}_page{page:03d}.json")
+
+def legacy_file_path(save_path, day):
+    return os.path.join(save_path, f"news_articles_{day.strftime('%Y%m%d')}.json")
+
+def write_json_atomic(file_path, data, indent=None):
+    # Write to a temporary file first so an interrupted run never leaves a truncated file behind
+    tmp_path = file_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=indent)
+    os.replace(tmp_path, file_path)
+
+def load_manifest(save_path):
+    manifest_path = os.path.join(save_path, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, 'r') as f:
+        return json.load(f)
+
+def save_manifest(save_path, manifest):
+    if not os.path.exists(save_path):
+        os.makedirs(save_path)
+    write_json_atomic(os.path.join(save_path, MANIFEST_FILE), manifest, indent=4)
+
+def manifest_entry(manifest, day):
+    return manifest.setdefault(day.strftime('%Y%m%d'), {'pages': [], 'total_pages': None, 'complete': False,
+                                                        'truncated': False, 'in_progress': False})
+
+def start_day(manifest, day):
+    entry = manifest_entry(manifest, day)
+    if entry.get('in_progress'):
+        entry.update(pages=[], total_pages=None, in_progress=False)
+    return entry
+
+def save_page(save_path, manifest, day, page, articles, total_pages, end_date):
+    if not os.path.exists(save_path):
+        os.makedirs(save_path)
+    file_path = page_file_path(save_path, day, page)
+    write_json_atomic(file_path, articles, indent=4)
+    entry = manifest_entry(manifest, day)
+    entry['pages'] = sorted(set(entry['pages']) | {page})
+    entry['total_pages'] = total_pages
+    entry['in_progress'] = day.date() >= end_date.date()
+    save_manifest(save_path, manifest)
+    print(f"Saved articles to {file_path}")
+
+def mark_day(save_path, manifest, day, end_date, truncated=False):
+    # Today's news is still coming in, so only days that are over can be complete
+    entry = manifest_entry(manifest, day)
+    entry['truncated'] = entry['truncated'] or truncated
+    entry['complete'] = day.date() < end_date.date()
+    save_manifest(save_path, manifest)
+
+def missing_pages(entry, max_pages_per_day=None):
+    total_pages = entry['total_pages']
+    if max_pages_per_day is not None:
+        total_pages = min(total_pages, max_pages_per_day)
+    return [page for page in range(1, total_pages + 1) if page not in entry['pages']]
+
+def load_day(save_path, manifest, day):
+    entry = manifest.get(day.strftime('%Y%m%d'))
+    if entry and entry['pages']:
+        daily_articles = []
+        for page in entry['pages']:
+            with open(page_file_path(save_path, day, page), 'r') as f:
+                daily_articles.extend(json.load(f))
+        return daily_articles
+
+    file_path = legacy_file_path(save_path, day)
+    if os.path.exists(file_path):
+        print(f"Loading legacy day file {file_path}.")
+        with open(file_path, 'r') as f:
+            return json.load(f)
+    return []
+
+def news_frame(articles):
+    df = pd.DataFrame(articles, columns=NEWS_COLUMNS)
+    df['date'] = pd.to_datetime(df['date'], utc=True)
+    return df
+
+def build_news_frame(save_path, manifest, days, store_path=None):
+    if store_path is None:
+        return news_frame([article for day in days for article in load_day(save_path, manifest, day)])
+
+    from data_collection import columnar_store
+
+    # Days that can no longer change are kept in the Parquet store and read from there; the
+    # JSON pages are only parsed for days still being collected and for days not stored yet
+    stored = columnar_store.stored_days(store_path, 'news')
+    final_days, open_days = [], []
+    for day in days:
+        entry = manifest.get(day.strftime('%Y%m%d'))
+        if entry is not None and not entry['complete']:
+            open_days.append(day)
+        elif columnar_store.day_key(day) in stored:
+            final_days.append(day)
+        elif entry is not None:
+            columnar_store.write_day(store_path, 'news', day, news_frame(load_day(save_path, manifest, day)))
+            final_days.append(day)
+        else:
+            open_days.append(day)
+
+    frames = [news_frame([article for day in open_days for article in load_day(save_path, manifest, day)])]
+    if final_days:
+        frames.insert(0, columnar_store.read_days(store_path, 'news', final_days[0], final_days[-1], days=final_days))
+    return pd.concat(frames, ignore_index=True)
+
+def news_day_frames(save_path, manifest, days, store_path=None):
+    # Yields (day, DataFrame) one day at a time, read the way build_news_frame reads it, so no more
+    # than a day of articles is in memory at once
+    if store_path is not None:
+        from data_collection import columnar_store
+
+        stored = columnar_store.stored_days(store_path, 'news')
+    for day in days:
+        entry = manifest.get(day.strftime('%Y%m%d'))
+        if store_path is None or (entry is not None and not entry['complete']):
+            yield day, news_frame(load_day(save_path, manifest, day))
+        elif columnar_store.day_key(day) in stored:
+            yield day, columnar_store.read_days(store_path, 'news', day, day)
+        else:
+            frame = news_frame(load_day(save_path, manifest, day))
+            if entry is not None:
+                columnar_store.write_day(store_path, 'news', day, frame)
+            yield day, frame
+
+def migrate_to_store(save_path, store_path):
+    # Copy every day found in the JSON cache (page files or older single day files) into the Parquet store
+    from data_collection import columnar_store
+
+    if not os.path.exists(save_path):
+        return 0
+    manifest = load_manifest(save_path)
+    file_pattern = re.compile(r'news_articles_(\d{8})(_page\d{3})?\.json$')
+    day_strings = set()
+    for file_name in os.listdir(save_path):
+        match = file_pattern.match(file_name)
+        if match:
+            day_strings.add(match.group(1))
+
+    for day_string in sorted(day_strings):
+        day = datetime.strptime(day_string, '%Y%m%d')
+        columnar_store.write_day(store_path, 'news', day, news_frame(load_day(save_path, manifest, day)))
+    return len(day_strings)
+
+def is_upgrade_required(error):
+    # NewsAPI answers 426 once a plan's result limit is reached; no further pages can be fetched
+    response = getattr(error, 'response', None)
+    return response is not None and response.status_code == 426
+
+def collect_news(num_articles=10000, api_key=None, save_path='data/news_articles', base_url=NEWS_API_URL,
+                 concurrent=False, max_in_flight=8, requests_per_second=5.0, max_retries=5, max_pages_per_day=None, stats=None,
+                 store_path=None, lookback_days=30, stream=False):
+    # store_path (optional) keeps finished days in the Parquet store of data_collection.columnar_store.
+    # stream=True returns an iterator of (day, DataFrame) partitions instead of one DataFrame.
+    # stats (a RequestStats) records the latency of each request and the failed ones.
+    import requests
 
-def collect_news(num_articles=10000, api_key=None, save_path='data/news_articles'):
     if api_key is None:
         raise ValueError("Please provide a valid NewsAPI key")
 
-    base_url = "https://newsapi.org/v2/everything"
-    
+    if concurrent:
+        return collect_news_concurrent(api_key, save_path, base_url=base_url, max_in_flight=max_in_flight,
+                                       requests_per_second=requests_per_second, max_retries=max_retries,
+                                       max_pages_per_day=max_pages_per_day, stats=stats, store_path=store_path,
+                                       lookback_days=lookback_days, stream=stream)
+
     # Calculate date range (last 30 days for free plan)
     end_date = datetime.now()
-    start_date = end_date - timedelta(days=30)  # Free plan allows up to 1 month in the past
+    start_date = end_date - timedelta(days=lookback_days)  # Free plan allows up to 1 month in the past
+
+    manifest = load_manifest(save_path)
 
-    # Prepare to store all articles
-    all_articles = []
+    # Days in the date range, in order
+    days = []
 
     # Loop through each day in the date range
     current_date = start_date
     while current_date <= end_date:
-        # Construct the file path for each date range
-        file_path = os.path.join(save_path, f"news_articles_{current_date.strftime('%Y%m%d')}.json")
-
-        # Check if the file already exists
-        if os.path.exists(file_path):
-            print(f"File {file_path} already exists. Loading from saved file.")
-            with open(file_path, 'r') as f:
-                daily_articles = json.load(f)
-            all_articles.extend(daily_articles)
+        entry = start_day(manifest, current_date)
+
+        if entry['complete']:
+            print(f"News for {current_date.strftime('%Y-%m-%d')} is complete. Loading {len(entry['pages'])} saved pages.")
         else:
-            # Fetch the news from the API for the current date
+            # Fetch the pages of the current date that are not saved yet
             page = 1
             while True:
-                params = {
-                    'q': 'stock market OR finance OR economy',
-                    'language': 'en',
-                    'sortBy': 'publishedAt',
-                    'pageSize': 100,  # API limit is 100 per request
-                    'page': page,
-                    'apiKey': api_key,
-                    'from': current_date.strftime('%Y-%m-%d'),
-                    'to': (current_date + timedelta(days=1)).strftime('%Y-%m-%d')
-                }
+                if entry['total_pages'] is not None and page > entry['total_pages']:
+                    mark_day(save_path, manifest, current_date, end_date)
+                    break  # All pages fetched
+                if max_pages_per_day is not None and page > max_pages_per_day:
+                    break
+                if page in entry['pages']:
+                    page += 1
+                    continue
+
+                params = build_params(api_key, current_date, page)
 
                 try:
+                    request_started = time.perf_counter()
                     response = requests.get(base_url, params=params)
+                    if stats is not None:
+                        stats.record(time.perf_counter() - request_started)
                     response.raise_for_status()  # Raise an exception for bad status codes
 
-                    if response.status_code == 426:
-                        print("Upgrade required. Please check the API documentation.")
-                        return pd.DataFrame(columns=['source', 'title', 'content', 'date', 'url'])
-
                     data = response.json()
 
-                    articles = data.get('articles', [])
-                    
-                    if not articles:
+                    daily_articles = parse_articles(data)
+
+                    if not daily_articles:
+                        mark_day(save_path, manifest, current_date, end_date)
                         break  # No more articles, exit the page loop
-                    
-                    daily_articles = [{
-                        'source': article['source']['name'],
-                        'title': article['title'],
-                        'content': article['description'] or article['content'],
-                        'date': article['publishedAt'],
-                        'url': article['url']
-                    } for article in articles]
-
-                    # Save articles for the current day
-                    with open(file_path, 'w') as f:
-                        json.dump(daily_articles, f, indent=4)
-                    print(f"Saved articles to {file_path}")
-
-                    all_articles.extend(daily_articles)
+
+                    # Save this page of articles for the current day
+                    save_page(save_path, manifest, current_date, page, daily_articles,
+                              math.ceil(data.get('totalResults', 0) / PAGE_SIZE), end_date)
                     page += 1  # Move to the next page
 
                 except requests.RequestException as e:
-                    print(f"An error occurred while fetching news: {str(e)}")
+                    if stats is not None:
+                        stats.record_failure()
+                    if is_upgrade_required(e):
+                        print("Upgrade required. Please check the API documentation.")
+                        mark_day(save_path, manifest, current_date, end_date, truncated=True)
+                    else:
+                        print(f"An error occurred while fetching news: {str(e)}")
                     break
-        
+
+        days.append(current_date)
         current_date += timedelta(days=1)  # Move to the next day
 
+    if stream:
+        return news_day_frames(save_path, manifest, days, store_path=store_path)
+
     # Convert to DataFrame and return
-    df = pd.DataFrame(all_articles)
-    df['date'] = pd.to_datetime(df['date'], utc=True)
+    df = build_news_frame(save_path, manifest, days, store_path=store_path)
+    print(f"Collected {len(df)} news articles.")
+    return df
+
+def collect_news_concurrent(api_key, save_path='data/news_articles', base_url=NEWS_API_URL, max_in_flight=8,
+                            requests_per_second=5.0, max_retries=5, max_pages_per_day=None, stats=None, store_path=None,
+                            lookback_days=30, stream=False):
+    # Fetches the missing pages of all incomplete days over a pooled session with at most
+    # max_in_flight requests open at once and a token bucket capping the request rate
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+    import requests
+
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=lookback_days)  # Free plan allows up to 1 month in the past
+
+    days = []
+    current_date = start_date
+    while current_date <= end_date:
+        days.append(current_date)
+        current_date += timedelta(days=1)
+
+    manifest = load_manifest(save_path)
+    days_to_fetch = [day for day in days if not start_day(manifest, day)['complete']]
+    print(f"{len(days) - len(days_to_fetch)} of {len(days)} days are complete, fetching the rest.")
+
+    if stats is None:
+        stats = RequestStats()
+    limiter = TokenBucket(requests_per_second)
+    session = create_session(pool_size=max_in_flight)
+    failed_days = set()
+    truncated_days = set()
+
+    def fetch_page(day, page):
+        response = get_with_backoff(session, base_url, params=build_params(api_key, day, page),
+                                    limiter=limiter, stats=stats, max_retries=max_retries)
+        return response.json()
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        pending = {}
+        for day in days_to_fetch:
+            entry = manifest_entry(manifest, day)
+            # Without a saved first page the number of pages is unknown, so start with page 1
+            pages = [1] if entry['total_pages'] is None else missing_pages(entry, max_pages_per_day)
+            for page in pages:
+                pending[executor.submit(fetch_page, day, page)] = (day, page)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                day, page = pending.pop(future)
+                try:
+                    data = future.result()
+                except requests.RequestException as e:
+                    if is_upgrade_required(e):
+                        truncated_days.add(day)
+                    else:
+                        failed_days.add(day)
+                        print(f"An error occurred while fetching news for {day.strftime('%Y-%m-%d')} page {page}: {str(e)}")
+                    continue
+
+                # Results are handled on this thread only, so page files and the manifest have a single writer
+                total_pages = math.ceil(data.get('totalResults', 0) / PAGE_SIZE)
+                daily_articles = parse_articles(data)
+                if daily_articles:
+                    save_page(save_path, manifest, day, page, daily_articles, total_pages, end_date)
+                else:
+                    manifest_entry(manifest, day)['total_pages'] = min(total_pages, page - 1)
+
+                if page == 1:
+                    # The first page tells us how many pages the day has, fetch the rest in parallel
+                    for next_page in missing_pages(manifest_entry(manifest, day), max_pages_per_day):
+                        pending[executor.submit(fetch_page, day, next_page)] = (day, next_page)
+    session.close()
+
+    for day in days_to_fetch:
+        entry = manifest_entry(manifest, day)
+        if day in truncated_days:
+            mark_day(save_path, manifest, day, end_date, truncated=True)
+        elif day not in failed_days and entry['total_pages'] is not None and not missing_pages(entry):
+            mark_day(save_path, manifest, day, end_date)
+
+    summary = stats.summary()
+    if summary['requests']:
+        print(f"Fetched {summary['requests']} pages in {summary['wall_clock_s']:.1f}s "
+              f"(latency p50 {summary['latency_p50_ms']:.0f}ms, p95 {summary['latency_p95_ms']:.0f}ms, "
+              f"max {summary['latency_max_ms']:.0f}ms, {summary['retries']} retries, {summary['failures']} failures)")
+
+    if stream:
+        return news_day_frames(save_path, manifest, days, store_path=store_path)
+
+    # Convert to DataFrame and return
+    df = build_news_frame(save_path, manifest, days, store_path=store_path)
     print(f"Collected {len(df)} news articles.")
     return df
@@ -91,17 +91,59 @@
 #     print(f"Total Reddit posts collected: {len(df)}")
 
 
-import praw
 import pandas as pd
 from datetime import datetime, timedelta
 import os
 import json
 import logging
+import re
+import threading
+import time
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def collect_social_media_data(save_path='data/social_media_posts', max_posts_per_subreddit_per_day=50, max_total_posts_per_day=200):
+REDDIT_COLUMNS = ['text', 'created_at', 'user', 'upvotes', 'num_comments', 'subreddit']
+SUBREDDITS = ['wallstreetbets', 'stocks', 'investing', 'StockMarket']
+
+def posts_frame(posts):
+    df = pd.DataFrame(posts, columns=REDDIT_COLUMNS)
+    df['created_at'] = pd.to_datetime(df['created_at'], utc=True)
+    return df
+
+def migrate_to_store(save_path, store_path):
+    # Copy every reddit_posts_YYYYMMDD.json day file into the Parquet store
+    from data_collection import columnar_store
+
+    if not os.path.exists(save_path):
+        return 0
+    file_pattern = re.compile(r'reddit_posts_(\d{8})\.json$')
+    n_days = 0
+    for file_name in sorted(os.listdir(save_path)):
+        match = file_pattern.match(file_name)
+        if match:
+            with open(os.path.join(save_path, file_name), 'r') as f:
+                daily_posts = json.load(f)
+            columnar_store.write_day(store_path, 'reddit', datetime.strptime(match.group(1), '%Y%m%d'), posts_frame(daily_posts))
+            n_days += 1
+    return n_days
+
+def reddit_day_frames(day_sources, store_path=None):
+    # Yields (day, DataFrame) one day at a time from the sources collect_social_media_data recorded
+    from data_collection import columnar_store
+
+    for day, source in day_sources:
+        if isinstance(source, list):
+            yield day, posts_frame(source)
+        elif source == 'store':
+            yield day, columnar_store.read_days(store_path, 'reddit', day, day)
+        else:
+            with open(source, 'r') as f:
+                yield day, posts_frame(json.load(f))
+
+def default_reddit_factory():
+    import praw
+
     # Reddit API credentials
     client_id = os.getenv('REDDIT_CLIENT_ID')
     client_secret = os.getenv('REDDIT_CLIENT_SECRET')
@@ -110,20 +152,133 @@ def collect_social_media_data(save_path='data/social_media_posts', max_posts_per
     if not all([client_id, client_secret]):
         raise ValueError("Reddit API credentials are not set. Please set them in your environment variables.")
 
+    return praw.Reddit(client_id=client_id, client_secret=client_secret, user_agent=user_agent)
+
+def submission_to_post(submission, submission_date, subreddit_name):
+    return {
+        'text': submission.title + " " + (submission.selftext if submission.selftext else ""),
+        'created_at': submission_date.isoformat(),
+        'user': str(submission.author),
+        'upvotes': submission.score,
+        'num_comments': submission.num_comments,
+        'subreddit': subreddit_name
+    }
+
+def scan_subreddit(reddit, subreddit_name, day_starts, max_posts_per_subreddit_per_day):
+    # Walks r/<subreddit_name>'s listing (newest first) once and buckets submissions into the
+    # [day_start, day_start + 1 day) windows of day_starts. Stops once the listing is older than
+    # the earliest window or every window holds max_posts_per_subreddit_per_day posts.
+    buckets = {day_start: [] for day_start in day_starts}
+    earliest = min(day_starts)
+    n_open = len(day_starts)
+    for submission in reddit.subreddit(subreddit_name).new(limit=None):
+        submission_date = datetime.fromtimestamp(submission.created_utc)
+        if submission_date < earliest:
+            break
+        offset = (submission_date - earliest) // timedelta(days=1)
+        day_start = earliest + timedelta(days=offset)
+        bucket = buckets.get(day_start)
+        if bucket is None or len(bucket) >= max_posts_per_subreddit_per_day:
+            continue
+        bucket.append(submission_to_post(submission, submission_date, subreddit_name))
+        if len(bucket) >= max_posts_per_subreddit_per_day:
+            n_open -= 1
+            if n_open == 0:
+                break
+    return buckets
+
+def scan_subreddits(reddit_factory, subreddits, day_starts, max_posts_per_subreddit_per_day, max_workers=4, stats=None):
+    # Scans every subreddit once, concurrently. PRAW clients are not thread-safe, so each worker
+    # thread creates one client and reuses it for all the subreddits it scans.
+    from concurrent.futures import ThreadPoolExecutor
+
+    local = threading.local()
+
+    def scan(subreddit_name):
+        if not hasattr(local, 'reddit'):
+            local.reddit = reddit_factory()
+        logger.info(f"Scanning r/{subreddit_name} back to {min(day_starts).strftime('%Y-%m-%d')}")
+        started = time.perf_counter()
+        buckets = scan_subreddit(local.reddit, subreddit_name, day_starts, max_posts_per_subreddit_per_day)
+        if stats is not None:
+            stats.record(time.perf_counter() - started)
+        return buckets
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(subreddits)))) as executor:
+        futures = {subreddit_name: executor.submit(scan, subreddit_name) for subreddit_name in subreddits}
+        for subreddit_name, future in futures.items():
+            try:
+                results[subreddit_name] = future.result()
+            except Exception as e:
+                if stats is not None:
+                    stats.record_failure()
+                logger.error(f"An error occurred while scanning r/{subreddit_name}: {str(e)}")
+    return results
+
+def collect_social_media_data(save_path='data/social_media_posts', max_posts_per_subreddit_per_day=50, max_total_posts_per_day=200,
+                              store_path=None, single_pass=False, max_workers=4, reddit_factory=None, subreddits=None,
+                              lookback_days=30, stream=False, stats=None):
+    # store_path (optional) keeps finished days in the Parquet store of data_collection.columnar_store.
+    # single_pass=True scans each subreddit's listing once for all missing days (max_workers subreddits
+    # at a time) instead of re-walking it for every day. reddit_factory returns a PRAW-like client and
+    # defaults to one built from the REDDIT_* environment variables. stream=True returns an iterator of
+    # (day, DataFrame) partitions instead of one DataFrame, and keeps no posts in memory meanwhile.
+    # stats (a RequestStats) records how long each subreddit listing took to walk, and failed days.
+    from data_collection import columnar_store
+
+    if reddit_factory is None:
+        reddit_factory = default_reddit_factory
+        # Fail early, as before, when the credentials are missing
+        if not all([os.getenv('REDDIT_CLIENT_ID'), os.getenv('REDDIT_CLIENT_SECRET')]):
+            raise ValueError("Reddit API credentials are not set. Please set them in your environment variables.")
+
     # Set up search parameters
-    subreddits = ['wallstreetbets', 'stocks', 'investing', 'StockMarket']
+    if subreddits is None:
+        subreddits = SUBREDDITS
     end_date = datetime.utcnow()
-    start_date = end_date - timedelta(days=30)
+    start_date = end_date - timedelta(days=lookback_days)
 
     # Prepare to store all posts across all days
     all_days_data = []
+    # With stream=True, where each day's posts are read back from: 'store', a JSON day file, or posts
+    # that were fetched but could not be saved
+    day_sources = []
+
+    # Days that are over and already in the Parquet store are read from there at the end
+    stored = columnar_store.stored_days(store_path, 'reddit') if store_path is not None else set()
+    store_days = []
+
+    def file_path_for(day):
+        return os.path.join(save_path, f"reddit_posts_{day.strftime('%Y%m%d')}.json")
+
+    def is_stored(day):
+        return day.date() < end_date.date() and columnar_store.day_key(day) in stored
+
+    scanned = None
+    if single_pass:
+        days_to_fetch = []
+        current_date = start_date
+        while current_date <= end_date:
+            if not is_stored(current_date) and not os.path.exists(file_path_for(current_date)):
+                days_to_fetch.append(current_date)
+            current_date += timedelta(days=1)
+        if days_to_fetch:
+            scanned = scan_subreddits(reddit_factory, subreddits, days_to_fetch, max_posts_per_subreddit_per_day,
+                                      max_workers=max_workers, stats=stats)
 
     # Loop through each day in the date range
     current_date = start_date
     while current_date <= end_date:
+        day_is_over = current_date.date() < end_date.date()
+        if is_stored(current_date):
+            store_days.append(current_date)
+            day_sources.append((current_date, 'store'))
+            current_date += timedelta(days=1)
+            continue
+
         daily_posts = []  # Store posts for the current day across all subreddits
-        day_str = current_date.strftime('%Y%m%d')
-        file_path = os.path.join(save_path, f"reddit_posts_{day_str}.json")
+        file_path = file_path_for(current_date)
         
         # Check if the file for this day already exists
         if os.path.exists(file_path):
@@ -134,28 +289,32 @@ def collect_social_media_data(save_path='data/social_media_posts', max_posts_per
             logger.info(f"Fetching data for {current_date.strftime('%Y-%m-%d')}")
 
             try:
-                reddit = praw.Reddit(client_id=client_id, client_secret=client_secret, user_agent=user_agent)
-
-                for subreddit_name in subreddits:
-                    subreddit_posts = []  # Store posts for this subreddit for the current day
-                    subreddit = reddit.subreddit(subreddit_name)
-                    submissions = subreddit.new(limit=None)
-
-                    for submission in submissions:
-                        submission_date = datetime.fromtimestamp(submission.created_utc)
-                        if current_date <= submission_date < current_date + timedelta(days=1):
-                            subreddit_posts.append({
-                                'text': submission.title + " " + (submission.selftext if submission.selftext else ""),
-                                'created_at': submission_date.isoformat(),
-                                'user': str(submission.author),
-                                'upvotes': submission.score,
-                                'num_comments': submission.num_comments,
-                                'subreddit': subreddit_name
-                            })
-
-                        # Stop collecting for this subreddit once max posts are reached
-                        if len(subreddit_posts) >= max_posts_per_subreddit_per_day:
-                            break
+                if scanned is not None:
+                    # Posts were already bucketed by the single-pass scan
+                    if len(scanned) < len(subreddits):
+                        raise RuntimeError("Not every subreddit could be scanned")
+                    subreddit_listings = ((name, scanned[name][current_date]) for name in subreddits)
+                else:
+                    reddit = reddit_factory()
+                    subreddit_listings = ((name, None) for name in subreddits)
+
+                for subreddit_name, subreddit_posts in subreddit_listings:
+                    if subreddit_posts is None:
+                        listing_started = time.perf_counter()
+                        subreddit_posts = []  # Store posts for this subreddit for the current day
+                        subreddit = reddit.subreddit(subreddit_name)
+                        submissions = subreddit.new(limit=None)
+
+                        for submission in submissions:
+                            submission_date = datetime.fromtimestamp(submission.created_utc)
+                            if current_date <= submission_date < current_date + timedelta(days=1):
+                                subreddit_posts.append(submission_to_post(submission, submission_date, subreddit_name))
+
+                            # Stop collecting for this subreddit once max posts are reached
+                            if len(subreddit_posts) >= max_posts_per_subreddit_per_day:
+                                break
+                        if stats is not None:
+                            stats.record(time.perf_counter() - listing_started)
 
                     logger.info(f"Collected {len(subreddit_posts)} posts from r/{subreddit_name} for {current_date.strftime('%Y-%m-%d')}")
                     daily_posts.extend(subreddit_posts)
@@ -174,18 +333,30 @@ def collect_social_media_data(save_path='data/social_media_posts', max_posts_per
                     logger.info(f"Saved Reddit posts to {file_path}")
 
             except Exception as e:
+                if stats is not None:
+                    stats.record_failure()
                 logger.error(f"An error occurred while fetching Reddit posts: {str(e)}")
 
-        # Append the current day's posts to the total data
-        all_days_data.extend(daily_posts)
+        if store_path is not None and day_is_over and os.path.exists(file_path):
+            # The day is saved and can no longer change, move it to the Parquet store
+            columnar_store.write_day(store_path, 'reddit', current_date, posts_frame(daily_posts))
+            store_days.append(current_date)
+            day_sources.append((current_date, 'store'))
+        elif stream:
+            day_sources.append((current_date, file_path if os.path.exists(file_path) else daily_posts))
+        else:
+            # Append the current day's posts to the total data
+            all_days_data.extend(daily_posts)
         current_date += timedelta(days=1)  # Move to the next day
 
+    if stream:
+        return reddit_day_frames(day_sources, store_path)
+
     # Convert the aggregated posts from all days to a DataFrame
-    if all_days_data:
-        df = pd.DataFrame(all_days_data)
-        df['created_at'] = pd.to_datetime(df['created_at'], utc=True)
-        return df
-    else:
+    df = posts_frame(all_days_data)
+    if store_days:
+        df = pd.concat([columnar_store.read_days(store_path, 'reddit', store_days[0], store_days[-1], days=store_days), df],
+                       ignore_index=True)
+    if df.empty:
         logger.warning("No posts collected during the given date range.")
-        return pd.DataFrame(columns=['text', 'created_at', 'user', 'upvotes', 'num_comments', 'subreddit'])
-
+    return df
@@ -1,10 +1,27 @@
-import yfinance as yf
 import pandas as pd
 from datetime import datetime, timedelta
+import os
+import time
+
+# Columns Ticker.history() returns; the bulk path keeps the same ones so features do not change
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume', 'Dividends', 'Stock Splits']
+
+def normalize_hourly(data):
+    # Ensure the data is timezone-aware and matches UTC
+    if data.index.tz is None:
+        data.index = data.index.tz_localize('UTC')
+    else:
+        data.index = data.index.tz_convert('UTC')
+
+    # Resample to hourly data, keeping the first entry for each hour
+    return data.resample('H', label='left', closed='left').first().dropna()
+
+def collect_stock_prices(symbols=['^GSPC'], stats=None):
+    # stats (a data_collection.http_client.RequestStats) records the latency of each symbol's download
+    import yfinance as yf
 
-def collect_stock_prices(symbols=['^GSPC']):
     stock_data = {}
-    
+
     # Use UTC for both start and end dates, ensuring consistency with yfinance data
     end_date = datetime.now().astimezone(pd.Timestamp.utcnow().tz)  # Ensuring timezone-aware
     start_date = end_date - timedelta(days=100)  # Adjust this as needed
@@ -12,27 +29,142 @@ def collect_stock_prices(symbols=['^GSPC']):
     for symbol in symbols:
         try:
             ticker = yf.Ticker(symbol)
+            request_started = time.perf_counter()
             data = ticker.history(
                 start=start_date.strftime('%Y-%m-%d'),
                 end=end_date.strftime('%Y-%m-%d'),
                 interval='1h'  # Use hourly intervals
             )
+            if stats is not None:
+                stats.record(time.perf_counter() - request_started)
             if not data.empty:
-                # Ensure the data is timezone-aware and matches UTC
-                if data.index.tz is None:
-                    data.index = data.index.tz_localize('UTC')
-                else:
-                    data.index = data.index.tz_convert('UTC')
-                
-                # Resample to hourly data, keeping the first entry for each hour
-                data = data.resample('H', label='left', closed='left').first().dropna()
-                
+                data = normalize_hourly(data)
+
                 stock_data[symbol] = data
                 print(f"Collected {len(data)} hours of stock data for {symbol}.")
                 print(f"Data range: {data.index.min()} to {data.index.max()}")
             else:
                 print(f"No data available for {symbol}.")
         except Exception as e:
+            if stats is not None:
+                stats.record_failure()
             print(f"Error collecting data for {symbol}: {str(e)}")
-    
+
+    return stock_data
+
+def yfinance_fetcher(symbols, start, end):
+    # One batched yf.download call for all symbols, returning {symbol: raw hourly frame}
+    import yfinance as yf
+
+    data = yf.download(
+        tickers=symbols,
+        start=start.strftime('%Y-%m-%d'),
+        end=end.strftime('%Y-%m-%d'),
+        interval='1h',
+        group_by='ticker',
+        auto_adjust=True,  # Same prices as Ticker.history()
+        actions=True,  # Include Dividends and Stock Splits like Ticker.history()
+        threads=True,
+        progress=False
+    )
+    if data.empty:
+        return {}
+    if not isinstance(data.columns, pd.MultiIndex):
+        return {symbols[0]: data}
+    return {symbol: data[symbol] for symbol in data.columns.get_level_values(0).unique()}
+
+def cache_file_path(cache_path, symbol):
+    safe_symbol = ''.join(c if c.isalnum() or c in '-_.' else '_' for c in symbol)
+    return os.path.join(cache_path, f"prices_{safe_symbol}.parquet")
+
+def load_cached_prices(cache_path, symbol):
+    if cache_path is None:
+        return None
+    file_path = cache_file_path(cache_path, symbol)
+    if not os.path.exists(file_path):
+        return None
+    return pd.read_parquet(file_path)
+
+def save_cached_prices(cache_path, symbol, data):
+    if not os.path.exists(cache_path):
+        os.makedirs(cache_path)
+    file_path = cache_file_path(cache_path, symbol)
+    tmp_path = file_path + '.tmp'
+    data.to_parquet(tmp_path)
+    os.replace(tmp_path, file_path)
+
+def missing_windows(cached, start_date, end_date):
+    # Hours before the first and after the last cached bar still need fetching. Gaps inside the
+    # cached range are market closures, not missing data, so they are not refetched.
+    if cached is None or cached.empty or cached.index.max() < start_date:
+        return [(start_date, end_date)]
+    windows = []
+    if start_date < cached.index.min() - timedelta(days=1):
+        windows.append((start_date, cached.index.min()))
+    # The last cached hour may have been a partial bar, so the top-up starts from its day
+    windows.append((cached.index.max(), end_date))
+    return windows
+
+def download_prices(symbols, fetcher=None, cache_path=None, lookback_days=100, batch_size=100, end_date=None):
+    # Hourly bars for many symbols as one long frame indexed by (symbol, Datetime). Symbols are fetched
+    # in batches that share the same missing window, so after the first run only the hours since the
+    # last cached bar are downloaded.
+    if fetcher is None:
+        fetcher = yfinance_fetcher
+    if end_date is None:
+        end_date = pd.Timestamp.now(tz='UTC')
+    start_date = end_date - timedelta(days=lookback_days)
+
+    cached = {symbol: load_cached_prices(cache_path, symbol) for symbol in symbols}
+
+    # Group symbols by the window they are missing, so each group is one batched request
+    requests_by_window = {}
+    for symbol in symbols:
+        for start, end in missing_windows(cached[symbol], start_date, end_date):
+            window = (start.floor('D'), (end + timedelta(days=1)).floor('D'))
+            requests_by_window.setdefault(window, []).append(symbol)
+
+    fetched = {symbol: [] for symbol in symbols}
+    for (start, end), window_symbols in requests_by_window.items():
+        for batch_start in range(0, len(window_symbols), batch_size):
+            batch = window_symbols[batch_start:batch_start + batch_size]
+            try:
+                raw = fetcher(batch, start, end)
+            except Exception as e:
+                print(f"Error collecting data for {len(batch)} symbols from {start} to {end}: {str(e)}")
+                continue
+            for symbol, data in raw.items():
+                data = data.dropna(how='all')
+                if not data.empty:
+                    columns = [column for column in PRICE_COLUMNS if column in data.columns]
+                    fetched[symbol].append(normalize_hourly(data[columns]))
+
+    frames = {}
+    for symbol in symbols:
+        parts = [cached[symbol]] if cached[symbol] is not None else []
+        parts.extend(fetched[symbol])
+        if not parts:
+            print(f"No data available for {symbol}.")
+            continue
+        # Freshly fetched bars replace cached ones for the same hour
+        data = pd.concat(parts)
+        data = data[~data.index.duplicated(keep='last')].sort_index()
+        if cache_path is not None and fetched[symbol]:
+            save_cached_prices(cache_path, symbol, data)
+        data = data.loc[start_date:end_date]
+        if not data.empty:
+            frames[symbol] = data
+
+    if not frames:
+        return pd.DataFrame(columns=PRICE_COLUMNS, index=pd.MultiIndex.from_tuples([], names=['symbol', 'Datetime']))
+    return pd.concat(frames, names=['symbol', 'Datetime'])
+
+def collect_stock_prices_bulk(symbols=['^GSPC'], fetcher=None, cache_path=None, lookback_days=100, batch_size=100):
+    # Same {symbol: hourly frame} result as collect_stock_prices, built from one long frame
+    prices = download_prices(symbols, fetcher=fetcher, cache_path=cache_path, lookback_days=lookback_days,
+                             batch_size=batch_size)
+    stock_data = {}
+    for symbol, data in prices.groupby(level='symbol', sort=False):
+        stock_data[symbol] = data.droplevel('symbol')
+        print(f"Collected {len(stock_data[symbol])} hours of stock data for {symbol}.")
     return stock_data
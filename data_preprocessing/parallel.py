@@ -0,0 +1,69 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import math
+import multiprocessing
+import os
+import threading
+import time
+import pandas as pd
+
+# Below this many rows the cost of starting worker processes outweighs the speedup
+PARALLEL_MIN_ROWS = 20000
+
+def resolve_workers(n_workers):
+    # None or a non-positive count means one worker per core
+    if n_workers is None or n_workers <= 0:
+        return os.cpu_count() or 1
+    return n_workers
+
+def pool_context():
+    # Start method of every process pool. Pipeline stages run on threads, and a child forked while
+    # another thread holds a lock (logging's, the import lock, a BLAS pool's) can deadlock on it, so
+    # workers start from a forkserver, a clean single-threaded process, or are spawned where there is
+    # no forkserver. Functions sent to them must be importable, as for any process pool.
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+# CPU seconds used by the tasks of every process pool, for pipeline.instrumentation. Pool workers are
+# children of the forkserver, not of this process, so getrusage(RUSAGE_CHILDREN) never counts them: each
+# task measures its own CPU time and it is added here when the task's result comes back.
+_worker_cpu_seconds = 0.0
+_worker_cpu_lock = threading.Lock()
+
+def timed_task(func, *args, **kwargs):
+    # Runs in a worker process: func's result and the CPU seconds of the worker it took
+    started = time.process_time()
+    result = func(*args, **kwargs)
+    return result, time.process_time() - started
+
+def task_result(timed_result):
+    # The result of a timed_task, after adding its CPU time to worker_cpu_seconds()
+    global _worker_cpu_seconds
+    result, cpu_seconds = timed_result
+    with _worker_cpu_lock:
+        _worker_cpu_seconds += cpu_seconds
+    return result
+
+def worker_cpu_seconds():
+    return _worker_cpu_seconds
+
+def split_series(series, chunk_size):
+    return [series.iloc[start:start + chunk_size] for start in range(0, len(series), chunk_size)]
+
+def parallel_map_series(func, series, n_workers=None, chunk_size=None, min_rows=PARALLEL_MIN_ROWS):
+    # func takes a Series chunk and returns a Series with the same index; it must be a
+    # module-level function (or functools.partial of one) so it can be sent to worker processes
+    n_workers = resolve_workers(n_workers)
+    if n_workers == 1 or len(series) < min_rows:
+        return func(series)
+
+    # A few chunks per worker keeps the pool busy when some chunks are slower than others
+    if chunk_size is None:
+        chunk_size = math.ceil(len(series) / (n_workers * 4))
+    chunks = split_series(series, chunk_size)
+
+    with ProcessPoolExecutor(max_workers=min(n_workers, len(chunks)), mp_context=pool_context()) as executor:
+        # executor.map yields results in submission order, so concatenating them restores the original order
+        results = [task_result(result) for result in executor.map(partial(timed_task, func), chunks)]
+
+    return pd.concat(results)
@@ -1,23 +1,27 @@
+import numpy as np
 import pandas as pd
 
+HOUR_NS = 3600 * 10**9
+
+# Hourly aggregates from aggregate_sentiment. 'score' is the mean over every document in the hour, as
+# the sentiment feature; the rest can be added as features with engineer_features(sentiment_columns=...).
+# The weighted means give each Reddit post a weight of 1 + its upvotes (or comments), so posts with
+# none still count.
+SOURCE_COLUMNS = ['count', 'news_count', 'news_mean', 'reddit_count', 'reddit_mean', 'reddit_upvote_mean',
+                  'reddit_comment_mean']
+HOURLY_COLUMNS = ['score'] + SOURCE_COLUMNS
 
 def process_sentiment_data(news_data, social_media_data, sentiment_analysis_scores):
-    # Combine dates from news_data and social_media_data into a single list
-    sentiment_dates = pd.to_datetime(news_data['date'].tolist() + social_media_data['created_at'].tolist())
+    # One row per scored document, news first, indexed by naive UTC time. Documents sharing a timestamp
+    # are all kept.
+    sentiment_dates = pd.DatetimeIndex(np.concatenate([
+        document_times(news_data['date']),
+        document_times(social_media_data['created_at']),
+    ]), name='date')
 
     # Create a DataFrame to combine the dates and the sentiment scores
-    sentiment_df = pd.DataFrame({
-        'date': sentiment_dates,
-        'score': sentiment_analysis_scores
-    })
-
-    # Drop duplicate rows based on the 'date' column, keeping the first occurrence
-    sentiment_df = sentiment_df.drop_duplicates(subset='date', keep='first')
-
-    # Set 'date' as the index
-    sentiment_df.set_index('date', inplace=True)
-    sentiment_df.index = sentiment_df.index.tz_localize(None)
-    sentiment_df = sentiment_df.sort_index()
+    sentiment_df = pd.DataFrame({'score': np.asarray(sentiment_analysis_scores, dtype='float64')}, index=sentiment_dates)
+    sentiment_df = sentiment_df.sort_index(kind='stable')
 
     # Filter sentiment_scores to only include entries from the last 30 days
     cutoff_date = pd.Timestamp.now() - pd.DateOffset(days=30)
@@ -25,4 +29,96 @@ def process_sentiment_data(news_data, social_media_data, sentiment_analysis_scor
 
     return sentiment_scores_filtered
 
+def document_times(dates):
+    # Naive UTC datetime64[ns] values, for tz-aware or naive timestamps or strings. Columns that are
+    # already datetimes are converted directly; to_datetime would first check them for repeats.
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, utc=True)
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_convert('UTC').dt.tz_localize(None)
+    return dates.to_numpy(dtype='datetime64[ns]')
+
+# Per source: the timestamp column and the weight columns of the weighted means
+SOURCES = {
+    'news': ('date', {}),
+    'reddit': ('created_at', {'upvote': 'upvotes', 'comment': 'num_comments'}),
+}
+
+def aggregate_sentiment(news_data, social_media_data, sentiment_analysis_scores, cutoff_days=30, chunk_size=1_000_000):
+    # Hourly sentiment over every scored document, overall and per source, as a frame with a row for
+    # every hour from the first document to the last (HOURLY_COLUMNS; means are NaN for hours without
+    # documents). sentiment_analysis_scores are in the order the texts were scored: news, then Reddit.
+    # Documents are added to a SentimentAggregator chunk_size at a time.
+    scores = np.asarray(sentiment_analysis_scores, dtype='float64')
+    n_news = len(news_data)
+    aggregator = SentimentAggregator(cutoff_days)
+    for source, documents, source_scores in (('news', news_data, scores[:n_news]),
+                                             ('reddit', social_media_data, scores[n_news:])):
+        for start in range(0, len(documents), chunk_size):
+            aggregator.add(source, documents.iloc[start:start + chunk_size], source_scores[start:start + chunk_size])
+    return aggregator.frame()
+
+class SentimentAggregator:
+    # Running per-hour sums of scored documents, added a batch at a time (a chunk, or a day from a
+    # stream). Documents are bucketed by integer hour and summed with bincount; only the sums over each
+    # batch's hours are kept, so memory grows with the number of hours, not documents.
+    def __init__(self, cutoff_days=None):
+        # Documents older than cutoff_days before now are left out
+        self.cutoff = None if cutoff_days is None else (pd.Timestamp.now() - pd.DateOffset(days=cutoff_days)).value
+        self.parts = []
+        self.documents = 0
+
+    def add(self, source, documents, scores):
+        # documents is a news or Reddit frame (for the timestamp and weight columns), scores its
+        # sentiment scores in the same order
+        date_column, weight_columns = SOURCES[source]
+        scores = np.asarray(scores, dtype='float64')
+        times = document_times(documents[date_column]).view(np.int64)
+        valid = ~np.isnan(scores)
+        if self.cutoff is not None:
+            valid &= times >= self.cutoff
+        if not valid.any():
+            return
+        hours = times[valid] // HOUR_NS
+        first_hour = int(hours.min())
+        buckets = hours - first_hour
+        scores = scores[valid]
+        sums = {'count': np.bincount(buckets), 'sum': np.bincount(buckets, weights=scores)}
+        for weight, column in weight_columns.items():
+            # A weight of 1 + the count, so posts with no upvotes or comments still count
+            weights = 1 + np.clip(np.nan_to_num(documents[column].to_numpy(dtype='float64')[valid]), 0, None)
+            sums[f'{weight}_sum'] = np.bincount(buckets, weights=weights * scores)
+            sums[f'{weight}_weights'] = np.bincount(buckets, weights=weights)
+        self.parts.append((source, first_hour, sums))
+        self.documents += len(scores)
+
+    def frame(self):
+        if self.parts:
+            first_hour = min(part_first for _, part_first, _ in self.parts)
+            last_hour = max(part_first + len(sums['count']) - 1 for _, part_first, sums in self.parts)
+        else:
+            first_hour, last_hour = 0, -1
+        n_hours = last_hour - first_hour + 1
+        totals = {source: {key: np.zeros(n_hours) for key in ['count', 'sum'] + [f'{weight}_{part}' for weight in weights
+                                                                                  for part in ('sum', 'weights')]}
+                  for source, (_, weights) in SOURCES.items()}
+        for source, part_first, sums in self.parts:
+            offset = part_first - first_hour
+            for key, values in sums.items():
+                totals[source][key][offset:offset + len(values)] += values
 
+        news, reddit = totals['news'], totals['reddit']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            count = news['count'] + reddit['count']
+            columns = {
+                'score': (news['sum'] + reddit['sum']) / count,
+                'count': count,
+                'news_count': news['count'],
+                'news_mean': news['sum'] / news['count'],
+                'reddit_count': reddit['count'],
+                'reddit_mean': reddit['sum'] / reddit['count'],
+                'reddit_upvote_mean': reddit['upvote_sum'] / reddit['upvote_weights'],
+                'reddit_comment_mean': reddit['comment_sum'] / reddit['comment_weights'],
+            }
+        index = pd.DatetimeIndex((first_hour + np.arange(n_hours)) * HOUR_NS, name='date', freq='H' if n_hours else None)
+        return pd.DataFrame(columns, index=index, columns=HOURLY_COLUMNS)
@@ -1,14 +1,119 @@
-from textblob import TextBlob
+from functools import partial
+import numpy as np
 import pandas as pd
+from data_preprocessing.parallel import parallel_map_series
 
-def analyze_sentiment(text_data):
-    if isinstance(text_data, pd.Series):
-        return text_data.apply(get_sentiment)
-    elif isinstance(text_data, list):
-        return [get_sentiment(text) for text in text_data]
+# Bump whenever a change to the scoring rules changes the output, so cached results are recomputed
+ANALYZER_VERSION = '1'
+
+# Same negation words TextBlob's English PatternAnalyzer uses
+NEGATIONS = frozenset(('no', 'not', "n't", 'never'))
+
+# Token -> (polarity, intensity, is_modifier) table, built from TextBlob's lexicon on first use
+_POLARITY_LEXICON = None
+
+def analyze_sentiment(text_data, engine='batch', n_workers=1, cache=None):
+    # n_workers > 1 (or None for all cores) scores large Series in chunks across a process pool
+    # cache (a SentimentCache) skips documents that were scored on a previous run
+    if cache is not None and isinstance(text_data, pd.Series):
+        version = f"{ANALYZER_VERSION}-{engine}"
+        return cache.apply('score', version, text_data, partial(analyze_sentiment, engine=engine, n_workers=n_workers), dtype='float64')
+
+    if n_workers != 1 and isinstance(text_data, pd.Series):
+        return parallel_map_series(partial(analyze_sentiment, engine=engine), text_data, n_workers=n_workers)
+
+    # engine='batch' scores with the lexicon table below; engine='textblob' builds a TextBlob per row.
+    # On cleaned text (lowercase letters and whitespace, as produced by text_cleaner) the two engines
+    # agree to within 1e-9. Raw text is only split on whitespace by the batch engine, so punctuation,
+    # emoticons and contractions are not handled the way TextBlob's tokenizer does and scores may differ.
+    if engine == 'textblob':
+        if isinstance(text_data, pd.Series):
+            return text_data.apply(get_sentiment)
+        elif isinstance(text_data, list):
+            return [get_sentiment(text) for text in text_data]
+        else:
+            return get_sentiment(text_data)
+    elif engine == 'batch':
+        if isinstance(text_data, pd.Series):
+            return analyze_sentiment_batch(text_data)
+        elif isinstance(text_data, list):
+            return analyze_sentiment_batch(pd.Series(text_data, dtype=object)).tolist()
+        else:
+            return score_tokens(str(text_data).lower().split())
     else:
-        return get_sentiment(text_data)
+        raise ValueError(f"Unknown sentiment engine: {engine}")
 
 def get_sentiment(text):
+    from textblob import TextBlob
+
     return TextBlob(str(text)).sentiment.polarity
 
+def load_polarity_lexicon():
+    global _POLARITY_LEXICON
+    if _POLARITY_LEXICON is None:
+        from textblob.en import sentiment as pattern_sentiment
+
+        lexicon = {}
+        for word, scores in pattern_sentiment.items():
+            # Scores under the None key are averaged over all part-of-speech tags, which is what
+            # TextBlob uses for plain strings
+            polarity, _, intensity = scores[None]
+            is_modifier = any(pos in scores for pos in pattern_sentiment.modifiers)
+            lexicon[word] = (polarity, intensity, is_modifier)
+        _POLARITY_LEXICON = lexicon
+    return _POLARITY_LEXICON
+
+def score_tokens(tokens):
+    # Mirrors the assessment rules of TextBlob's PatternAnalyzer for a list of lowercase word tokens
+    lexicon = load_polarity_lexicon()
+    assessments = []  # [polarity, intensity, negated] per assessed chunk
+    modifier = None
+    negation = None
+    for word in tokens:
+        entry = lexicon.get(word)
+        if entry is not None:
+            polarity, intensity, is_modifier = entry
+            if modifier is None:
+                # Known word not preceded by a modifier ("good")
+                assessments.append([polarity, intensity, False])
+            else:
+                # Known word preceded by a modifier ("really good")
+                last = assessments[-1]
+                last[0] = max(-1.0, min(polarity * last[1], 1.0))
+                last[1] = intensity
+            if negation is not None:
+                # Known word preceded by a negation ("not really good")
+                last = assessments[-1]
+                last[1] = 1.0 / last[1]
+                last[2] = True
+            modifier = word if is_modifier else None
+            negation = word if word in NEGATIONS else None
+        else:
+            if word in NEGATIONS:
+                negation = word
+            elif negation and len(word.strip("'")) > 1:
+                # Retain negation across small words only ("not a good")
+                negation = None
+            if negation is not None and modifier is not None and modifier.endswith('ly'):
+                # Negation preceded by a modifier ("really not good")
+                assessments[-1][2] = True
+                negation = None
+            elif modifier and len(word) > 2:
+                # Retain modifier across small words only ("really is a good")
+                modifier = None
+
+    total = 0
+    for polarity, _, negated in assessments:
+        # "not good" = slightly bad, "not bad" = slightly good
+        total += polarity * -0.5 if negated else polarity
+    return total / float(len(assessments) or 1)
+
+def analyze_sentiment_batch(text_series):
+    # Score each distinct text once and gather the scores back into the original order
+    codes, uniques = pd.factorize(text_series.astype(str))
+    unique_scores = np.fromiter(
+        (score_tokens(text.lower().split()) for text in uniques),
+        dtype=np.float64,
+        count=len(uniques)
+    )
+    return pd.Series(unique_scores[codes], index=text_series.index, name=text_series.name)
@@ -0,0 +1,91 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# SQLite limits the number of bound parameters per statement (999 in older builds)
+LOOKUP_BATCH_SIZE = 900
+
+def text_key(text):
+    return hashlib.blake2b(str(text).encode('utf-8'), digest_size=16).digest()
+
+class SentimentCache:
+    # Persistent store of per-document results (cleaned text, sentiment score), keyed by a hash of the
+    # input text plus the version of the code that produced the result. Bumping a version in
+    # text_cleaner or sentiment_analyzer makes every older entry for that stage a miss.
+    # One cache can be shared by the stage threads of sentiment_stream; statements are serialised.
+    def __init__(self, path='sentiment_cache.sqlite'):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                namespace TEXT NOT NULL,
+                version TEXT NOT NULL,
+                key BLOB NOT NULL,
+                value,
+                PRIMARY KEY (namespace, version, key)
+            ) WITHOUT ROWID
+        """)
+        self.connection.commit()
+        self.stats = {}
+
+    def lookup(self, namespace, version, keys):
+        found = {}
+        with self.lock:
+            for start in range(0, len(keys), LOOKUP_BATCH_SIZE):
+                batch = keys[start:start + LOOKUP_BATCH_SIZE]
+                placeholders = ','.join('?' * len(batch))
+                rows = self.connection.execute(
+                    f"SELECT key, value FROM entries WHERE namespace = ? AND version = ? AND key IN ({placeholders})",
+                    [namespace, version, *batch]
+                )
+                found.update(rows)
+        return found
+
+    def store(self, namespace, version, items):
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO entries (namespace, version, key, value) VALUES (?, ?, ?, ?)",
+                ((namespace, version, key, value) for key, value in items)
+            )
+            self.connection.commit()
+
+    def apply(self, namespace, version, series, func, dtype=None):
+        # Run func (a Series -> Series function) only on the distinct texts that are not cached yet,
+        # then return the cached and new results in the original order and index
+        keys = [text_key(text) for text in series]
+        codes, unique_keys = pd.factorize(pd.Series(keys, dtype=object))
+        unique_keys = list(unique_keys)
+        found = self.lookup(namespace, version, unique_keys)
+
+        missing = [position for position, key in enumerate(unique_keys) if key not in found]
+        if missing:
+            # First row of each distinct missing text
+            _, first_rows = np.unique(codes, return_index=True)
+            missing_series = series.iloc[first_rows[missing]]
+            computed = func(missing_series)
+            new_items = [(unique_keys[position], value) for position, value in zip(missing, computed)]
+            self.store(namespace, version, new_items)
+            found.update(new_items)
+
+        values = [found[key] for key in unique_keys]
+        n_missed_rows = int(np.isin(codes, missing).sum())
+        with self.lock:
+            stats = self.stats.setdefault(namespace, {'hits': 0, 'misses': 0})
+            stats['hits'] += len(series) - n_missed_rows
+            stats['misses'] += n_missed_rows
+        logger.info(f"Sentiment cache {namespace}: {len(series) - n_missed_rows} hits, {n_missed_rows} misses")
+
+        return pd.Series([values[code] for code in codes], index=series.index, name=series.name, dtype=dtype)
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,93 @@
+import logging
+import queue
+import threading
+from data_preprocessing import sentiment_analyzer, text_cleaner
+from data_preprocessing.process_sentiment_data import SOURCES, SentimentAggregator
+
+logger = logging.getLogger(__name__)
+
+# Partitions a stage may run ahead of the next one. With three stages at most about
+# 3 * (QUEUE_SIZE + 1) days of documents are in memory at once, however long the lookback.
+QUEUE_SIZE = 2
+
+# Per source: the column holding the text that is cleaned and scored
+TEXT_COLUMNS = {'news': 'content', 'reddit': 'text'}
+
+_DONE = object()
+
+def bounded_map(func, items, queue_size=QUEUE_SIZE):
+    # Yields func(item) for each item, in order, computed on a background thread that stays at most
+    # queue_size results ahead of the consumer. An exception in func (or in items) is raised to the
+    # consumer; a consumer that stops early stops the thread.
+    results = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+
+    def put(value):
+        while not stop.is_set():
+            try:
+                results.put(value, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put((func(item), None)):
+                    return
+            put((_DONE, None))
+        except BaseException as e:
+            put((None, e))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            value, error = results.get()
+            if error is not None:
+                raise error
+            if value is _DONE:
+                return
+            yield value
+    finally:
+        stop.set()
+
+def source_partitions(source, partitions):
+    # (day, DataFrame) partitions from a collector with stream=True, tagged with their source
+    for day, frame in partitions:
+        yield source, day, frame
+
+def split_documents(partition):
+    # Keeps only what the later stages need from a day's frame: the text, and the timestamp and
+    # weight columns the aggregator reads
+    source, day, frame = partition
+    date_column, weight_columns = SOURCES[source]
+    documents = frame[[date_column, *weight_columns.values()]].reset_index(drop=True)
+    text = frame[TEXT_COLUMNS[source]].reset_index(drop=True)
+    return source, day, documents, text
+
+def stream_hourly_sentiment(partitions, n_workers=1, cache=None, cutoff_days=None, queue_size=QUEUE_SIZE,
+                            cleaner=text_cleaner.clean_text, scorer=sentiment_analyzer.analyze_sentiment):
+    # Hourly sentiment, as aggregate_sentiment returns it, from (source, day, DataFrame) partitions
+    # (see source_partitions). Reading, cleaning and scoring run as a chain of threads joined by bounded
+    # queues and each day is folded into a SentimentAggregator as soon as it is scored, so only the
+    # hourly sums outlive a partition. n_workers and cache are passed to cleaner and scorer.
+    documents = bounded_map(split_documents, (partition for partition in partitions if len(partition[2])), queue_size)
+
+    def clean(partition):
+        source, day, frame, text = partition
+        return source, day, frame, cleaner(text, n_workers=n_workers, cache=cache)
+
+    def score(partition):
+        source, day, frame, text = partition
+        return source, day, frame, scorer(text, n_workers=n_workers, cache=cache)
+
+    aggregator = SentimentAggregator(cutoff_days)
+    n_days = 0
+    for source, day, frame, scores in bounded_map(score, bounded_map(clean, documents, queue_size), queue_size):
+        aggregator.add(source, frame, scores)
+        n_days += 1
+        logger.debug(f"Aggregated {len(frame)} {source} documents from {day:%Y-%m-%d}")
+    logger.info(f"Streamed {aggregator.documents} scored documents from {n_days} day partitions")
+    return aggregator.frame()
@@ -1,30 +1,163 @@
 import pandas as pd
 import numpy as np
 
-def prepare_stock_data(stock_data):
-    for symbol, data in stock_data.items():
-        # Calculate daily returns
-        data['Returns'] = data['Close'].pct_change()
-        
-        # Calculate volatility (20-day rolling standard deviation of returns)
-        data['Volatility'] = data['Returns'].rolling(window=20).std()
-        
-        # Calculate moving averages
-        data['MA5'] = data['Close'].rolling(window=5).mean()
-        data['MA10'] = data['Close'].rolling(window=10).mean()
-        data['MA20'] = data['Close'].rolling(window=20).mean()
-        
-        # Calculate relative strength index (RSI)
-        delta = data['Close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=10).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=10).mean()
-        rs = gain / loss
-        data['RSI'] = 100 - (100 / (1 + rs))
-        
-        # Drop NaN values
-        data.dropna(inplace=True)
-        
-        stock_data[symbol] = data
-    
-    return stock_data
+# Indicator columns added to every symbol's frame, in this order
+INDICATOR_COLUMNS = ['Returns', 'Volatility', 'MA5', 'MA10', 'MA20', 'RSI']
 
+def prepare_stock_data(stock_data, engine='vectorized'):
+    # Returns a new {symbol: frame} dict with the indicator columns added and the warm-up rows
+    # dropped; the caller's frames are not modified.
+    # engine='vectorized' computes every symbol at once on a stacked (symbols x time) array;
+    # engine='pandas' runs the rolling calls symbol by symbol. Both give the same frames to within 1e-9.
+    if engine == 'pandas':
+        return {symbol: prepare_symbol_pandas(data) for symbol, data in stock_data.items()}
+    elif engine == 'vectorized':
+        return prepare_stock_data_vectorized(stock_data)
+    else:
+        raise ValueError(f"Unknown indicator engine: {engine}")
+
+def prepare_symbol_pandas(data):
+    data = data.copy()
+
+    # Calculate daily returns
+    data['Returns'] = data['Close'].pct_change()
+
+    # Calculate volatility (20-day rolling standard deviation of returns)
+    data['Volatility'] = data['Returns'].rolling(window=20).std()
+
+    # Calculate moving averages
+    data['MA5'] = data['Close'].rolling(window=5).mean()
+    data['MA10'] = data['Close'].rolling(window=10).mean()
+    data['MA20'] = data['Close'].rolling(window=20).mean()
+
+    # Calculate relative strength index (RSI)
+    delta = data['Close'].diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=10).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=10).mean()
+    rs = gain / loss
+    data['RSI'] = 100 - (100 / (1 + rs))
+
+    # Drop NaN values
+    return data.dropna()
+
+def prepare_stock_data_vectorized(stock_data):
+    if not stock_data:
+        return {}
+    closes, lengths = stack_closes(stock_data)
+    indicators = compute_indicators(closes)
+
+    prepared = {}
+    for row, (symbol, data) in enumerate(stock_data.items()):
+        values = indicators[:, row, :lengths[row]]
+        # Same rows dropna() keeps: no NaN in the indicators or in any of the original columns
+        keep = ~np.isnan(values).any(axis=0) & data.notna().all(axis=1).to_numpy()
+        positions = np.flatnonzero(keep)
+        if len(positions) and positions[-1] - positions[0] == len(positions) - 1:
+            # Usually only the warm-up bars are dropped, so the kept rows are one slice
+            rows = data.iloc[positions[0]:positions[-1] + 1]
+        else:
+            rows = data.iloc[positions]
+        indicator_frame = pd.DataFrame(values[:, keep].T, index=rows.index, columns=INDICATOR_COLUMNS)
+        if data.columns.isin(INDICATOR_COLUMNS).any():
+            # Indicators from an earlier run are replaced where they are, like the pandas path does
+            prepared[symbol] = rows.assign(**indicator_frame)
+        else:
+            prepared[symbol] = pd.concat([rows, indicator_frame], axis=1)
+    return prepared
+
+def stack_closes(stock_data):
+    # One row per symbol, left-aligned and padded with NaN up to the longest history. Windows are
+    # positional, as in pandas' rolling(), so symbols do not need to share timestamps.
+    lengths = np.array([len(data) for data in stock_data.values()])
+    closes = np.full((len(lengths), lengths.max()), np.nan)
+    for row, data in enumerate(stock_data.values()):
+        closes[row, :lengths[row]] = data['Close'].to_numpy(dtype='float64')
+    return closes, lengths
+
+def compute_indicators(closes):
+    # All indicators for a (symbols x time) array of closes, as one (indicators x symbols x time)
+    # array in INDICATOR_COLUMNS order
+    out = np.full((len(INDICATOR_COLUMNS),) + closes.shape, np.nan)
+    returns, volatility, ma5, ma10, ma20, rsi = out
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # pct_change() forward-fills gaps before dividing by the previous close
+        filled = forward_fill(closes)
+        np.divide(filled[:, 1:], filled[:, :-1], out=returns[:, 1:])
+        returns[:, 1:] -= 1
+        rolling_std(returns, 20, volatility)
+
+        rolling_means(closes, (5, 10, 20), (ma5, ma10, ma20))
+
+        delta = np.full(closes.shape, np.nan)
+        np.subtract(closes[:, 1:], closes[:, :-1], out=delta[:, 1:])
+        # where() turns the leading NaN delta into 0, so RSI starts one bar before the returns do
+        gain, loss = np.empty((2,) + closes.shape)
+        rolling_means(np.where(delta > 0, delta, 0.0), (10,), (gain,))
+        rolling_means(np.where(delta < 0, -delta, 0.0), (10,), (loss,))
+        np.divide(gain, loss, out=rsi)
+        rsi += 1
+        np.divide(100, rsi, out=rsi)
+        np.subtract(100, rsi, out=rsi)
+    return out
+
+def forward_fill(values):
+    valid = ~np.isnan(values)
+    positions = np.where(valid, np.arange(values.shape[1]), 0)
+    np.maximum.accumulate(positions, axis=1, out=positions)
+    return values[np.arange(values.shape[0])[:, None], positions]
+
+def row_offsets(values):
+    # First non-NaN value of each row (0 for all-NaN rows)
+    valid = ~np.isnan(values)
+    offsets = values[np.arange(values.shape[0]), valid.argmax(axis=1)]
+    return np.where(valid.any(axis=1), offsets, 0.0)
+
+def cumulative_sums(values):
+    # Running sums (NaN counted as 0) and running counts of non-NaN values along each row, each with a
+    # leading zero column so that a trailing window's sum is a difference of two columns
+    valid = ~np.isnan(values)
+    sums = np.zeros((values.shape[0], values.shape[1] + 1))
+    np.cumsum(np.where(valid, values, 0.0), axis=1, out=sums[:, 1:])
+    counts = np.zeros(sums.shape, dtype=np.int64)
+    np.cumsum(valid, axis=1, out=counts[:, 1:])
+    return sums, counts
+
+def window_differences(cumulative, window, out):
+    # Column t of out gets the total over columns t - window + 1 .. t
+    return np.subtract(cumulative[:, window:], cumulative[:, :-window], out=out)
+
+def rolling_means(values, windows, outs):
+    # rolling(window).mean() along each row for several windows from one set of cumulative sums. Rows
+    # are shifted by their first value before summing so the sums stay small and their differences
+    # keep full precision.
+    offsets = row_offsets(values)[:, None]
+    sums, counts = cumulative_sums(values - offsets)
+    for window, out in zip(windows, outs):
+        out[:, :window - 1] = np.nan
+        if values.shape[1] < window:
+            continue
+        tail = window_differences(sums, window, out[:, window - 1:])
+        tail /= window
+        tail += offsets
+        # A window with any NaN in it has no value, as with pandas' default min_periods
+        np.copyto(tail, np.nan, where=window_differences(counts, window, None) < window)
+    return outs
+
+def rolling_std(values, window, out):
+    # rolling(window).std() (ddof=1) along each row, written into out
+    out[:, :window - 1] = np.nan
+    if values.shape[1] < window:
+        return out
+    centered = values - row_offsets(values)[:, None]
+    sums, counts = cumulative_sums(centered)
+    squares, _ = cumulative_sums(centered * centered)
+    tail = window_differences(squares, window, out[:, window - 1:])
+    window_sums = window_differences(sums, window, None)
+    tail -= window_sums * window_sums / window
+    tail /= window - 1
+    # Rounding can leave a tiny negative variance for a flat window
+    np.maximum(tail, 0, out=tail)
+    np.sqrt(tail, out=tail)
+    np.copyto(tail, np.nan, where=window_differences(counts, window, None) < window)
+    return out
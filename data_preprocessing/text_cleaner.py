@@ -1,10 +1,17 @@
 import re
+from functools import partial
 import pandas as pd
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
+from data_preprocessing.parallel import parallel_map_series
+
+# Bump whenever a change to the cleaning rules changes the output, so cached results are recomputed
+CLEANER_VERSION = '1'
+
+# Loaded on first use by get_stopwords() so importing this module does not pull in NLTK
+_STOPWORDS = None
 
 def download_nltk_data():
+    import nltk
+
     try:
         nltk.data.find('tokenizers/punkt')
         nltk.data.find('corpora/stopwords')
@@ -13,21 +20,57 @@ def download_nltk_data():
         nltk.download('punkt', quiet=True)
         nltk.download('stopwords', quiet=True)
 
-# Download NLTK data when the module is imported
-download_nltk_data()
+def get_stopwords():
+    global _STOPWORDS
+    if _STOPWORDS is None:
+        download_nltk_data()
+        from nltk.corpus import stopwords
+        _STOPWORDS = frozenset(stopwords.words('english'))
+    return _STOPWORDS
+
+NON_LETTERS = re.compile(r'[^a-zA-Z\s]')
+
+# On letters-only text the only change word_tokenize makes besides splitting on whitespace
+# is breaking up these contractions (MacIntyre's CONTRACTIONS2 in NLTK's Treebank tokenizer)
+TREEBANK_SPLITS = {
+    'cannot': ('can', 'not'),
+    'gimme': ('gim', 'me'),
+    'gonna': ('gon', 'na'),
+    'gotta': ('got', 'ta'),
+    'lemme': ('lem', 'me'),
+    'wanna': ('wan', 'na'),
+}
 
-# Now we can use NLTK functions
-STOPWORDS = set(stopwords.words('english'))
+def clean_text(text, n_workers=1, engine='fast', cache=None):
+    # engine='fast' gives the same output as engine='nltk' without running word_tokenize
+    # n_workers > 1 (or None for all cores) cleans large Series in chunks across a process pool
+    # cache (a SentimentCache) skips documents that were cleaned on a previous run
+    if cache is not None and isinstance(text, pd.Series):
+        # Both engines produce the same output, so they share cache entries
+        return cache.apply('cleaned', CLEANER_VERSION, text, partial(clean_text, n_workers=n_workers, engine=engine), dtype=object)
+
+    if n_workers != 1 and isinstance(text, pd.Series):
+        return parallel_map_series(partial(clean_text, engine=engine), text, n_workers=n_workers)
+
+    if engine == 'fast':
+        clean = clean_single_text_fast
+    elif engine == 'nltk':
+        clean = clean_single_text
+    else:
+        raise ValueError(f"Unknown text cleaning engine: {engine}")
 
-def clean_text(text):
     if isinstance(text, pd.Series):
-        return text.apply(clean_single_text)
+        return pd.Series([clean(t) for t in text], index=text.index, name=text.name, dtype=object)
     elif isinstance(text, list):
-        return [clean_single_text(t) for t in text]
+        return [clean(t) for t in text]
     else:
-        return clean_single_text(text)
+        return clean(text)
 
 def clean_single_text(text):
+    from nltk.tokenize import word_tokenize
+
+    # Loaded first: it also downloads punkt, which word_tokenize needs
+    stopwords = get_stopwords()
     # Convert to lowercase
     text = text.lower()
     # Remove special characters and numbers
@@ -35,7 +78,17 @@ def clean_single_text(text):
     # Tokenize (split into words)
     words = word_tokenize(text)
     # Remove stopwords
-    words = [word for word in words if word not in STOPWORDS]
+    words = [word for word in words if word not in stopwords]
     # Join words back into string
     return ' '.join(words)
 
+def clean_single_text_fast(text):
+    # Lowercase, strip special characters and numbers, split and drop stopwords in one pass
+    stopwords = get_stopwords()
+    words = NON_LETTERS.sub('', text.lower()).split()
+    return ' '.join([
+        part
+        for word in words
+        for part in TREEBANK_SPLITS.get(word, (word,))
+        if part not in stopwords
+    ])
@@ -1,94 +1,96 @@
 import pandas as pd
 import numpy as np
 import logging
+from data_preprocessing.stock_data_preparer import forward_fill, rolling_means
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def engineer_features(sentiment_scores, stock_data):
-    features = {}
-    
+# Sentiment features are taken over the last SENTIMENT_WINDOW bars, with N_LAGS lags of returns and sentiment
+SENTIMENT_WINDOW = 5
+N_LAGS = 5
+SENTIMENT_COLUMNS = ['sentiment', 'SentimentMA5', 'SentimentDiff', 'SentimentReturnsCorr']
+LAG_COLUMNS = [f'{name}_Lag_{i}' for i in range(1, N_LAGS + 1) for name in ('Returns', 'Sentiment')]
+# Columns engineer_features adds to the bars, in order; any sentiment_columns follow 'sentiment'
+ADDED_COLUMNS = SENTIMENT_COLUMNS + LAG_COLUMNS + ['Target']
+
+def hourly_sentiment(sentiment_scores):
     # Convert sentiment_scores to a Series if it's a DataFrame
     if isinstance(sentiment_scores, pd.DataFrame):
-        if len(sentiment_scores.columns) == 1:
+        if 'score' in sentiment_scores.columns and len(sentiment_scores.columns) > 1:
+            # Hourly aggregates from process_sentiment_data.aggregate_sentiment; 'score' is the hour's mean
+            sentiment_scores = sentiment_scores['score'].copy(deep=False)
+        elif len(sentiment_scores.columns) == 1:
             sentiment_scores = sentiment_scores.iloc[:, 0]
         else:
             raise ValueError("sentiment_scores DataFrame must have only one column")
     
     # Ensure sentiment_scores is a pd.Series with a DatetimeIndex
     if not isinstance(sentiment_scores, pd.Series):
-        raise ValueError("sentiment_scores must be a pandas Series or a single-column DataFrame with a DatetimeIndex.")
+        raise ValueError("sentiment_scores must be a pandas Series, a single-column DataFrame or hourly aggregates with a DatetimeIndex.")
     
     # Ensure the index is a DatetimeIndex
     sentiment_scores.index = pd.to_datetime(sentiment_scores.index)
     
     # Aggregate sentiment scores to daily level
-    daily_sentiment = sentiment_scores.resample('H').mean()
+    return sentiment_scores.resample('H').mean()
+
+def hourly_columns(sentiment_scores, columns, hours):
+    # Further columns of the hourly aggregates, on the same hours as hourly_sentiment()
+    if not columns:
+        return None
+    if not isinstance(sentiment_scores, pd.DataFrame) or not set(columns) <= set(sentiment_scores.columns):
+        raise ValueError(f"sentiment_scores has no columns {list(columns)}; pass the output of aggregate_sentiment")
+    extra = sentiment_scores[list(columns)]
+    return extra.set_axis(pd.to_datetime(extra.index), axis=0).reindex(hours)
+
+def fill_sentiment(name, values):
+    # Hours without documents: counts are 0, scores carry the bar before forward, then 0
+    if name.endswith('count'):
+        return values.fillna(0)
+    return values.fillna(method='ffill').fillna(0)
+
+def engineer_features(sentiment_scores, stock_data, engine='vectorized', sentiment_columns=()):
+    # engine='vectorized' maps every symbol's bars onto one shared sentiment calendar (see
+    # SentimentCalendar) and builds the sentiment features, lags and target as NumPy arrays that are
+    # added to each frame in one step. engine='pandas' slices and joins the sentiment for each symbol
+    # and adds the features column by column with rolling() and shift(). Both give the same frames to
+    # within 1e-9, except SentimentReturnsCorr on near-flat windows of long series: pandas computes it
+    # from running sums, which can be off by 1e-4 there, where the vectorized engine sums each window
+    # around its own mean (see benchmarks/bench_feature_engineer.py).
+    #
+    # sentiment_scores are document scores or the hourly aggregates from aggregate_sentiment, whose
+    # sentiment_columns (e.g. process_sentiment_data.SOURCE_COLUMNS) are then added as features next
+    # to 'sentiment'.
+    if engine not in ('vectorized', 'pandas'):
+        raise ValueError(f"Unknown feature engine: {engine}")
+    features = {}
+
+    daily_sentiment = hourly_sentiment(sentiment_scores)
+    extra_sentiment = hourly_columns(sentiment_scores, sentiment_columns, daily_sentiment.index)
     
     logger.info(f"Daily sentiment scores range: {daily_sentiment.index.min()} to {daily_sentiment.index.max()}")
     
+    if engine == 'vectorized':
+        stock_data = {symbol: clean_bars(data) for symbol, data in stock_data.items()}
+        calendar = SentimentCalendar(daily_sentiment, {symbol: data.index for symbol, data in stock_data.items()},
+                                     extra_sentiment)
+    
     for symbol, data in stock_data.items():
         logger.info(f"Processing features for {symbol}")
         
-        # Ensure the index is a DatetimeIndex and sort it
-        data.index = pd.to_datetime(data.index).tz_localize(None)
-        data = data.sort_index()
-        
-        # Remove any duplicate indices
-        data = data[~data.index.duplicated(keep='first')]
-        
-        logger.info(f"Stock data range for {symbol}: {data.index.min()} to {data.index.max()}")
-        logger.info(f"Stock data columns: {data.columns}")
-        logger.info(f"Stock data shape before processing: {data.shape}")
-        
-        # Find the overlapping date range
-        start_date = max(data.index.min(), daily_sentiment.index.min())
-        end_date = min(data.index.max(), daily_sentiment.index.max())
-        
-        logger.info(f"Overlapping range for {symbol}: {start_date} to {end_date}")
-        
-        # Filter both dataframes to the overlapping date range
-        data = data.loc[start_date:end_date]
-        sentiment_df = daily_sentiment.loc[start_date:end_date].to_frame(name='sentiment')
-        
-        logger.info(f"Stock data shape after date range filter: {data.shape}")
-        logger.info(f"Sentiment data shape after date range filter: {sentiment_df.shape}")
-        
-        if data.empty or sentiment_df.empty:
+        if engine == 'vectorized':
+            aligned = calendar.align(symbol, data)
+        else:
+            aligned = join_sentiment(symbol, data, daily_sentiment, extra_sentiment)
+        if aligned is None:
             logger.warning(f"No overlapping data for {symbol}. Skipping this symbol.")
             continue
         
-        # Combine stock data with sentiment scores
-        combined_data = data.join(sentiment_df, how='left')
-        
-        logger.info(f"Combined data shape: {combined_data.shape}")
-        logger.info(f"Combined data columns: {combined_data.columns}")
-        
-        # Fill any remaining NaN values in sentiment column
-        combined_data['sentiment'] = combined_data['sentiment'].fillna(method='ffill').fillna(0)
-        
-        # Calculate moving average of sentiment scores
-        combined_data['SentimentMA5'] = combined_data['sentiment'].rolling(window=5).mean()
-        
-        # Calculate the difference between current sentiment and its moving average
-        combined_data['SentimentDiff'] = combined_data['sentiment'] - combined_data['SentimentMA5']
-        
-        # Calculate the correlation between sentiment and returns
-        combined_data['SentimentReturnsCorr'] = combined_data['sentiment'].rolling(window=5).corr(combined_data['Returns'])
-        
-        # Create lagged features
-        for i in range(1, 6):
-            combined_data[f'Returns_Lag_{i}'] = combined_data['Returns'].shift(i)
-            combined_data[f'Sentiment_Lag_{i}'] = combined_data['sentiment'].shift(i)
-        
-        # Create target variable (next day's return)
-        combined_data['Target'] = combined_data['Returns'].shift(-1)
-        
-        logger.info(f"Data shape before dropping NaNs: {combined_data.shape}")
-        logger.info(f"Columns with NaNs: {combined_data.columns[combined_data.isna().any()].tolist()}")
-        
-        # Dropping all NaN values
-        combined_data = combined_data.dropna()
+        if engine == 'vectorized':
+            combined_data = add_features_vectorized(*aligned)
+        else:
+            combined_data = add_features_pandas(*aligned)
         
         logger.info(f"Data shape after dropping NaNs: {combined_data.shape}")
         
@@ -103,4 +105,215 @@ def engineer_features(sentiment_scores, stock_data):
         logger.error("No valid data remained after feature engineering for any symbol.")
         return None  # Return None instead of raising an exception
     
-    return features
\ No newline at end of file
+    return features
+
+def join_sentiment(symbol, data, daily_sentiment, extra_sentiment=None):
+    # Returns the symbol's bars inside the sentiment range and {column: filled values} for each of
+    # them, 'sentiment' first, or None if they do not overlap
+    
+    # Ensure the index is a DatetimeIndex and sort it
+    data.index = pd.to_datetime(data.index).tz_localize(None)
+    data = data.sort_index()
+    
+    # Remove any duplicate indices
+    data = data[~data.index.duplicated(keep='first')]
+    
+    logger.info(f"Stock data range for {symbol}: {data.index.min()} to {data.index.max()}")
+    logger.debug(f"Stock data columns: {data.columns}")
+    logger.info(f"Stock data shape before processing: {data.shape}")
+    
+    # Find the overlapping date range
+    start_date = max(data.index.min(), daily_sentiment.index.min())
+    end_date = min(data.index.max(), daily_sentiment.index.max())
+    
+    logger.info(f"Overlapping range for {symbol}: {start_date} to {end_date}")
+    
+    # Filter both dataframes to the overlapping date range
+    data = data.loc[start_date:end_date]
+    sentiment_df = daily_sentiment.loc[start_date:end_date].to_frame(name='sentiment')
+    if extra_sentiment is not None:
+        sentiment_df = sentiment_df.join(extra_sentiment.loc[start_date:end_date])
+    
+    logger.info(f"Stock data shape after date range filter: {data.shape}")
+    logger.info(f"Sentiment data shape after date range filter: {sentiment_df.shape}")
+    
+    if data.empty or sentiment_df.empty:
+        return None
+    
+    # Combine stock data with sentiment scores
+    combined_data = data.join(sentiment_df, how='left')
+    
+    logger.info(f"Combined data shape: {combined_data.shape}")
+    
+    # Fill any remaining NaN values in sentiment column
+    return data, {name: fill_sentiment(name, combined_data[name]).to_numpy(dtype='float64')
+                  for name in sentiment_df.columns}
+
+def clean_bars(data):
+    # The bars with a timezone-naive, sorted and unique DatetimeIndex, as join_sentiment makes them.
+    # Each step only runs when needed, and the caller's frame is not modified.
+    index = data.index
+    if not isinstance(index, pd.DatetimeIndex):
+        index = pd.to_datetime(index)
+    if index.tz is not None:
+        # Straight on the index; to_datetime() would go through Python datetimes first
+        index = index.tz_localize(None)
+    if index is not data.index:
+        data = data.copy(deep=False)
+        data.index = index
+    if not data.index.is_monotonic_increasing:
+        data = data.sort_index()
+    if not data.index.is_unique:
+        data = data[~data.index.duplicated(keep='first')]
+    return data
+
+class SentimentCalendar:
+    # Hourly sentiment laid out once on a master calendar: the sorted union of every symbol's bar
+    # times. Symbols trading the same hours share most of it, so the lookup of each bar time in the
+    # hourly sentiment happens once per distinct time rather than once per symbol, and a symbol's
+    # sentiment is a gather at integer positions precomputed with searchsorted.
+    def __init__(self, daily_sentiment, indexes, extra_sentiment=None):
+        hours = daily_sentiment.index.asi8
+        # One row per column, 'sentiment' first, one column per hour
+        self.columns = ['sentiment']
+        values = daily_sentiment.to_numpy(dtype='float64')[None, :]
+        if extra_sentiment is not None:
+            self.columns += list(extra_sentiment.columns)
+            values = np.vstack([values, extra_sentiment.to_numpy(dtype='float64').T])
+        times = [index.asi8 for index in indexes.values()]
+        self.times = np.unique(np.concatenate(times)) if times else np.empty(0, dtype=np.int64)
+
+        # A bar gets the sentiment of its own hour only if that hour is on the sentiment grid
+        positions = np.minimum(hours.searchsorted(self.times), max(len(hours) - 1, 0))
+        if len(hours):
+            self.sentiment = np.where(hours[positions] == self.times, values[:, positions], np.nan)
+        else:
+            self.sentiment = np.full((len(self.columns), len(self.times)), np.nan)
+
+        # Each symbol's bars inside the sentiment range, as (first, stop, positions on the calendar)
+        self.rows = {}
+        for symbol, symbol_times in zip(indexes, times):
+            if len(hours):
+                first, stop = symbol_times.searchsorted(hours[0]), symbol_times.searchsorted(hours[-1], side='right')
+            else:
+                first = stop = 0
+            self.rows[symbol] = (first, stop, self.times.searchsorted(symbol_times[first:stop]))
+
+    def align(self, symbol, data):
+        # Same result as join_sentiment for bars already cleaned with clean_bars
+        first, stop, positions = self.rows[symbol]
+        logger.info(f"Stock data range for {symbol}: {data.index.min()} to {data.index.max()}")
+        logger.debug(f"Stock data columns: {data.columns}")
+        logger.info(f"Stock data shape before processing: {data.shape}")
+        if first >= stop:
+            return None
+        data = data.iloc[first:stop]
+        logger.info(f"Stock data shape after date range filter: {data.shape}")
+
+        # As fill_sentiment: scores forward-filled over the symbol's own bars, then 0 before the first
+        # scored bar; counts 0
+        sentiment = self.sentiment[:, positions]
+        scores = [row for row, name in enumerate(self.columns) if not name.endswith('count')]
+        sentiment[scores] = forward_fill(sentiment[scores])
+        np.copyto(sentiment, 0.0, where=np.isnan(sentiment))
+        return data, dict(zip(self.columns, sentiment))
+
+def log_nan_columns(columns, has_nan):
+    # Scanning every column for NaNs costs as much as building a feature, so only at DEBUG
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Columns with NaNs: {columns[has_nan()].tolist()}")
+
+def add_features_pandas(data, sentiment):
+    combined_data = data.assign(**sentiment)
+    
+    # Calculate moving average of sentiment scores
+    combined_data['SentimentMA5'] = combined_data['sentiment'].rolling(window=SENTIMENT_WINDOW).mean()
+    
+    # Calculate the difference between current sentiment and its moving average
+    combined_data['SentimentDiff'] = combined_data['sentiment'] - combined_data['SentimentMA5']
+    
+    # Calculate the correlation between sentiment and returns
+    # A window of flat sentiment has no correlation; pandas returns 0/0 there, or +/-inf when rounding
+    # leaves a tiny covariance, so both become NaN and the row is dropped below
+    combined_data['SentimentReturnsCorr'] = (combined_data['sentiment'].rolling(window=SENTIMENT_WINDOW).corr(combined_data['Returns'])
+                                             .replace([np.inf, -np.inf], np.nan))
+    
+    # Create lagged features
+    for i in range(1, N_LAGS + 1):
+        combined_data[f'Returns_Lag_{i}'] = combined_data['Returns'].shift(i)
+        combined_data[f'Sentiment_Lag_{i}'] = combined_data['sentiment'].shift(i)
+    
+    # Create target variable (next day's return)
+    combined_data['Target'] = combined_data['Returns'].shift(-1)
+    
+    logger.info(f"Data shape before dropping NaNs: {combined_data.shape}")
+    log_nan_columns(combined_data.columns, lambda: combined_data.isna().any())
+    
+    # Dropping all NaN values
+    return combined_data.dropna()
+
+def add_features_vectorized(data, sentiment):
+    # The same columns as add_features_pandas, computed into one (rows x columns) block that is joined
+    # to the frame once, after the rows with a NaN anywhere are dropped
+    columns = list(sentiment) + ADDED_COLUMNS[1:]
+    n_sentiment = len(sentiment)
+    returns = data['Returns'].to_numpy(dtype='float64')
+    block = np.empty((len(data), len(columns)))
+    for position, values in enumerate(sentiment.values()):
+        block[:, position] = values
+    sentiment = sentiment['sentiment']
+    moving_average, difference, correlation = block[:, n_sentiment], block[:, n_sentiment + 1], block[:, n_sentiment + 2]
+
+    rolling_means(sentiment[None, :], (SENTIMENT_WINDOW,), (moving_average[None, :],))
+    np.subtract(sentiment, moving_average, out=difference)
+    rolling_correlation(sentiment, returns, SENTIMENT_WINDOW, correlation)
+    lag_block(returns, sentiment, N_LAGS, block[:, n_sentiment + 3:n_sentiment + 3 + 2 * N_LAGS])
+    block[:-1, -1] = returns[1:]
+    block[-1:, -1] = np.nan
+
+    logger.info(f"Data shape before dropping NaNs: {(len(data), data.shape[1] + len(columns))}")
+    has_nan = np.isnan(block)
+    log_nan_columns(data.columns.append(pd.Index(columns)),
+                    lambda: np.concatenate([data.isna().any().to_numpy(), has_nan.any(axis=0)]))
+
+    keep = ~has_nan.any(axis=1) & data.notna().all(axis=1).to_numpy()
+    positions = np.flatnonzero(keep)
+    if len(positions) and positions[-1] - positions[0] == len(positions) - 1:
+        # Usually only the first rows (no full window or lags yet) and the last (no target) go
+        rows = data.iloc[positions[0]:positions[-1] + 1]
+    else:
+        rows = data.iloc[positions]
+    return pd.concat([rows, pd.DataFrame(block[keep], index=rows.index, columns=columns)], axis=1)
+
+def lag_block(returns, sentiment, n_lags, out):
+    # Returns_Lag_i and Sentiment_Lag_i interleaved, from one strided view per series: row t of the
+    # view holds values t - n_lags .. t of the NaN-padded series, so its columns are the lags
+    for position, values in enumerate((returns, sentiment)):
+        padded = np.concatenate([np.full(n_lags, np.nan), values])
+        windows = np.lib.stride_tricks.sliding_window_view(padded, n_lags + 1)
+        out[:, position::2] = windows[:, n_lags - 1::-1]
+    return out
+
+def rolling_correlation(x, y, window, out):
+    # rolling(window).corr() from a strided view of each series: row t of the view is the window ending
+    # at t, and its co-moments are summed around the window's own mean. Running totals over the whole
+    # series would lose a near-flat window's few significant digits to cancellation. A window where
+    # either series is flat has no correlation (NaN, like the pandas path), which is decided from the
+    # window's min and max rather than a variance that rounding may leave nonzero. Windows with a NaN
+    # are NaN.
+    out[:window - 1] = np.nan
+    if len(x) < window:
+        return out
+    windows_x = np.lib.stride_tricks.sliding_window_view(x, window)
+    windows_y = np.lib.stride_tricks.sliding_window_view(y, window)
+    centred_x = windows_x - windows_x.mean(axis=1, keepdims=True)
+    centred_y = windows_y - windows_y.mean(axis=1, keepdims=True)
+    covariance = np.einsum('ij,ij->i', centred_x, centred_y)
+    variance_x = np.einsum('ij,ij->i', centred_x, centred_x)
+    variance_y = np.einsum('ij,ij->i', centred_y, centred_y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tail = covariance / np.sqrt(variance_x * variance_y)
+    flat = (windows_x.min(axis=1) == windows_x.max(axis=1)) | (windows_y.min(axis=1) == windows_y.max(axis=1))
+    np.copyto(tail, np.nan, where=flat | ~np.isfinite(tail))
+    out[window - 1:] = tail
+    return out
@@ -0,0 +1,146 @@
+import math
+from collections import deque
+import pandas as pd
+from data_preprocessing.stock_data_preparer import INDICATOR_COLUMNS
+from feature_engineering.feature_engineer import LAG_COLUMNS, N_LAGS, SENTIMENT_COLUMNS
+
+# Incremental version of prepare_stock_data + engineer_features for one symbol. The state keeps only
+# the trailing windows the features need (20 closes and returns, 10 RSI gains and losses, 5 sentiment
+# and return pairs, 5 lags), so appending a new hourly bar costs the same no matter how long the
+# history is. Window statistics are recomputed from those short buffers rather than from running
+# totals, which keeps them free of drift over long streams.
+
+def window_mean(values):
+    return math.fsum(values) / len(values)
+
+def window_var(values, mean):
+    # Exactly 0 for a flat window, as pandas gives, even when the mean is not exactly representable
+    if min(values) == max(values):
+        return 0.0
+    return math.fsum((value - mean) ** 2 for value in values) / (len(values) - 1)
+
+def full_window(values):
+    # Like pandas' default min_periods: a statistic needs a full window with no NaN in it
+    return len(values) == values.maxlen and not any(math.isnan(value) for value in values)
+
+class FeatureState:
+    def __init__(self):
+        # Price indicators (prepare_stock_data)
+        self.last_close = math.nan
+        self.last_filled_close = math.nan
+        self.closes = deque(maxlen=20)
+        self.returns = deque(maxlen=20)
+        self.gains = deque(maxlen=10)
+        self.losses = deque(maxlen=10)
+
+        # Sentiment features and lags (engineer_features), fed only with rows that survive the indicators
+        self.last_sentiment = math.nan
+        self.sentiments = deque(maxlen=5)
+        self.window_returns = deque(maxlen=5)
+        self.lagged_returns = deque(maxlen=N_LAGS)
+        self.lagged_sentiments = deque(maxlen=N_LAGS)
+
+    def append(self, bar, sentiment=math.nan):
+        # bar maps price columns (including 'Close') to values. sentiment is the mean score for the bar's
+        # hour, NaN if there were no documents that hour, or None if the bar is outside the sentiment
+        # data, where the batch path drops the row before computing sentiment features.
+        # Returns the bar's feature row as a dict, or None where the batch output has no row.
+        indicators = self.update_indicators(bar)
+        if indicators is None or sentiment is None:
+            return None
+        row = dict(bar)
+        row.update(indicators)
+        row.update(self.update_sentiment(indicators['Returns'], sentiment))
+        if any(isinstance(value, float) and math.isnan(value) for value in row.values()):
+            return None
+        return row
+
+    def update_indicators(self, bar):
+        close = float(bar['Close'])
+
+        # pct_change() forward-fills missing closes; diff() does not
+        filled_close = self.last_filled_close if math.isnan(close) else close
+        returns = filled_close / self.last_filled_close - 1 if not math.isnan(self.last_filled_close) else math.nan
+        delta = close - self.last_close
+        self.last_close = close
+        self.last_filled_close = filled_close
+
+        self.closes.append(close)
+        self.returns.append(returns)
+        # where() maps a NaN delta to 0 for both gains and losses
+        self.gains.append(delta if delta > 0 else 0.0)
+        self.losses.append(-delta if delta < 0 else 0.0)
+
+        if not full_window(self.returns) or not full_window(self.closes):
+            return None
+        if any(value is None or (isinstance(value, float) and math.isnan(value)) for value in bar.values()):
+            return None
+
+        closes = list(self.closes)
+        mean_returns = window_mean(self.returns)
+        loss = window_mean(self.losses)
+        gain = window_mean(self.gains)
+        if loss == 0:
+            rsi = 100.0 if gain > 0 else math.nan
+        else:
+            rsi = 100 - 100 / (1 + gain / loss)
+        if math.isnan(rsi):
+            return None
+        return {
+            'Returns': returns,
+            'Volatility': math.sqrt(window_var(self.returns, mean_returns)),
+            'MA5': window_mean(closes[-5:]),
+            'MA10': window_mean(closes[-10:]),
+            'MA20': window_mean(closes),
+            'RSI': rsi,
+        }
+
+    def update_sentiment(self, returns, sentiment):
+        # Hours without documents carry the last score forward; before the first score they are 0
+        if not math.isnan(sentiment):
+            self.last_sentiment = sentiment
+        sentiment = 0.0 if math.isnan(self.last_sentiment) else self.last_sentiment
+
+        features = {'sentiment': sentiment}
+        self.sentiments.append(sentiment)
+        self.window_returns.append(returns)
+        if len(self.sentiments) == self.sentiments.maxlen:
+            mean_sentiment = window_mean(self.sentiments)
+            mean_returns = window_mean(self.window_returns)
+            variance = window_var(self.sentiments, mean_sentiment) * window_var(self.window_returns, mean_returns)
+            covariance = math.fsum((s - mean_sentiment) * (r - mean_returns)
+                                   for s, r in zip(self.sentiments, self.window_returns)) / (len(self.sentiments) - 1)
+            features['SentimentMA5'] = mean_sentiment
+            features['SentimentDiff'] = sentiment - mean_sentiment
+            # A flat window has no correlation, as in engineer_features
+            features['SentimentReturnsCorr'] = covariance / math.sqrt(variance) if variance > 0 else math.nan
+        else:
+            features.update(SentimentMA5=math.nan, SentimentDiff=math.nan, SentimentReturnsCorr=math.nan)
+
+        for i in range(1, N_LAGS + 1):
+            features[f'Returns_Lag_{i}'] = self.lagged_returns[-i] if len(self.lagged_returns) >= i else math.nan
+            features[f'Sentiment_Lag_{i}'] = self.lagged_sentiments[-i] if len(self.lagged_sentiments) >= i else math.nan
+        self.lagged_returns.append(returns)
+        self.lagged_sentiments.append(sentiment)
+        return features
+
+def replay(data, hourly_sentiment, state=None):
+    # Feeds a symbol's price history through a FeatureState and returns (state, feature frame); the
+    # frame has the engineer_features columns except Target. hourly_sentiment is the output of
+    # feature_engineer.hourly_sentiment(); bars outside its range are treated as the batch path does.
+    if state is None:
+        state = FeatureState()
+    index = pd.to_datetime(data.index).tz_localize(None) if data.index.tz is not None else pd.to_datetime(data.index)
+    first_hour, last_hour = hourly_sentiment.index.min(), hourly_sentiment.index.max()
+    rows = {}
+    for timestamp, bar in zip(index, data.to_dict('records')):
+        if first_hour <= timestamp <= last_hour:
+            sentiment = hourly_sentiment.get(timestamp, math.nan)
+        else:
+            sentiment = None
+        row = state.append(bar, sentiment)
+        if row is not None:
+            rows[timestamp] = row
+    columns = list(data.columns) + [column for column in INDICATOR_COLUMNS if column not in data.columns]
+    columns += SENTIMENT_COLUMNS + LAG_COLUMNS
+    return state, pd.DataFrame.from_dict(rows, orient='index', columns=columns)
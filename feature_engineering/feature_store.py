@@ -0,0 +1,47 @@
+import numpy as np
+
+# Compact per-symbol representation of engineer_features output. The feature columns live in one
+# C-ordered float32 matrix, so X and any run of consecutive rows (a TimeSeriesSplit fold) are views
+# rather than copies. float32 is what scikit-learn's trees compute on anyway, so a forest fitted on
+# the matrix is the same as one fitted on the float64 frame. The target stays float64, as the
+# forest keeps it, and is small next to the features.
+
+class FeatureMatrix:
+    __slots__ = ('values', 'target', 'columns', 'index')
+
+    def __init__(self, values, target, columns, index):
+        self.values = values
+        self.target = target
+        self.columns = columns
+        self.index = index
+
+    @classmethod
+    def from_frame(cls, data, target='Target'):
+        columns = [column for column in data.columns if column != target]
+        # Filled one column at a time: data[columns] would consolidate the caller's frame into a single
+        # float64 block in place, a full copy that lives as long as the frame. Columns are read by
+        # position: data[column] would also keep each column's Series in the frame's cache.
+        values = np.empty((len(data), len(columns)), dtype=np.float32)
+        locations = [location for location, column in enumerate(data.columns) if column != target]
+        for position, location in enumerate(locations):
+            values[:, position] = data.iloc[:, location].to_numpy()
+        return cls(values, data[target].to_numpy(dtype=np.float64), columns, data.index)
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def X(self):
+        return self.values
+
+    @property
+    def y(self):
+        return self.target
+
+def as_feature_matrix(data):
+    return data if isinstance(data, FeatureMatrix) else FeatureMatrix.from_frame(data)
+
+def to_feature_matrices(features):
+    # {symbol: DataFrame} from engineer_features to {symbol: FeatureMatrix}; the frames can be
+    # released afterwards
+    return {symbol: as_feature_matrix(data) for symbol, data in features.items()}
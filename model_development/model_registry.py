@@ -0,0 +1,110 @@
+import hashlib
+import json
+import logging
+import os
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Stored results whose registry version differs are treated as missing. Version 2 fingerprints the
+# float32 FeatureMatrix the models are now fitted on.
+REGISTRY_VERSION = '2'
+
+def fingerprint_features(matrix, params):
+    # Hash of everything a trained model depends on: the FeatureMatrix (feature values, columns and
+    # row timestamps), the target and the training parameters
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps({
+        'registry_version': REGISTRY_VERSION,
+        'columns': [str(column) for column in matrix.columns],
+        'dtypes': [str(matrix.X.dtype), str(matrix.y.dtype)],
+        'params': params,
+    }, sort_keys=True, default=str).encode('utf-8'))
+    index = matrix.index
+    digest.update(np.ascontiguousarray(index.asi8 if hasattr(index, 'asi8') else index.to_numpy()).tobytes())
+    digest.update(np.ascontiguousarray(matrix.X).tobytes())
+    digest.update(np.ascontiguousarray(matrix.y).tobytes())
+    return digest.hexdigest()
+
+def symbol_directory_name(symbol):
+    return ''.join(c if c.isalnum() or c in '-_.' else '_' for c in symbol)
+
+class ModelRegistry:
+    # Trained results per symbol (the final model plus its cross-validation scores) on disk:
+    #
+    #   <path>/<symbol>/result.joblib   uncompressed, so numpy arrays can be memory-mapped on load
+    #   <path>/<symbol>/meta.json       fingerprint of the training inputs, feature columns, scores
+    #
+    # Results are loaded lazily, one symbol at a time, and kept once loaded.
+    def __init__(self, path='models'):
+        self.path = path
+        self.loaded = {}
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def symbol_path(self, symbol, name):
+        return os.path.join(self.path, symbol_directory_name(symbol), name)
+
+    def metadata(self, symbol):
+        meta_path = self.symbol_path(symbol, 'meta.json')
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            return json.load(f)
+
+    def symbols(self):
+        if not os.path.exists(self.path):
+            return []
+        symbols = []
+        for name in sorted(os.listdir(self.path)):
+            meta_path = os.path.join(self.path, name, 'meta.json')
+            if os.path.exists(meta_path):
+                with open(meta_path) as f:
+                    symbols.append(json.load(f)['symbol'])
+        return symbols
+
+    def lookup(self, symbol, fingerprint):
+        # The stored result if it was trained on exactly these inputs, else None
+        meta = self.metadata(symbol)
+        if meta is None or meta['fingerprint'] != fingerprint:
+            self.stats['misses'] += 1
+            return None
+        self.stats['hits'] += 1
+        return self.load(symbol)
+
+    def load(self, symbol):
+        import joblib
+
+        if symbol not in self.loaded:
+            self.loaded[symbol] = joblib.load(self.symbol_path(symbol, 'result.joblib'), mmap_mode='r')
+        return self.loaded[symbol]
+
+    def load_all(self):
+        return {symbol: self.load(symbol) for symbol in self.symbols()}
+
+    def save(self, symbol, fingerprint, result):
+        import joblib
+
+        directory = os.path.dirname(self.symbol_path(symbol, 'meta.json'))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        # The old metadata goes first, so a crash before the new metadata is written leaves a miss
+        # (retrain) rather than a fingerprint pointing at the wrong model
+        meta_path = self.symbol_path(symbol, 'meta.json')
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        self.loaded.pop(symbol, None)
+        result_path = self.symbol_path(symbol, 'result.joblib')
+        joblib.dump(result, result_path + '.tmp')
+        os.replace(result_path + '.tmp', result_path)
+
+        meta = {
+            'symbol': symbol,
+            'fingerprint': fingerprint,
+            'registry_version': REGISTRY_VERSION,
+            'feature_columns': list(result['feature_importance']),
+            'scores': {key: float(result[key]) for key in ('train_mse', 'train_r2', 'test_mse', 'test_r2')},
+        }
+        with open(meta_path + '.tmp', 'w') as f:
+            json.dump(meta, f, indent=2)
+        os.replace(meta_path + '.tmp', meta_path)
+        self.loaded[symbol] = result
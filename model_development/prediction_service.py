@@ -0,0 +1,181 @@
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Batch scoring over the per-symbol models from train_and_evaluate (or a ModelRegistry). Rows for
+# many symbols arrive together; they are grouped by symbol and each group is scored in one pass over
+# the forest's trees, as a NumPy array in the model's feature order.
+#
+#   python -m model_development.prediction_service --registry models            # JSON lines on stdin/stdout
+#   python -m model_development.prediction_service --registry models --port 8080  # POST /predict, GET /stats
+#
+# A request is {"rows": [{"symbol": "^GSPC", "Open": ..., "Close": ..., ...}, ...]}, with feature
+# values either inline or under "features". The response has one entry per row, in order.
+
+class LatencyStats:
+    # Thread-safe per-batch latencies, summarised as percentiles
+    def __init__(self):
+        self.latencies = []
+        self.rows = 0
+        self.lock = threading.Lock()
+
+    def record(self, latency, n_rows):
+        with self.lock:
+            self.latencies.append(latency)
+            self.rows += n_rows
+
+    def summary(self):
+        with self.lock:
+            latencies = np.array(self.latencies) * 1000
+            summary = {'batches': len(latencies), 'rows': self.rows}
+        if len(latencies):
+            summary.update({
+                'latency_p50_ms': float(np.percentile(latencies, 50)),
+                'latency_p99_ms': float(np.percentile(latencies, 99)),
+                'latency_max_ms': float(latencies.max()),
+            })
+        return summary
+
+def predict_forest(model, X):
+    # Same result as RandomForestRegressor.predict (trees summed in order, then averaged) without the
+    # per-call joblib dispatch and the input validation each tree repeats, which dominate small batches
+    if not hasattr(model, 'estimators_'):
+        return model.predict(X)
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    # check_input=False skips the trees' own check, so reject what model.predict would, including
+    # finite float64 values that overflow float32
+    if not np.isfinite(X).all():
+        raise ValueError("Input X contains NaN, infinity or a value too large for dtype('float32').")
+    total = np.zeros(len(X))
+    for estimator in model.estimators_:
+        total += estimator.predict(X, check_input=False)
+    total /= len(model.estimators_)
+    return total
+
+class PredictionService:
+    def __init__(self, results):
+        # results is {symbol: result} as returned by train_and_evaluate or ModelRegistry.load_all();
+        # the feature order is the order of the training columns, kept in feature_importance
+        self.models = {symbol: (result['model'], list(result['feature_importance'])) for symbol, result in results.items()}
+        self.stats = LatencyStats()
+
+    @classmethod
+    def from_registry(cls, path):
+        from model_development.model_registry import ModelRegistry
+        return cls(ModelRegistry(path).load_all())
+
+    def predict_batch(self, rows):
+        # rows is a list of dicts with a 'symbol' key; returns one {'symbol', 'prediction'} or
+        # {'symbol', 'error'} dict per row, in the same order
+        start = time.perf_counter()
+        responses = [None] * len(rows)
+        positions_by_symbol = {}
+        for position, row in enumerate(rows):
+            symbol = row.get('symbol')
+            if symbol not in self.models:
+                responses[position] = {'symbol': symbol, 'error': f"No model for symbol: {symbol}"}
+            else:
+                positions_by_symbol.setdefault(symbol, []).append(position)
+
+        for symbol, positions in positions_by_symbol.items():
+            model, columns = self.models[symbol]
+            X = np.empty((len(positions), len(columns)))
+            valid = np.ones(len(positions), dtype=bool)
+            for i, position in enumerate(positions):
+                features = rows[position].get('features', rows[position])
+                try:
+                    X[i] = [features[column] for column in columns]
+                except (KeyError, TypeError, ValueError) as e:
+                    valid[i] = False
+                    responses[position] = {'symbol': symbol, 'error': f"Invalid features: {e}"}
+            if not valid.any():
+                continue
+            predictions = predict_forest(model, X[valid])
+            for position, prediction in zip(np.array(positions)[valid], predictions):
+                responses[position] = {'symbol': symbol, 'prediction': float(prediction)}
+
+        self.stats.record(time.perf_counter() - start, len(rows))
+        return responses
+
+    def handle_request(self, request):
+        return {'predictions': self.predict_batch(request.get('rows', []))}
+
+def serve_stdio(service, stdin=sys.stdin, stdout=sys.stdout):
+    # One JSON request per input line, one JSON response per output line
+    for line in stdin:
+        if not line.strip():
+            continue
+        try:
+            response = service.handle_request(json.loads(line))
+        except (ValueError, AttributeError) as e:
+            response = {'error': f"Invalid request: {e}"}
+        stdout.write(json.dumps(response) + '\n')
+        stdout.flush()
+    logger.info(f"Prediction stats: {service.stats.summary()}")
+
+def make_http_server(service, host='127.0.0.1', port=8080):
+    # POST /predict takes a request body like a stdin line; GET /stats returns the latency summary.
+    # Port 0 picks a free port, readable from server.server_address.
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def send_json(self, status, body):
+            payload = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_POST(self):
+            if self.path != '/predict':
+                return self.send_json(404, {'error': f"Unknown path: {self.path}"})
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                self.send_json(200, service.handle_request(request))
+            except (ValueError, AttributeError) as e:
+                self.send_json(400, {'error': f"Invalid request: {e}"})
+
+        def do_GET(self):
+            if self.path != '/stats':
+                return self.send_json(404, {'error': f"Unknown path: {self.path}"})
+            self.send_json(200, service.stats.summary())
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+def serve_http(service, host='127.0.0.1', port=8080):
+    server = make_http_server(service, host, port)
+    logger.info(f"Serving predictions for {len(service.models)} symbols on http://{host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info(f"Prediction stats: {service.stats.summary()}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--registry', default='models')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=None, help='serve HTTP on this port instead of stdin/stdout')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    service = PredictionService.from_registry(args.registry)
+    if args.port is None:
+        serve_stdio(service)
+    else:
+        serve_http(service, args.host, args.port)
+
+if __name__ == "__main__":
+    main()
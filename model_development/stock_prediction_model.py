@@ -1,89 +1,218 @@
-from sklearn.model_selection import TimeSeriesSplit
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.metrics import mean_squared_error, r2_score
+import time
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import pandas as pd
 import logging
+from data_preprocessing.parallel import pool_context, resolve_workers, task_result, timed_task
+from feature_engineering.feature_store import to_feature_matrices
+from model_development.model_registry import fingerprint_features
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def train_and_evaluate(features, n_splits=5):
+# Label of the job that fits the final model on all of a symbol's data
+FINAL_FOLD = 'final'
+
+# Forest hyperparameters, shared by every mode
+N_ESTIMATORS = 100
+RANDOM_STATE = 42
+
+def train_and_evaluate(features, n_splits=5, n_workers=1, mode='refit', registry=None):
+    # mode='refit' fits a new 100-tree forest for every TimeSeriesSplit fold and another for the final
+    # model. mode='warm_start' grows one forest per symbol across the expanding folds: each fold adds
+    # its share of the 100 trees, fitted on that fold's training window, and the final fit adds the
+    # last share on all data. It fits 100 trees per symbol instead of 600, most of them on shorter
+    # windows, at the cost of early folds being scored with fewer trees and the final model holding
+    # trees that have not seen the most recent rows (see benchmarks/bench_warm_start.py).
+    #
+    # Jobs run on a process pool sized to the core budget when n_workers > 1; the results are the
+    # same as the serial run because every forest is seeded and the folds are averaged in order.
+    #
+    # With a ModelRegistry, a symbol whose features, target and training parameters match the stored
+    # fingerprint reuses the stored result instead of training again, and new results are saved.
+    #
+    # features are {symbol: DataFrame} from engineer_features or {symbol: FeatureMatrix}; frames are
+    # converted once, and every fold then trains on row slices of the float32 matrix rather than copies.
+    if mode not in ('refit', 'warm_start'):
+        raise ValueError(f"Unknown training mode: {mode}")
+    warm_start = mode == 'warm_start'
+    features = to_feature_matrices(features)
+
     results = {}
-    
+    fingerprints = {}
+    if registry is not None:
+        import sklearn
+
+        # A model pickled by another scikit-learn version is not reused
+        params = {'n_estimators': N_ESTIMATORS, 'random_state': RANDOM_STATE, 'n_splits': n_splits, 'mode': mode,
+                  'sklearn': sklearn.__version__}
+        for symbol, data in features.items():
+            if not len(data):
+                continue
+            fingerprints[symbol] = fingerprint_features(data, params)
+            stored = registry.lookup(symbol, fingerprints[symbol])
+            if stored is not None:
+                logger.info(f"Reusing stored model for {symbol}; features and parameters are unchanged")
+                results[symbol] = stored
+
+    jobs = build_jobs({symbol: data for symbol, data in features.items() if symbol not in results}, n_splits,
+                      warm_start=warm_start)
+    job_results = run_jobs(jobs, n_workers, warm_start=warm_start)
+
     for symbol, data in features.items():
-        logger.info(f"Training model for {symbol}")
-        
-        if data.empty:
-            logger.warning(f"No data available for {symbol}. Skipping this symbol.")
+        if (symbol, FINAL_FOLD) not in job_results:
             continue
-        
-        # Prepare the data
-        X = data.drop(['Target'], axis=1)
-        y = data['Target']
-        
-        if len(X) < n_splits + 1:
-            logger.warning(f"Insufficient data for {symbol}. At least {n_splits + 1} samples required. Skipping this symbol.")
-            continue
-        
-        # Initialize TimeSeriesSplit
-        tscv = TimeSeriesSplit(n_splits=n_splits)
-        
-        # Initialize lists to store results
-        train_mse_scores = []
-        train_r2_scores = []
-        test_mse_scores = []
-        test_r2_scores = []
-        feature_importances = []
-        
-        # Perform time series cross-validation
-        for train_index, test_index in tscv.split(X):
-            X_train, X_test = X.iloc[train_index], X.iloc[test_index]
-            y_train, y_test = y.iloc[train_index], y.iloc[test_index]
-            
-            # Train the model
-            model = RandomForestRegressor(n_estimators=100, random_state=42)
-            model.fit(X_train, y_train)
-            
-            # Make predictions
-            y_train_pred = model.predict(X_train)
-            y_test_pred = model.predict(X_test)
-            
-            # Evaluate the model on train set
-            train_mse_scores.append(mean_squared_error(y_train, y_train_pred))
-            train_r2_scores.append(r2_score(y_train, y_train_pred))
-            
-            # Evaluate the model on test set
-            test_mse_scores.append(mean_squared_error(y_test, y_test_pred))
-            test_r2_scores.append(r2_score(y_test, y_test_pred))
-            
-            feature_importances.append(model.feature_importances_)
-        
+        fold_results = [job_results[(symbol, fold)] for fold in range(n_splits)]
+        final = job_results[(symbol, FINAL_FOLD)]
+
         # Calculate average scores and feature importances
-        avg_train_mse = np.mean(train_mse_scores)
-        avg_train_r2 = np.mean(train_r2_scores)
-        avg_test_mse = np.mean(test_mse_scores)
-        avg_test_r2 = np.mean(test_r2_scores)
-        avg_feature_importance = np.mean(feature_importances, axis=0)
-        
-        # Train a final model on all data
-        final_model = RandomForestRegressor(n_estimators=100, random_state=42)
-        final_model.fit(X, y)
-        
+        avg_train_mse = np.mean([result['train_mse'] for result in fold_results])
+        avg_train_r2 = np.mean([result['train_r2'] for result in fold_results])
+        avg_test_mse = np.mean([result['test_mse'] for result in fold_results])
+        avg_test_r2 = np.mean([result['test_r2'] for result in fold_results])
+        avg_feature_importance = np.mean([result['feature_importance'] for result in fold_results], axis=0)
+
         results[symbol] = {
-            'model': final_model,
+            'model': final['model'],
             'train_mse': avg_train_mse,
             'train_r2': avg_train_r2,
             'test_mse': avg_test_mse,
             'test_r2': avg_test_r2,
-            'feature_importance': dict(zip(X.columns, avg_feature_importance))
+            'feature_importance': dict(zip(data.columns, avg_feature_importance)),
+            'job_seconds': {fold: job_results[(symbol, fold)]['seconds'] for fold in list(range(n_splits)) + [FINAL_FOLD]}
         }
-        
+
+        if registry is not None:
+            registry.save(symbol, fingerprints[symbol], results[symbol])
+
         logger.info(f"Model for {symbol}:")
         logger.info(f"  Average Train MSE: {avg_train_mse:.4f}, Average Train R2: {avg_train_r2:.4f}")
         logger.info(f"  Average Test MSE: {avg_test_mse:.4f}, Average Test R2: {-avg_test_r2:.4f}")
-    
+
     if not results:
         raise ValueError("No models could be trained due to insufficient data.")
-    
+
+    # Stored and newly trained symbols in the order of the features
+    return {symbol: results[symbol] for symbol in features if symbol in results}
+
+def build_jobs(features, n_splits, warm_start=False):
+    # Jobs as {(symbol, label): (X, y, windows)}, where windows lists (fold, train_rows, test_rows)
+    # and the final model's window has no test rows. TimeSeriesSplit windows are runs of consecutive
+    # rows, so they are kept as slices and index X and y without copying. Refitting gives every
+    # window its own job; warm starting keeps a symbol's windows together in one job, in order.
+    from sklearn.model_selection import TimeSeriesSplit
+
+    jobs = {}
+    for symbol, data in features.items():
+        logger.info(f"Preparing training jobs for {symbol}")
+
+        if not len(data):
+            logger.warning(f"No data available for {symbol}. Skipping this symbol.")
+            continue
+
+        X, y = data.X, data.y
+
+        if len(X) < n_splits + 1:
+            logger.warning(f"Insufficient data for {symbol}. At least {n_splits + 1} samples required. Skipping this symbol.")
+            continue
+
+        tscv = TimeSeriesSplit(n_splits=n_splits)
+        windows = [(fold, index_slice(train_index), index_slice(test_index))
+                   for fold, (train_index, test_index) in enumerate(tscv.split(X))]
+        windows.append((FINAL_FOLD, slice(0, len(X)), None))
+        if warm_start:
+            jobs[(symbol, 'warm_start')] = (X, y, windows)
+        else:
+            for window in windows:
+                jobs[(symbol, window[0])] = (X, y, [window])
+    return jobs
+
+def index_slice(index):
+    return slice(int(index[0]), int(index[-1]) + 1)
+
+def window_rows(rows):
+    return rows.stop - rows.start if isinstance(rows, slice) else len(rows)
+
+def plan_core_budget(n_jobs, n_workers):
+    # Splits the core budget between worker processes and each forest's own threads, so that
+    # processes x threads never exceeds the budget
+    n_processes = max(1, min(n_workers, n_jobs))
+    return n_processes, max(1, n_workers // n_processes)
+
+def run_jobs(jobs, n_workers=1, warm_start=False):
+    # Returns {(symbol, fold): result} for every window of every job
+    n_workers = resolve_workers(n_workers)
+    if n_workers == 1 or len(jobs) <= 1:
+        outputs = {key: fit_forest(*job, warm_start=warm_start) for key, job in jobs.items()}
+    else:
+        n_processes, n_threads = plan_core_budget(len(jobs), n_workers)
+        logger.info(f"Training {len(jobs)} jobs on {n_processes} processes x {n_threads} threads")
+        # Largest training sets first, so the slowest jobs do not start last
+        order = sorted(jobs, key=lambda key: sum(window_rows(window[1]) for window in jobs[key][2]), reverse=True)
+        with ProcessPoolExecutor(max_workers=n_processes, mp_context=pool_context(),
+                                 initializer=limit_native_threads, initargs=(n_threads,)) as executor:
+            futures = {key: executor.submit(timed_task, fit_forest, *jobs[key], warm_start=warm_start, n_threads=n_threads)
+                       for key in order}
+            outputs = {key: task_result(future.result()) for key, future in futures.items()}
+
+    results = {}
+    for (symbol, _), output in outputs.items():
+        for fold, result in output.items():
+            logger.info(f"Trained {symbol} fold {fold}: {result['trees_fitted']} trees on {result['train_rows']} rows "
+                        f"in {result['seconds']:.2f}s")
+            results[(symbol, fold)] = result
+    return results
+
+def limit_native_threads(n_threads):
+    # Keeps BLAS/OpenMP pools inside each worker process to its share of the core budget
+    from threadpoolctl import threadpool_limits
+    threadpool_limits(limits=n_threads)
+
+def fit_forest(X, y, windows, warm_start=False, n_estimators=N_ESTIMATORS, n_threads=1):
+    # Fits and scores one forest per window, or with warm_start one forest grown window by window;
+    # the windows must then be expanding, so trees fitted earlier never saw a later window's test rows.
+    # X and y are arrays, indexed by each window's slices (or index arrays). Returns {fold: result}.
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.metrics import mean_squared_error, r2_score
+
+    model = None
+    results = {}
+    for position, (fold, train_rows, test_rows) in enumerate(windows):
+        start = time.perf_counter()
+        X_train, y_train = X[train_rows], y[train_rows]
+
+        # A fixed random_state gives the same trees whatever n_jobs is
+        if not warm_start:
+            model = RandomForestRegressor(n_estimators=n_estimators, random_state=RANDOM_STATE, n_jobs=n_threads)
+        elif model is None:
+            model = RandomForestRegressor(n_estimators=round(n_estimators / len(windows)), random_state=RANDOM_STATE,
+                                          n_jobs=n_threads, warm_start=True)
+        else:
+            # Each window adds its share of trees; the earlier trees are kept as they are
+            model.set_params(n_estimators=round(n_estimators * (position + 1) / len(windows)))
+        n_trees_before = len(getattr(model, 'estimators_', []))
+        model.fit(X_train, y_train)
+        result = {'train_rows': len(X_train), 'trees_fitted': len(model.estimators_) - n_trees_before}
+
+        if test_rows is None:
+            # Final model, kept for prediction and refitted from scratch if fit again; n_jobs is reset
+            # so it predicts the same way as a serial fit
+            model.set_params(n_jobs=None, warm_start=False)
+            result['model'] = model
+        else:
+            X_test, y_test = X[test_rows], y[test_rows]
+
+            # Make predictions
+            y_train_pred = model.predict(X_train)
+            y_test_pred = model.predict(X_test)
+
+            # Evaluate the model on train and test sets
+            result['train_mse'] = mean_squared_error(y_train, y_train_pred)
+            result['train_r2'] = r2_score(y_train, y_train_pred)
+            result['test_mse'] = mean_squared_error(y_test, y_test_pred)
+            result['test_r2'] = r2_score(y_test, y_test_pred)
+            result['feature_importance'] = model.feature_importances_
+
+        result['seconds'] = time.perf_counter() - start
+        results[fold] = result
     return results
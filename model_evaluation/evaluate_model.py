@@ -1,24 +1,50 @@
-import matplotlib.pyplot as plt
-import seaborn as sns
+import argparse
 import pandas as pd
 
-def evaluate(stock_prediction_results):
+def print_metrics(symbol, results):
+    print(f"\nStock Prediction Model Evaluation for {symbol}:")
+    print(f"Train Mean Squared Error: {results['train_mse']:.4f}")
+    print(f"Train R-squared Score: {results['train_r2']:.4f}")
+    print(f"Test Mean Squared Error: {results['test_mse']:.4f}")
+    print(f"Test R-squared Score: {-results['test_r2']:.4f}")
+
+def draw_feature_importance(ax, symbol, feature_importance):
+    # Bars of the features by importance, largest first, on a matplotlib Axes
+    sorted_idx = sorted(feature_importance, key=feature_importance.get, reverse=True)
+    pos = range(len(feature_importance))
+    ax.bar(pos, [feature_importance[i] for i in sorted_idx])
+    ax.set_xticks(pos)
+    ax.set_xticklabels([i for i in sorted_idx], rotation=90)
+    ax.set_title(f'Feature Importance for {symbol}')
+    ax.set_xlabel('Features')
+    ax.set_ylabel('Importance')
+
+def evaluate(stock_prediction_results, plot=True):
+    # Prints each symbol's scores and shows its feature importance in a window. plot=False prints
+    # only; visualization.batch_report writes the charts to files instead.
+    if plot:
+        import matplotlib.pyplot as plt
+
     for symbol, results in stock_prediction_results.items():
-        print(f"\nStock Prediction Model Evaluation for {symbol}:")
-        print(f"Train Mean Squared Error: {results['train_mse']:.4f}")
-        print(f"Train R-squared Score: {results['train_r2']:.4f}")
-        print(f"Test Mean Squared Error: {results['test_mse']:.4f}")
-        print(f"Test R-squared Score: {-results['test_r2']:.4f}")
-        
+        print_metrics(symbol, results)
+        if not plot:
+            continue
+
         # Plot feature importance
-        plt.figure(figsize=(12, 6))
-        feature_importance = results['feature_importance']
-        sorted_idx = sorted(feature_importance, key=feature_importance.get, reverse=True)
-        pos = range(len(feature_importance))
-        plt.bar(pos, [feature_importance[i] for i in sorted_idx])
-        plt.xticks(pos, [i for i in sorted_idx], rotation=90)
-        plt.title(f'Feature Importance for {symbol}')
-        plt.xlabel('Features')
-        plt.ylabel('Importance')
-        plt.tight_layout()
+        fig, ax = plt.subplots(figsize=(12, 6))
+        draw_feature_importance(ax, symbol, results['feature_importance'])
+        fig.tight_layout()
         plt.show()
+
+def main():
+    # Evaluate the models stored by a previous run without retraining:
+    # python -m model_evaluation.evaluate_model --registry models
+    from model_development.model_registry import ModelRegistry
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--registry', default='models')
+    args = parser.parse_args()
+    evaluate(ModelRegistry(args.registry).load_all())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from data_preprocessing.parallel import worker_cpu_seconds
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+REPORT_VERSION = '1'
+
+# The stage (metrics dict) running on each thread, for section()
+_current = threading.local()
+
+def max_rss_mb():
+    # High-water mark of the process's resident set size
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return max_rss / 1024 ** 2 if sys.platform == 'darwin' else max_rss / 1024
+
+def row_count(output):
+    # Rows in a stage's output: a DataFrame, array or FeatureMatrix, or a dict of them. None otherwise.
+    if isinstance(output, dict):
+        counts = [row_count(value) for value in output.values()]
+        return sum(counts) if counts and None not in counts else None
+    if getattr(output, 'ndim', 0) >= 1 or type(output).__name__ == 'FeatureMatrix':
+        return len(output)
+    return None
+
+class Measurement:
+    # Wall time, CPU time of the calling thread, CPU time of the process pool tasks (cleaning, scoring,
+    # training) whose results came back meanwhile, and growth of the process's peak RSS, over a with block
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.thread_time()
+        self.worker_cpu = worker_cpu_seconds()
+        self.rss = max_rss_mb()
+        return self
+
+    def __exit__(self, *exc_info):
+        rss = max_rss_mb()
+        self.metrics = {
+            'wall_seconds': time.perf_counter() - self.wall,
+            'cpu_seconds': time.thread_time() - self.cpu,
+            'worker_cpu_seconds': worker_cpu_seconds() - self.worker_cpu,
+            'max_rss_mb': rss,
+            'rss_growth_mb': None if rss is None else rss - self.rss,
+        }
+        return False
+
+@contextmanager
+def section(name, rows=None):
+    # Measures a part of the stage running on this thread (cleaning and scoring within the sentiment
+    # stage, say) into the stage's 'sections'. Does nothing outside an instrumented stage.
+    stage = getattr(_current, 'stage', None)
+    if stage is None:
+        yield
+        return
+    with Measurement() as measurement:
+        yield
+    stage.setdefault('sections', {})[name] = dict(measurement.metrics, rows=rows)
+
+def annotate(**fields):
+    # Adds fields (cache hit counts, say) to the metrics of the stage running on this thread. Does
+    # nothing outside an instrumented stage.
+    stage = getattr(_current, 'stage', None)
+    if stage is not None:
+        stage.update(fields)
+
+class RunReport:
+    # Metrics of one pipeline run, per stage: status, wall and CPU time, peak memory, output rows,
+    # sections, and the request statistics of the collectors. Written as JSON by write().
+    #
+    # trace_memory=True also records each stage's traced peak with tracemalloc. Python allocations get
+    # several times slower and the peak covers every thread, so stages should run one at a time.
+    # profile_stages are run under cProfile (a .prof file plus the slowest functions in the report)
+    # or pyinstrument (an .html file), written to profile_dir.
+    def __init__(self, trace_memory=False, profile_stages=(), profiler='cprofile', profile_dir='profiles', metadata=None):
+        if profiler not in ('cprofile', 'pyinstrument'):
+            raise ValueError(f"Unknown profiler: {profiler}")
+        self.trace_memory = trace_memory
+        self.profile_stages = set(profile_stages)
+        self.profiler = profiler
+        self.profile_dir = profile_dir
+        self.metadata = metadata or {}
+        self.stages = {}
+        self.request_stats = {}
+        self.started_at = datetime.now(timezone.utc)
+        self.started = time.perf_counter()
+        self.lock = threading.Lock()
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def record(self, name, **fields):
+        with self.lock:
+            self.stages.setdefault(name, {}).update(fields)
+
+    def add_request_stats(self, name, stats):
+        # A data_collection.http_client.RequestStats filled by the stage's collector
+        self.request_stats[name] = stats
+
+    def run(self, name, func, **kwargs):
+        # Calls func(**kwargs) as stage name, measured and, if selected, profiled
+        metrics = {}
+        with self.lock:
+            self.stages.setdefault(name, {})['metrics'] = metrics
+        _current.stage = metrics
+        try:
+            if self.trace_memory:
+                tracemalloc.reset_peak()
+                traced = tracemalloc.get_traced_memory()[0]
+            with Measurement() as measurement:
+                if name in self.profile_stages:
+                    output = self.profiled(name, func, kwargs, metrics)
+                else:
+                    output = func(**kwargs)
+            metrics.update(measurement.metrics)
+            if self.trace_memory:
+                metrics['traced_peak_mb'] = (tracemalloc.get_traced_memory()[1] - traced) / 1024 ** 2
+            metrics['rows'] = row_count(output)
+            return output
+        finally:
+            _current.stage = None
+
+    def profiled(self, name, func, kwargs, metrics):
+        if not os.path.exists(self.profile_dir):
+            os.makedirs(self.profile_dir)
+        if self.profiler == 'pyinstrument':
+            from pyinstrument import Profiler
+
+            profiler = Profiler()
+            profiler.start()
+            try:
+                return func(**kwargs)
+            finally:
+                profiler.stop()
+                path = os.path.join(self.profile_dir, f"{name}.html")
+                with open(path, 'w') as f:
+                    f.write(profiler.output_html())
+                metrics['profile'] = path
+
+        import cProfile
+        import pstats
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            return func(**kwargs)
+        finally:
+            profiler.disable()
+            path = os.path.join(self.profile_dir, f"{name}.prof")
+            profiler.dump_stats(path)
+            metrics['profile'] = path
+            metrics['top_functions'] = top_functions(pstats.Stats(profiler))
+
+    def to_dict(self):
+        with self.lock:
+            stages = json.loads(json.dumps(self.stages, default=str))
+        for name, stats in self.request_stats.items():
+            if name in stages:
+                stages[name]['requests'] = stats.summary()
+        return {
+            'report_version': REPORT_VERSION,
+            'started_at': self.started_at.isoformat(),
+            'wall_seconds': time.perf_counter() - self.started,
+            'max_rss_mb': max_rss_mb(),
+            'python': platform.python_version(),
+            'cpu_count': os.cpu_count(),
+            'metadata': self.metadata,
+            'stages': stages,
+        }
+
+    def write(self, path):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        report = self.to_dict()
+        with open(path + '.tmp', 'w') as f:
+            json.dump(report, f, indent=2, default=str)
+        os.replace(path + '.tmp', path)
+        return report
+
+def top_functions(stats, limit=15):
+    # The functions with the most cumulative time, as (location, calls, own seconds, cumulative seconds)
+    rows = []
+    for (file_name, line, function), (_, calls, own, cumulative, _) in stats.stats.items():
+        rows.append({'function': f"{file_name}:{line}({function})", 'calls': calls,
+                     'own_seconds': own, 'cumulative_seconds': cumulative})
+    return sorted(rows, key=lambda row: row['cumulative_seconds'], reverse=True)[:limit]
+
+def summary_lines(report):
+    lines = []
+    for name, stage in report['stages'].items():
+        metrics = stage.get('metrics')
+        if metrics is None:
+            lines.append(f"{name}: {stage.get('status')}")
+            continue
+        line = (f"{name}: {stage.get('status')} in {metrics['wall_seconds']:.2f}s "
+                f"(cpu {metrics['cpu_seconds'] + metrics['worker_cpu_seconds']:.2f}s")
+        if metrics.get('max_rss_mb') is not None:
+            line += f", peak RSS {metrics['max_rss_mb']:.0f}MB"
+        if metrics.get('rows') is not None:
+            line += f", {metrics['rows']} rows"
+        lines.append(line + ")")
+    return lines
+
+def comparable(metrics):
+    return {
+        'wall_seconds': metrics['wall_seconds'],
+        'cpu_seconds': metrics['cpu_seconds'] + metrics['worker_cpu_seconds'],
+        'traced_peak_mb': metrics.get('traced_peak_mb'),
+    }
+
+def report_measurements(report):
+    # {stage or stage.section: comparable metrics} for every measured stage and section
+    measurements = {}
+    for name, stage in report['stages'].items():
+        metrics = stage.get('metrics')
+        if metrics is None:
+            continue
+        measurements[name] = comparable(metrics)
+        for section_name, section_metrics in metrics.get('sections', {}).items():
+            measurements[f"{name}.{section_name}"] = comparable(section_metrics)
+    return measurements
+
+def compare(before, after, threshold=0.2):
+    # Wall time, CPU time (with process pool tasks) and traced peak of every stage and section measured in
+    # both reports, flagging increases above threshold. Returns the lines and whether anything regressed.
+    old_measurements = report_measurements(before)
+    lines, regressed = [], False
+    for name, new in report_measurements(after).items():
+        old = old_measurements.get(name)
+        if old is None:
+            continue
+        parts = []
+        for key, new_value in new.items():
+            old_value = old[key]
+            if old_value is None or new_value is None:
+                continue
+            change = (new_value - old_value) / old_value if old_value else 0.0
+            # Changes of a few hundredths of a second are noise, whatever the ratio
+            flag = ' !' if change > threshold and new_value - old_value > 0.05 else ''
+            regressed = regressed or bool(flag)
+            parts.append(f"{key} {old_value:.2f} -> {new_value:.2f} ({change:+.0%}){flag}")
+        lines.append(f"{name}: " + ', '.join(parts))
+    return lines, regressed
+
+def main():
+    # Compare two run reports: python -m pipeline.instrumentation reports/before.json reports/after.json
+    parser = argparse.ArgumentParser()
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--threshold', type=float, default=0.2, help='relative increase reported as a regression')
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    lines, regressed = compare(before, after, threshold=args.threshold)
+    print('\n'.join(lines))
+    if regressed:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+logger = logging.getLogger(__name__)
+
+class Stage:
+    # One step of the pipeline. func is called with the outputs of the stages named in inputs, passed
+    # as keyword arguments of the same names. params are the settings that change the stage's output;
+    # with the checkpoint hashes of its inputs they make up the key of its checkpoint.
+    # checkpoint=False for stages whose output cannot be saved (generators) or is not needed later.
+    # main_thread=True for stages that must not run on a worker thread (interactive plots).
+    def __init__(self, name, func, inputs=(), params=None, checkpoint=True, main_thread=False):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.params = params or {}
+        self.checkpoint = checkpoint
+        self.main_thread = main_thread
+
+def stage_order(stages):
+    # Stage names with every stage after the stages it reads from
+    by_name = {stage.name: stage for stage in stages}
+    order, state = [], {}
+
+    def visit(name, path):
+        if name not in by_name:
+            raise ValueError(f"Unknown pipeline stage: {name}" + (f" (input of {path[-1]})" if path else ""))
+        if state.get(name) == 'done':
+            return
+        if state.get(name) == 'visiting':
+            raise ValueError(f"Pipeline stages form a cycle: {' -> '.join(path + [name])}")
+        state[name] = 'visiting'
+        for input_name in by_name[name].inputs:
+            visit(input_name, path + [name])
+        state[name] = 'done'
+        order.append(name)
+
+    for stage in stages:
+        visit(stage.name, [])
+    return order
+
+def downstream(stages, names):
+    # names plus every stage that reads, directly or not, from one of them
+    selected = set(names)
+    for name in stage_order(stages):
+        stage = next(stage for stage in stages if stage.name == name)
+        if any(input_name in selected for input_name in stage.inputs):
+            selected.add(name)
+    return selected
+
+def select_stages(stages, from_stage=None, only=None):
+    # The stages to run: everything by default, a stage and everything downstream of it with
+    # from_stage, or just the named stages with only
+    names = {stage.name for stage in stages}
+    for name in ([from_stage] if from_stage else []) + list(only or []):
+        if name not in names:
+            raise ValueError(f"Unknown pipeline stage: {name}. Stages: {', '.join(stage_order(stages))}")
+    if from_stage and only:
+        raise ValueError("Use either from_stage or only, not both")
+    if from_stage:
+        return downstream(stages, [from_stage])
+    if only:
+        return set(only)
+    return names
+
+def stage_key(stage, input_hashes):
+    # None for a stage without inputs (it reads from outside the pipeline) or with an input that has no
+    # checkpoint hash; such a stage always runs
+    if not stage.inputs or any(input_hashes.get(name) is None for name in stage.inputs):
+        return None
+    return hashlib.blake2b(json.dumps({
+        'stage': stage.name,
+        'params': stage.params,
+        'inputs': {name: input_hashes[name] for name in stage.inputs},
+    }, sort_keys=True, default=str).encode('utf-8'), digest_size=16).hexdigest()
+
+def file_hash(path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class CheckpointStore:
+    # The output of the last run of each stage:
+    #
+    #   <path>/<stage>.joblib   the output
+    #   <path>/<stage>.json     key of the inputs it was computed from, hash of the output
+    #
+    # The output hash is what the key of a downstream stage is built from, so a stage whose inputs
+    # come out unchanged is not run again.
+    def __init__(self, path='checkpoints'):
+        self.path = path
+
+    def stage_path(self, name, extension):
+        return os.path.join(self.path, f"{name}.{extension}")
+
+    def metadata(self, name):
+        meta_path = self.stage_path(name, 'json')
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            return json.load(f)
+
+    def load(self, name):
+        import joblib
+
+        return joblib.load(self.stage_path(name, 'joblib'))
+
+    def save(self, name, key, output):
+        import joblib
+
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+        # As in ModelRegistry.save: the old metadata goes first, so a crash part way leaves no checkpoint
+        meta_path = self.stage_path(name, 'json')
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        output_path = self.stage_path(name, 'joblib')
+        joblib.dump(output, output_path + '.tmp')
+        os.replace(output_path + '.tmp', output_path)
+        meta = {'stage': name, 'key': key, 'output_hash': file_hash(output_path)}
+        with open(meta_path + '.tmp', 'w') as f:
+            json.dump(meta, f, indent=2)
+        os.replace(meta_path + '.tmp', meta_path)
+        return meta['output_hash']
+
+def run_pipeline(stages, store=None, from_stage=None, only=None, max_workers=3, report=None):
+    # Runs the selected stages (see select_stages), each as soon as the stages it reads from are done,
+    # up to max_workers at a time. Inputs from stages that are not selected are read from their last
+    # checkpoint in store. Without from_stage or only, a stage whose checkpoint key matches is not run
+    # and its checkpoint is read instead; with them the selected stages always run.
+    # report (a pipeline.instrumentation.RunReport) measures every stage that runs and records each
+    # stage's status and checkpoint time. Returns {stage: 'ran' | 'reused' | 'loaded'}.
+    by_name = {stage.name: stage for stage in stages}
+    order = stage_order(stages)
+    selected = select_stages(stages, from_stage=from_stage, only=only)
+    forced = bool(from_stage or only)
+
+    outputs, hashes, status = {}, {}, {}
+    for name in order:
+        if name in selected:
+            continue
+        if not any(name in by_name[reader].inputs for reader in selected):
+            continue
+        meta = store.metadata(name) if store is not None and by_name[name].checkpoint else None
+        if meta is None:
+            raise ValueError(f"Stage {name} has no checkpoint to read; run it first (for example with --from-stage {name})")
+        started = time.perf_counter()
+        outputs[name] = store.load(name)
+        hashes[name] = meta['output_hash']
+        status[name] = 'loaded'
+        if report is not None:
+            report.record(name, status='loaded', checkpoint_seconds=time.perf_counter() - started)
+        logger.info(f"Loaded {name} from its checkpoint")
+
+    # Outputs are dropped once every selected stage reading them is done
+    readers = {name: sum(name in by_name[reader].inputs for reader in selected) for name in order}
+
+    def start(stage):
+        # The key and the checkpoint lookup, then the stage itself if there is no matching checkpoint
+        key = stage_key(stage, hashes)
+        meta = store.metadata(stage.name) if store is not None and stage.checkpoint else None
+        started = time.perf_counter()
+        if not forced and key is not None and meta is not None and meta['key'] == key:
+            logger.info(f"Stage {stage.name}: inputs unchanged, reading its checkpoint")
+            output = store.load(stage.name)
+            if report is not None:
+                report.record(stage.name, status='reused', checkpoint_seconds=time.perf_counter() - started)
+            return output, meta['output_hash'], 'reused'
+        logger.info(f"Stage {stage.name}: running")
+        kwargs = {name: outputs[name] for name in stage.inputs}
+        if report is None:
+            output = stage.func(**kwargs)
+        else:
+            try:
+                output = report.run(stage.name, stage.func, **kwargs)
+            except Exception as e:
+                report.record(stage.name, status='failed', error=str(e))
+                raise
+        output_hash = None
+        started = time.perf_counter()
+        if store is not None and stage.checkpoint:
+            output_hash = store.save(stage.name, key, output)
+        if report is not None:
+            report.record(stage.name, status='ran', checkpoint_seconds=time.perf_counter() - started)
+        return output, output_hash, 'ran'
+
+    def finish(stage, result):
+        outputs[stage.name], hashes[stage.name], status[stage.name] = result
+        for name in stage.inputs:
+            readers[name] -= 1
+            if readers[name] == 0:
+                outputs.pop(name, None)
+        if readers[stage.name] == 0:
+            outputs.pop(stage.name, None)
+
+    waiting = [name for name in order if name in selected]
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while waiting or running:
+            ready = [name for name in waiting if all(input_name in status for input_name in by_name[name].inputs)]
+            for name in ready:
+                waiting.remove(name)
+                if not by_name[name].main_thread:
+                    running[executor.submit(start, by_name[name])] = by_name[name]
+            for name in ready:
+                if by_name[name].main_thread:
+                    finish(by_name[name], start(by_name[name]))
+            if not running:
+                if waiting and not ready:
+                    raise ValueError(f"Pipeline stages cannot run: {', '.join(waiting)}")
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                # A failed stage stops the run; the stages still running finish and keep their checkpoints
+                finish(stage, future.result())
+    return status
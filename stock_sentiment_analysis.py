@@ -1,13 +1,22 @@
+import argparse
 import os
 import logging
 from dotenv import load_dotenv
 from data_collection import news_collector, social_media_collector, stock_price_collector
-from data_preprocessing import text_cleaner, sentiment_analyzer, stock_data_preparer, process_sentiment_data
+from data_collection.http_client import RequestStats
+from data_preprocessing import text_cleaner, sentiment_analyzer, stock_data_preparer, process_sentiment_data, sentiment_stream
+from data_preprocessing.sentiment_cache import SentimentCache
 from feature_engineering import feature_engineer
+from feature_engineering.feature_store import to_feature_matrices
 from model_development import stock_prediction_model
+from model_development.model_registry import ModelRegistry
 from model_evaluation import evaluate_model
+from pipeline.instrumentation import RunReport, annotate, section, summary_lines
+from pipeline.runner import CheckpointStore, Stage, run_pipeline
 from datetime import datetime, timedelta
-from visualization import data_visualizer
+from functools import partial
+from itertools import chain
+from visualization import batch_report, data_visualizer
 import pandas as pd
 
 
@@ -18,61 +27,195 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def main():
-    try:
-        # Get the NewsAPI key from environment variable
-        news_api_key = os.getenv('NEWS_API_KEY')
-        if not news_api_key:
-            raise ValueError("NEWS_API_KEY environment variable is not set. Please set it in your .env file and try again.")
-
-        # Data Collection
-        logger.info("Collecting data...")
-        news_data = news_collector.collect_news(num_articles=200, api_key=news_api_key, save_path='news_articles')
+def collect_news_stage(config, stats=None):
+    if not config['news_api_key']:
+        raise ValueError("NEWS_API_KEY environment variable is not set. Please set it in your .env file and try again.")
+    news_data = news_collector.collect_news(num_articles=200, api_key=config['news_api_key'], save_path='news_articles',
+                                            store_path=config['store_path'], lookback_days=config['lookback_days'],
+                                            stream=config['streaming'], stats=stats)
+    if not config['streaming']:
         if news_data.empty:
             raise ValueError("Failed to collect news data")
         logger.info(f"Collected {len(news_data)} news articles")
         logger.info(f"News data date range: {news_data['date'].min()} to {news_data['date'].max()}")
-        
-        social_media_data = social_media_collector.collect_social_media_data(save_path='social_media_posts')
+    return news_data
+
+def collect_social_media_stage(config, stats=None):
+    social_media_data = social_media_collector.collect_social_media_data(save_path='social_media_posts', store_path=config['store_path'],
+                                                                         lookback_days=config['lookback_days'], stream=config['streaming'],
+                                                                         stats=stats)
+    if not config['streaming']:
         if social_media_data.empty:
             raise ValueError("Failed to collect social media data")
         logger.info(f"Collected {len(social_media_data)} social media posts")
         logger.info(f"Social media data date range: {social_media_data['created_at'].min()} to {social_media_data['created_at'].max()}")
-        
-        stock_data = stock_price_collector.collect_stock_prices()
-        if not stock_data:
-            raise ValueError("Failed to collect stock price data")
-        for symbol, data in stock_data.items():
-            logger.info(f"Collected stock data for {symbol}: {len(data)} days")
-            logger.info(f"Stock data date range for {symbol}: {data.index.min()} to {data.index.max()}")
-
-        # Data Preprocessing
-        logger.info("Preprocessing data...")
-        text_data = pd.concat([news_data['content'], social_media_data['text']])
-        cleaned_text_data = text_cleaner.clean_text(text_data)
-        sentiment_analysis_scores = sentiment_analyzer.analyze_sentiment(cleaned_text_data)
-        prepared_stock_data = stock_data_preparer.prepare_stock_data(stock_data)
-        sentiment_scores = process_sentiment_data.process_sentiment_data(news_data, social_media_data, sentiment_analysis_scores)
-        logger.info(f"Sentiment scores date range: {sentiment_scores.index.min()} to {sentiment_scores.index.max()}")
-        logger.info(f"Number of sentiment scores: {len(sentiment_scores)}")
-
-        # Feature Engineering
-        logger.info("Engineering features...")
-        features = feature_engineer.engineer_features(sentiment_scores, prepared_stock_data)
-
-        # Model Development
-        logger.info("Developing models...")
-        stock_prediction_results = stock_prediction_model.train_and_evaluate(features)
-
-        # Model Evaluation
-        logger.info("Evaluating models...")
-        evaluate_model.evaluate(stock_prediction_results)
-
-        # Visualization
-        logger.info("Generating visualizations...")
-        for symbol in features.keys():
-            data_visualizer.plot_stock_prediction(features, stock_prediction_results[symbol]['model'], symbol)
+    return social_media_data
+
+def collect_stock_prices_stage(stats=None):
+    stock_data = stock_price_collector.collect_stock_prices(stats=stats)
+    if not stock_data:
+        raise ValueError("Failed to collect stock price data")
+    for symbol, data in stock_data.items():
+        logger.info(f"Collected stock data for {symbol}: {len(data)} days")
+        logger.info(f"Stock data date range for {symbol}: {data.index.min()} to {data.index.max()}")
+    return stock_data
+
+def sentiment_stage(config, news, social_media):
+    news_data, social_media_data = news, social_media
+    # Documents cleaned and scored on a previous run are read back from the cache
+    n_workers = config['n_workers']
+    sentiment_cache = SentimentCache(config['sentiment_cache_path'])
+    try:
+        if config['streaming']:
+            partitions = chain(sentiment_stream.source_partitions('news', news_data),
+                               sentiment_stream.source_partitions('reddit', social_media_data))
+            # Reading, cleaning and scoring overlap here, so they are measured together
+            with section('streaming'):
+                sentiment_scores = sentiment_stream.stream_hourly_sentiment(partitions, n_workers=n_workers, cache=sentiment_cache,
+                                                                            cutoff_days=config['lookback_days'])
+            if not sentiment_scores['count'].sum():
+                raise ValueError("Failed to collect news and social media data")
+        else:
+            text_data = pd.concat([news_data['content'], social_media_data['text']])
+            with section('cleaning', rows=len(text_data)):
+                cleaned_text_data = text_cleaner.clean_text(text_data, n_workers=n_workers, cache=sentiment_cache)
+            with section('scoring', rows=len(text_data)):
+                sentiment_analysis_scores = sentiment_analyzer.analyze_sentiment(cleaned_text_data, n_workers=n_workers, cache=sentiment_cache)
+            # Hourly sentiment over every scored document, overall and per source
+            with section('aggregation', rows=len(text_data)):
+                sentiment_scores = process_sentiment_data.aggregate_sentiment(news_data, social_media_data, sentiment_analysis_scores,
+                                                                              cutoff_days=config['lookback_days'])
+    finally:
+        sentiment_cache.close()
+    logger.info(f"Sentiment cache stats: {sentiment_cache.stats}")
+    annotate(cache=sentiment_cache.stats)
+    logger.info(f"Sentiment scores date range: {sentiment_scores.index.min()} to {sentiment_scores.index.max()}")
+    logger.info(f"Number of sentiment scores: {int(sentiment_scores['count'].sum())} over {len(sentiment_scores)} hours")
+    return sentiment_scores
+
+def prepare_prices_stage(prices):
+    return stock_data_preparer.prepare_stock_data(prices)
+
+def features_stage(config, sentiment, prepared_prices):
+    with section('engineering'):
+        features = feature_engineer.engineer_features(sentiment, prepared_prices, sentiment_columns=config['sentiment_columns'])
+    # One float32 matrix per symbol; training folds and plots use views of it
+    with section('matrices'):
+        return to_feature_matrices(features)
+
+def training_stage(config, features):
+    # Symbols whose features are unchanged since the last run reuse the stored model
+    model_registry = ModelRegistry(config['model_registry_path'])
+    results = stock_prediction_model.train_and_evaluate(features, n_workers=config['n_workers'],
+                                                        mode=config['training_mode'], registry=model_registry)
+    logger.info(f"Model registry stats: {model_registry.stats}")
+    annotate(registry=model_registry.stats)
+    return results
 
+def evaluation_stage(config, training):
+    # In batch plot mode the feature importance charts are written by the visualization stage
+    evaluate_model.evaluate(training, plot=not config['batch_plots'])
+
+def visualization_stage(features, training):
+    for symbol in features.keys():
+        data_visualizer.plot_stock_prediction(features, training[symbol]['model'], symbol)
+
+def batch_visualization_stage(config, features, training):
+    # Both charts of every symbol to files, rendered by worker processes, and an index of the scores
+    index = batch_report.write_report(features, training, output_dir=config['plot_dir'], n_workers=config['n_workers'])
+    annotate(plot_dir=config['plot_dir'], charts=2 * len(index['symbols']))
+    return index
+
+def load_config():
+    return {
+        # Get the NewsAPI key from environment variable
+        'news_api_key': os.getenv('NEWS_API_KEY'),
+        # Optional Parquet store for finished days of news and Reddit data
+        'store_path': os.getenv('DATA_STORE_PATH'),
+        # Days of news and Reddit data to collect and aggregate
+        'lookback_days': int(os.getenv('LOOKBACK_DAYS', 30)),
+        # PIPELINE_MODE=streaming reads, cleans and scores the documents one day at a time and keeps
+        # only the hourly aggregates, so memory stays flat as LOOKBACK_DAYS grows
+        'streaming': os.getenv('PIPELINE_MODE', 'batch') == 'streaming',
+        # Worker processes for text cleaning and sentiment scoring (defaults to one per core)
+        'n_workers': int(os.getenv('PIPELINE_WORKERS', os.cpu_count() or 1)),
+        'sentiment_cache_path': os.getenv('SENTIMENT_CACHE_PATH', 'sentiment_cache.sqlite'),
+        # SENTIMENT_SOURCE_FEATURES=1 adds the per-source counts and weighted means as features
+        'sentiment_columns': process_sentiment_data.SOURCE_COLUMNS if os.getenv('SENTIMENT_SOURCE_FEATURES') == '1' else (),
+        # TRAINING_MODE=warm_start grows one forest across the folds instead of refitting each one
+        'training_mode': os.getenv('TRAINING_MODE', 'refit'),
+        'model_registry_path': os.getenv('MODEL_REGISTRY_PATH', 'models'),
+        # PLOT_MODE=batch writes the charts to PLOT_DIR with an index instead of opening a window per
+        # chart, for headless runs over many symbols
+        'batch_plots': os.getenv('PLOT_MODE', 'interactive') == 'batch',
+        'plot_dir': os.getenv('PLOT_DIR', 'plots'),
+    }
+
+def build_stages(config, request_stats=None):
+    # The pipeline as a DAG: the three collectors are independent and run side by side. params hold
+    # the settings each stage's output depends on, for its checkpoint key. request_stats maps
+    # collector stages to the RequestStats their requests are recorded in.
+    streaming = config['streaming']
+    batch_plots = config['batch_plots']
+    request_stats = request_stats or {}
+    if batch_plots:
+        visualization = Stage('visualization', partial(batch_visualization_stage, config), inputs=['features', 'training'],
+                              checkpoint=False)
+    else:
+        visualization = Stage('visualization', visualization_stage, inputs=['features', 'training'], checkpoint=False,
+                              main_thread=True)
+    return [
+        # Stages without inputs always run (collected data depends on when the collectors run, and the
+        # collectors keep their own caches on disk). Streamed days are generators and are not saved.
+        Stage('news', partial(collect_news_stage, config, stats=request_stats.get('news')), checkpoint=not streaming),
+        Stage('social_media', partial(collect_social_media_stage, config, stats=request_stats.get('social_media')),
+              checkpoint=not streaming),
+        Stage('prices', partial(collect_stock_prices_stage, stats=request_stats.get('prices'))),
+        Stage('sentiment', partial(sentiment_stage, config), inputs=['news', 'social_media'],
+              params={'lookback_days': config['lookback_days'], 'streaming': streaming,
+                      'cleaner_version': text_cleaner.CLEANER_VERSION, 'analyzer_version': sentiment_analyzer.ANALYZER_VERSION}),
+        Stage('prepared_prices', prepare_prices_stage, inputs=['prices']),
+        Stage('features', partial(features_stage, config), inputs=['sentiment', 'prepared_prices'],
+              params={'sentiment_columns': list(config['sentiment_columns'])}),
+        Stage('training', partial(training_stage, config), inputs=['features'],
+              params={'training_mode': config['training_mode']}),
+        # Interactive plots open windows, so they stay on the main thread
+        Stage('evaluation', partial(evaluation_stage, config), inputs=['training'], checkpoint=False,
+              main_thread=not batch_plots),
+        visualization,
+    ]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Collect news, Reddit and price data, then train and evaluate the models")
+    parser.add_argument('--from-stage', help='run this stage and every stage after it, reading earlier stages from their checkpoints')
+    parser.add_argument('--only', nargs='+', metavar='STAGE', help='run only these stages, reading their inputs from checkpoints')
+    parser.add_argument('--checkpoint-dir', default=os.getenv('PIPELINE_CHECKPOINT_PATH', 'checkpoints'))
+    parser.add_argument('--stage-workers', type=int, default=int(os.getenv('PIPELINE_STAGE_WORKERS', 3)),
+                        help='stages that may run at the same time')
+    parser.add_argument('--report-dir', default=os.getenv('PIPELINE_REPORT_PATH', 'reports'),
+                        help='where the JSON run report is written')
+    parser.add_argument('--profile', nargs='+', default=[], metavar='STAGE', help='stages to run under a profiler')
+    parser.add_argument('--profiler', choices=['cprofile', 'pyinstrument'], default='cprofile')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='record traced peak memory per stage with tracemalloc (slower; runs one stage at a time)')
+    args = parser.parse_args(argv)
+
+    config = load_config()
+    # The run's settings, without the API key, so reports from different settings are told apart
+    metadata = {key: value for key, value in config.items() if key != 'news_api_key'}
+    metadata.update({'from_stage': args.from_stage, 'only': args.only})
+    report = RunReport(trace_memory=args.trace_memory, profile_stages=args.profile, profiler=args.profiler,
+                       profile_dir=os.path.join(args.report_dir, 'profiles'), metadata=metadata)
+    request_stats = {name: RequestStats() for name in ('news', 'social_media', 'prices')}
+    for name, stats in request_stats.items():
+        report.add_request_stats(name, stats)
+    try:
+        stages = build_stages(config, request_stats)
+        logger.info("Running pipeline stages...")
+        # tracemalloc's peak covers every thread, so traced stages run one at a time
+        status = run_pipeline(stages, store=CheckpointStore(args.checkpoint_dir), from_stage=args.from_stage,
+                              only=args.only, max_workers=1 if args.trace_memory else args.stage_workers, report=report)
+        logger.info(f"Pipeline stages: {status}")
         logger.info("Analysis complete!")
 
     except Exception as e:
@@ -80,5 +223,12 @@ def main():
         import traceback
         logger.error(traceback.print_exc())
 
+    finally:
+        # Written for failed runs too, with the stages that finished
+        report_path = os.path.join(args.report_dir, f"run_{report.started_at:%Y%m%dT%H%M%SZ}.json")
+        for line in summary_lines(report.write(report_path)):
+            logger.info(line)
+        logger.info(f"Run report written to {report_path}")
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
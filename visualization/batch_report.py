@@ -0,0 +1,189 @@
+# Headless charts for every symbol of a run: the feature importance and prediction charts of
+# model_evaluation.evaluate_model and visualization.data_visualizer, rendered to image files by worker
+# processes on the Agg backend, plus index.json and index.html listing each symbol's scores and charts.
+# Run from the repository root to chart the last pipeline run from its checkpoints:
+#   python -m visualization.batch_report --checkpoint-dir checkpoints --output plots --workers 4
+import argparse
+import html
+import json
+import logging
+import math
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+import numpy as np
+from data_preprocessing.parallel import pool_context, resolve_workers, task_result, timed_task
+from model_evaluation.evaluate_model import draw_feature_importance
+from visualization.data_visualizer import draw_stock_prediction, prediction_series
+
+logger = logging.getLogger(__name__)
+
+FIGSIZE = (12, 6)
+DPI = 100
+# Runs of consecutive rows a long series is decimated to: one per pixel column of the chart
+DECIMATION_BUCKETS = FIGSIZE[0] * DPI
+# Symbols per task sent to a worker process
+CHUNK_SIZE = 8
+
+# The figure of each chart kind in this process, and the layout key its margins were fitted for.
+# Clearing and redrawing an Axes costs far less than building a new figure for every symbol.
+_figures = {}
+
+def reused_axes(kind):
+    # A Figure on an Agg canvas, created without pyplot: no window, no pyplot figure list to leak into,
+    # and no change to the backend of the process that calls it
+    if kind not in _figures:
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        fig = Figure(figsize=FIGSIZE, dpi=DPI)
+        FigureCanvasAgg(fig)
+        _figures[kind] = {'figure': fig, 'axes': fig.add_subplot(), 'layout_key': None}
+    entry = _figures[kind]
+    entry['axes'].clear()
+    return entry['figure'], entry['axes']
+
+def fit_layout(kind, layout_key=None):
+    # tight_layout draws the whole figure once more to measure it. Charts with the same layout_key (the
+    # same tick labels) keep the margins fitted for the first; None always fits.
+    entry = _figures[kind]
+    if layout_key is None or entry['layout_key'] != layout_key:
+        entry['figure'].tight_layout()
+        entry['layout_key'] = layout_key
+
+def decimate(plot_data, n_buckets=DECIMATION_BUCKETS):
+    # A long series cut into n_buckets runs of consecutive rows, keeping in each run its first and last
+    # row and the rows holding each column's lowest and highest value. With a run per pixel column, a
+    # line through these rows draws the same pixels as one through every row.
+    n_rows = len(plot_data)
+    if n_rows <= n_buckets * (2 * plot_data.shape[1] + 2):
+        return plot_data
+    buckets = np.arange(n_rows) * n_buckets // n_rows
+    starts = np.searchsorted(buckets, np.arange(n_buckets))
+    ends = np.append(starts[1:], n_rows) - 1
+    keep = [starts, ends]
+    for column in plot_data.columns:
+        # Rows by bucket, then by value: the first and last row of each bucket are its extremes
+        order = np.lexsort((plot_data[column].to_numpy(), buckets))
+        keep.extend([order[starts], order[ends]])
+    return plot_data.iloc[np.unique(np.concatenate(keep))]
+
+def file_stem(symbol):
+    # Symbols such as BRK/B or ^GSPC as file names
+    return re.sub(r'[^A-Za-z0-9._-]', '_', symbol)
+
+def render_charts(jobs, output_dir, image_format):
+    # Runs in a worker process: draws and saves both charts of each (symbol, feature importance,
+    # plot data, interval) job. Returns {symbol: seconds}.
+    seconds = {}
+    for symbol, feature_importance, plot_data, interval in jobs:
+        started = time.perf_counter()
+        stem = file_stem(symbol)
+
+        fig, ax = reused_axes('importance')
+        draw_feature_importance(ax, symbol, feature_importance)
+        # The same features for every symbol, so the same tick labels
+        fit_layout('importance', layout_key=tuple(sorted(feature_importance)))
+        fig.savefig(os.path.join(output_dir, f"{stem}_importance.{image_format}"), format=image_format)
+
+        fig, ax = reused_axes('prediction')
+        draw_stock_prediction(ax, symbol, plot_data, interval)
+        fit_layout('prediction')
+        fig.savefig(os.path.join(output_dir, f"{stem}_prediction.{image_format}"), format=image_format)
+        seconds[symbol] = time.perf_counter() - started
+    return seconds
+
+def render_all(jobs, output_dir, image_format, n_workers):
+    # Chunks of symbols on a process pool; in this process when there is one worker or one chunk
+    chunks = [jobs[start:start + CHUNK_SIZE] for start in range(0, len(jobs), CHUNK_SIZE)]
+    if n_workers == 1 or len(chunks) <= 1:
+        return render_charts(jobs, output_dir, image_format)
+    seconds = {}
+    with ProcessPoolExecutor(max_workers=min(n_workers, len(chunks)), mp_context=pool_context()) as executor:
+        futures = [executor.submit(timed_task, render_charts, chunk, output_dir, image_format) for chunk in chunks]
+        for future in futures:
+            seconds.update(task_result(future.result()))
+    return seconds
+
+def write_report(features, training, output_dir='plots', n_workers=1, decimation_buckets=DECIMATION_BUCKETS,
+                 image_format='png'):
+    # Charts of every trained symbol in output_dir, and the index of their scores. Predictions are made
+    # here, so the models are not sent to the workers; only the decimated series are. Returns the index.
+    n_workers = resolve_workers(n_workers)
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    jobs, entries = [], []
+    for symbol, results in training.items():
+        if symbol not in features:
+            continue
+        plot_data, interval, mse = prediction_series(features, results['model'], symbol)
+        plotted = decimate(plot_data, decimation_buckets)
+        jobs.append((symbol, results['feature_importance'], plotted, interval))
+        stem = file_stem(symbol)
+        entries.append({
+            'symbol': symbol,
+            'train_mse': float(results['train_mse']),
+            'train_r2': float(results['train_r2']),
+            'test_mse': float(results['test_mse']),
+            'test_r2': float(results['test_r2']),
+            'overall_mse': float(mse),
+            'rows': len(plot_data),
+            'plotted_rows': len(plotted),
+            'importance_chart': f"{stem}_importance.{image_format}",
+            'prediction_chart': f"{stem}_prediction.{image_format}",
+        })
+
+    started = time.perf_counter()
+    render_seconds = render_all(jobs, output_dir, image_format, n_workers)
+    logger.info(f"Rendered charts for {len(jobs)} symbols in {time.perf_counter() - started:.2f}s")
+    for entry in entries:
+        entry['render_seconds'] = render_seconds[entry['symbol']]
+
+    index = {'generated_at': datetime.now(timezone.utc).isoformat(), 'symbols': entries}
+    with open(os.path.join(output_dir, 'index.json'), 'w') as f:
+        json.dump(index, f, indent=2)
+    with open(os.path.join(output_dir, 'index.html'), 'w') as f:
+        f.write(index_html(index))
+    return index
+
+def format_score(value):
+    return '' if value is None or math.isnan(value) else f"{value:.4f}"
+
+def index_html(index):
+    # One row per symbol, best test MSE first, with the scores and links to both charts
+    rows = []
+    for entry in sorted(index['symbols'], key=lambda entry: entry['test_mse']):
+        cells = [html.escape(entry['symbol'])]
+        cells += [format_score(entry[key]) for key in ('train_mse', 'train_r2', 'test_mse', 'test_r2', 'overall_mse')]
+        cells += [f'<a href="{html.escape(entry[key])}">{label}</a>'
+                  for key, label in (('importance_chart', 'importance'), ('prediction_chart', 'prediction'))]
+        rows.append('<tr>' + ''.join(f'<td>{cell}</td>' for cell in cells) + '</tr>')
+    header = ''.join(f'<th>{label}</th>' for label in
+                     ('Symbol', 'Train MSE', 'Train R2', 'Test MSE', 'Test R2', 'Overall MSE', 'Charts', ''))
+    return (
+        '<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>Stock prediction models</title></head><body>\n'
+        f'<h1>Stock prediction models</h1>\n<p>{len(rows)} symbols, generated {html.escape(index["generated_at"])}</p>\n'
+        f'<table border="1" cellpadding="4">\n<tr>{header}</tr>\n' + '\n'.join(rows) + '\n</table>\n</body></html>\n'
+    )
+
+def main():
+    from pipeline.runner import CheckpointStore
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--checkpoint-dir', default='checkpoints', help='checkpoints of a pipeline run')
+    parser.add_argument('--output', default='plots')
+    parser.add_argument('--workers', type=int, default=0, help='worker processes (default one per core)')
+    parser.add_argument('--decimation-buckets', type=int, default=DECIMATION_BUCKETS)
+    args = parser.parse_args()
+
+    store = CheckpointStore(args.checkpoint_dir)
+    index = write_report(store.load('features'), store.load('training'), output_dir=args.output,
+                         n_workers=args.workers, decimation_buckets=args.decimation_buckets)
+    print(f"Charts for {len(index['symbols'])} symbols written to {args.output}")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -1,59 +1,66 @@
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-from sklearn.metrics import mean_squared_error
-from scipy import stats
+from feature_engineering.feature_store import as_feature_matrix
+
+def prediction_interval(y_true, y_pred, confidence=0.95):
+    # Half-width of the prediction interval around y_pred
+    from sklearn.metrics import mean_squared_error
+    from scipy import stats
+
+    mse = mean_squared_error(y_true, y_pred)
+    n = len(y_true)
+    dof = n - 2
+    t_value = abs(stats.t.ppf((1 - confidence) / 2, dof))
+    sigma = np.sqrt(mse * (1 + 1/n))
+    return t_value * sigma
+
+def prediction_series(features, model, symbol):
+    # Actual and predicted prices by date, the half-width of their 95% interval and the overall MSE
+    from sklearn.metrics import mean_squared_error
+
+    # A FeatureMatrix, or a DataFrame straight from engineer_features
+    data = as_feature_matrix(features[symbol])
 
-def plot_stock_prediction(features, model, symbol, n_splits=5):
-    data = features[symbol]
-    
-    # Prepare the data
-    X = data.drop(['Target'], axis=1)
-    y = data['Target']
-    
     # Make predictions on the entire dataset
-    y_pred = model.predict(X)
-    
-    # Calculate confidence interval
-    def prediction_interval(y_true, y_pred, confidence=0.95):
-        mse = mean_squared_error(y_true, y_pred)
-        n = len(y_true)
-        dof = n - 2
-        t_value = abs(stats.t.ppf((1 - confidence) / 2, dof))
-        sigma = np.sqrt(mse * (1 + 1/n))
-        return t_value * sigma
-
-    interval = prediction_interval(y, y_pred)
-    
-    # Create a DataFrame for plotting
+    y_pred = model.predict(data.X)
+    interval = prediction_interval(data.y, y_pred)
+
     plot_data = pd.DataFrame({
-        'Date': X.index,
-        'Actual': y,
+        'Date': data.index,
+        'Actual': data.y,
         'Predicted': y_pred
     })
     plot_data.set_index('Date', inplace=True)
     plot_data.sort_index(inplace=True)
+    return plot_data, interval, mean_squared_error(data.y, y_pred)
+
+def draw_stock_prediction(ax, symbol, plot_data, interval):
+    # Actual and predicted prices with the confidence band, on a matplotlib Axes
+    ax.plot(plot_data.index, plot_data['Actual'], label='Actual', color='black', alpha=0.6, linewidth=2)
+    ax.plot(plot_data.index, plot_data['Predicted'], label='Predicted', color='blue', alpha=0.6, linewidth=2)
 
-    # Plot
-    plt.figure(figsize=(12, 6))
-    plt.plot(plot_data.index, plot_data['Actual'], label='Actual', color='black', alpha=0.6, linewidth=2)
-    plt.plot(plot_data.index, plot_data['Predicted'], label='Predicted', color='blue', alpha=0.6, linewidth=2)
-    
     # Add confidence interval
-    plt.fill_between(plot_data.index, 
-                     plot_data['Predicted'] - interval, 
-                     plot_data['Predicted'] + interval, 
-                     color='blue', alpha=0.2, label='Confidence Interval')
-    
-    plt.title(f'Stock Price Prediction for {symbol}')
-    plt.xlabel('Date')
-    plt.ylabel('Stock Price')
-    plt.legend()
-    plt.xticks(rotation=45)
-    plt.tight_layout()
+    ax.fill_between(plot_data.index,
+                    plot_data['Predicted'] - interval,
+                    plot_data['Predicted'] + interval,
+                    color='blue', alpha=0.2, label='Confidence Interval')
+
+    ax.set_title(f'Stock Price Prediction for {symbol}')
+    ax.set_xlabel('Date')
+    ax.set_ylabel('Stock Price')
+    ax.legend()
+    ax.tick_params(axis='x', labelrotation=45)
+
+def plot_stock_prediction(features, model, symbol, n_splits=5):
+    import matplotlib.pyplot as plt
+
+    plot_data, interval, mse = prediction_series(features, model, symbol)
+
+    # Plot
+    fig, ax = plt.subplots(figsize=(12, 6))
+    draw_stock_prediction(ax, symbol, plot_data, interval)
+    fig.tight_layout()
     plt.show()
 
     # Print some metrics
-    mse = mean_squared_error(y, y_pred)
     print(f"Overall MSE: {mse:.4f}")
-